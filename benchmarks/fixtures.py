@@ -0,0 +1,55 @@
+'''Domain names and helpers shared by benchmarks; not a benchmark itself.'''
+
+import time
+import random
+import string
+import pendulum
+from ohmydomains import Domain
+from ohmydomains.contact import Contact, ContactList
+from ohmydomains.registrars.account import RegistrarAccount
+
+
+TLDS = ('.com', '.io', '.dev', '.net', '.org', '.co.uk', '.app')
+
+
+class BenchmarkAccount(RegistrarAccount):
+	REGISTRAR_NAME = 'Benchmark'
+
+	@property
+	def identifier(self):
+		return 'benchmark'
+
+
+def make_domains(account, count, now=None, registrars=None, seed=0):
+	'''Generate `count` random domain names of `account`, expiring from
+	60 days before to 800 days after `now`, 1% of unknown expiry,
+	each of a registrar of `registrars`, or else of that of `account`.'''
+
+	rand = random.Random(seed)
+	now = now or pendulum.datetime(2020, 1, 1)
+	registrars = registrars or (account.REGISTRAR_NAME,)
+	contact_sets = [ContactList.interned({
+		kind: Contact.interned(kind=kind, first_name='First{}'.format(i), email='{}@example.com'.format(i))
+		for kind in ContactList.KINDS
+	}) for i in range(20)]
+	for i in range(count):
+		expiry = now.add(days=rand.randint(-60, 800), hours=rand.randint(0, 23))
+		yield Domain(
+			contacts=rand.choice(contact_sets),
+			account=account,
+
+			name=''.join(rand.choice(string.ascii_lowercase) for _ in range(rand.randint(5, 15))) + '{}{}'.format(i, rand.choice(TLDS)),
+			registrar_name=rand.choice(registrars),
+			creation=expiry.subtract(years=rand.randint(1, 10)),
+			expiry=None if rand.random() < 0.01 else expiry,
+			name_servers=['ns{}.example.net'.format(rand.randint(1, 4)), 'ns{}.example.org'.format(rand.randint(1, 4))],
+			lock=rand.choice((True, False, None)),
+			auto_renew=rand.choice((True, False, None)),
+			whois_privacy=rand.choice((True, False, None)))
+
+
+def timed(label, function):
+	start = time.perf_counter()
+	result = function()
+	print('{:<40} {:>8.3f}s'.format(label, time.perf_counter() - start))
+	return result
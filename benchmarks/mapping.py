@@ -0,0 +1,222 @@
+'''Compare converting raw registrar payloads into domain names through
+compiled mappings, with building them field by field as registrars did before.
+
+$ python benchmarks/mapping.py [COUNT]
+'''
+
+import gc
+import sys
+import time
+import random
+import pendulum
+from ohmydomains.domain import Domain
+from ohmydomains.contact import Contact, ContactList
+from ohmydomains.registrars.name import NameAccount
+from ohmydomains.registrars.gandi import GandiAccount
+from ohmydomains.registrars.namecheap import NameCheapAccount
+from ohmydomains.registrars.namesilo import NameSiloAccount
+from ohmydomains.registrars.zeit import ZeitAccount
+
+
+def name_raw(rand, i):
+	return {
+		'domainName': 'example{}.com'.format(i),
+		'createDate': '2019-10-{:02d}T00:00:00Z'.format(rand.randint(1, 28)),
+		'expireDate': '2021-10-{:02d}T00:00:00Z'.format(rand.randint(1, 28)),
+		'locked': True,
+		'autorenewEnabled': rand.choice((True, False)),
+		'privacyEnabled': True,
+		'nameservers': ['ns1.name.com', 'ns2.name.com'],
+		'contacts': { kind: { 'firstName': 'Oh', 'lastName': 'My{}'.format(rand.randint(1, 20)), 'email': 'oh@my.domains' }
+			for kind in ('registrant', 'admin', 'tech', 'billing') },
+	}
+
+
+def name_legacy(account, raw):
+	return Domain(
+		contacts=ContactList.interned({
+			kind: Contact.interned({
+				attr: raw['contacts'][kind_key].get(attr_key, None) for attr, attr_key in account.CONTACT_ATTR_MAP.items()
+			}, kind=kind) for kind, kind_key in account.CONTACT_KIND_MAP.items()
+		}),
+		account=account,
+
+		name=raw['domainName'],
+		creation=pendulum.parse(raw['createDate']),
+		expiry=pendulum.parse(raw['expireDate']),
+		registrar_name=account.REGISTRAR_NAME,
+
+		lock=raw['locked'],
+		auto_renew=raw['autorenewEnabled'],
+		whois_privacy=raw.get('privacyEnabled', False),
+		name_servers=raw['nameservers'])
+
+
+def name_compiled(account, raw):
+	return account._domain_from_raw(raw, 'details', name=raw['domainName'], contacts=account._convert_contacts(raw['contacts']))
+
+
+def gandi_raw(rand, i):
+	return {
+		'fqdn': 'example{}.com'.format(i),
+		'dates': { 'registry_created_at': '2019-10-{:02d}T00:00:00Z'.format(rand.randint(1, 28)),
+			'registry_ends_at': '2021-10-{:02d}T00:00:00Z'.format(rand.randint(1, 28)) },
+		'autorenew': rand.choice((True, False)),
+		'nameserver': { 'current': 'livedns', 'hosts': ['ns1.gandi.net'] },
+	}
+
+
+def gandi_legacy(account, raw):
+	return Domain(
+		account=account,
+		contacts=None,
+
+		name=raw['fqdn'],
+		creation=pendulum.parse(raw['dates'].get('created_at', raw['dates'].get('registry_created_at', None))),
+		expiry=pendulum.parse(raw['dates'].get('deletes_at', raw['dates'].get('registry_ends_at', None))),
+		registrar_name=account.REGISTRAR_NAME,
+
+		auto_renew=raw['autorenew'],
+		name_servers=[raw['nameserver']['current']] + raw['nameserver'].get('hosts', []))
+
+
+def gandi_compiled(account, raw):
+	return account._domain_from_raw(raw, 'list')
+
+
+def namecheap_raw(rand, i):
+	return {
+		'@Name': 'example{}.com'.format(i),
+		'@Created': '10/{:02d}/2019'.format(rand.randint(1, 28)),
+		'@Expires': '10/{:02d}/2021'.format(rand.randint(1, 28)),
+		'@IsLocked': rand.choice(('true', 'false')),
+		'@AutoRenew': rand.choice(('true', 'false')),
+		'@WhoisGuard': rand.choice(('ENABLED', 'NOTPRESENT')),
+	}
+
+
+def namecheap_legacy(account, raw):
+	return Domain(
+		contacts=None,
+		account=account,
+
+		name=raw['@Name'],
+		creation=pendulum.from_format(raw['@Created'], 'MM/DD/YYYY'),
+		expiry=pendulum.from_format(raw['@Expires'], 'MM/DD/YYYY'),
+		registrar_name=account.REGISTRAR_NAME,
+
+		lock=raw['@IsLocked'] == 'true',
+		auto_renew=raw['@AutoRenew'] == 'true',
+		whois_privacy=raw['@WhoisGuard'] == 'ENABLED',
+		name_servers=None)
+
+
+def namecheap_compiled(account, raw):
+	return account._domain_from_raw(raw, 'list')
+
+
+def namesilo_raw(rand, i):
+	return {
+		'name': 'example{}.com'.format(i),
+		'created': '2019-10-{:02d}'.format(rand.randint(1, 28)),
+		'expires': '2021-10-{:02d}'.format(rand.randint(1, 28)),
+		'locked': rand.choice(('Yes', 'No')),
+		'auto_renew': rand.choice(('Yes', 'No')),
+		'private': rand.choice(('Yes', 'No')),
+		'nameservers': { 'nameserver': [{ '@position': '1', '#text': 'ns1.dnsowl.com' }, { '@position': '2', '#text': 'ns2.dnsowl.com' }] },
+	}
+
+
+def namesilo_legacy(account, raw):
+	name_servers = raw['nameservers']['nameserver']
+	if '#text' in name_servers:
+		name_servers = [name_servers]
+	name_servers = [i['#text'] for i in name_servers]
+
+	return Domain(
+		contacts=None,
+		account=account,
+
+		name=raw['name'],
+		creation=pendulum.parse(raw['created']),
+		expiry=pendulum.parse(raw['expires']),
+		registrar_name=account.REGISTRAR_NAME,
+
+		lock=raw['locked'] == 'Yes',
+		auto_renew=raw['auto_renew'] == 'Yes',
+		whois_privacy=raw['private'] == 'Yes',
+		name_servers=name_servers)
+
+
+def namesilo_compiled(account, raw):
+	return account._domain_from_raw(raw, 'details', name=raw['name'])
+
+
+def zeit_raw(rand, i):
+	return {
+		'name': 'example{}.com'.format(i),
+		'createdAt': 1572307200000 + rand.randint(0, 10 ** 9),
+		'expiresAt': 1635465600000 + rand.randint(0, 10 ** 9),
+		'nameservers': ['a.zeit-world.net'],
+	}
+
+
+def zeit_legacy(account, raw):
+	return Domain(
+		contacts=None,
+		account=account,
+
+		name=raw['name'],
+		registrar_name=account.REGISTRAR_NAME,
+		creation=pendulum.from_timestamp(raw['createdAt'] / 1000),
+		expiry=pendulum.from_timestamp(raw['expiresAt'] / 1000),
+		name_servers=raw['nameservers'],
+		whois_privacy=True)
+
+
+def zeit_compiled(account, raw):
+	return account._domain_from_raw(raw, 'default')
+
+
+REGISTRARS = (
+	('Name.com', NameAccount(username='benchmark', token='benchmark'), name_raw, name_legacy, name_compiled),
+	('Gandi', GandiAccount(api_key='benchmark'), gandi_raw, gandi_legacy, gandi_compiled),
+	('NameCheap', NameCheapAccount(api_user='benchmark', api_key='benchmark', client_ip='192.0.2.1'),
+		namecheap_raw, namecheap_legacy, namecheap_compiled),
+	('NameSilo', NameSiloAccount(api_key='benchmark'), namesilo_raw, namesilo_legacy, namesilo_compiled),
+	('ZEIT', ZeitAccount(token='benchmark', email='benchmark'), zeit_raw, zeit_legacy, zeit_compiled),
+)
+
+
+REPEATS = 3
+
+
+def timed(function, account, raws):
+	gc.collect()
+	start = time.perf_counter()
+	domains = [function(account, raw) for raw in raws]
+	return time.perf_counter() - start, domains
+
+
+def main(count):
+	print('{:<12} {:>10} {:>10} {:>8}'.format('registrar', 'before', 'compiled', 'speedup'))
+	for label, account, make_raw, legacy, compiled in REGISTRARS:
+		rand = random.Random(0)
+		raws = [make_raw(rand, i) for i in range(count)]
+		# best of runs taking turns, as whichever runs first warms up
+		# caches of both, e.g. interned contacts.
+		before = after = float('inf')
+		for i in range(REPEATS):
+			for function in i % 2 and (compiled, legacy) or (legacy, compiled):
+				elapsed, domains = timed(function, account, raws)
+				if function is legacy:
+					before, expected = min(before, elapsed), domains
+				else:
+					after, converted = min(after, elapsed), domains
+		mismatches = sum(1 for a, b in zip(expected, converted) if dict(a) != dict(b))
+		print('{:<12} {:>9.3f}s {:>9.3f}s {:>7.1f}x{}'.format(label, before, after, before / after,
+			mismatches and '  {} mismatches'.format(mismatches) or ''))
+
+
+if __name__ == '__main__':
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,92 @@
+'''Compare parsing large pages of domain names in place, with parsing them
+in worker processes of `ParsePool`, as they arrive together from
+concurrent requests, for numbers of processes up to one per CPU core.
+With a single core, `ParsePool` parses them in place.
+
+$ python benchmarks/parsing.py [PAGES] [DOMAINS_PER_PAGE]
+'''
+
+import os
+import sys
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor
+from ohmydomains.parsing import ParsePool
+from ohmydomains.registrars.namecheap import parse_list_reply
+
+
+DOMAIN = ('<Domain ID="{id}" Name="example{id}.com" User="benchmark" Created="10/{created:02d}/2019" '
+	'Expires="10/{expires:02d}/2021" IsExpired="false" IsLocked="{locked}" AutoRenew="{auto_renew}" '
+	'WhoisGuard="{whois_guard}" IsPremium="false" IsOurDNS="true"/>')
+
+PAGE = '''<?xml version="1.0" encoding="utf-8"?>
+<ApiResponse Status="OK" xmlns="http://api.namecheap.com/xml.response">
+<Errors />
+<Warnings />
+<RequestedCommand>namecheap.domains.getList</RequestedCommand>
+<CommandResponse Type="namecheap.domains.getList">
+<DomainGetListResult>
+{domains}
+</DomainGetListResult>
+<Paging><TotalItems>{total}</TotalItems><CurrentPage>{page}</CurrentPage><PageSize>{size}</PageSize></Paging>
+</CommandResponse>
+<Server>BENCHMARK</Server>
+<GMTTimeDifference>--5:00</GMTTimeDifference>
+<ExecutionTime>0.01</ExecutionTime>
+</ApiResponse>'''
+
+
+def make_pages(count, size):
+	rand = random.Random(0)
+	return [PAGE.format(page=page + 1, size=size, total=count * size, domains='\n'.join(DOMAIN.format(
+		id=page * size + i,
+		created=rand.randint(1, 28),
+		expires=rand.randint(1, 28),
+		locked=rand.choice(('true', 'false')),
+		auto_renew=rand.choice(('true', 'false')),
+		whois_guard=rand.choice(('ENABLED', 'NOTPRESENT')),
+	) for i in range(size))).encode() for page in range(count)]
+
+
+def timed(function, pages, threads=1):
+	start = time.perf_counter()
+	with ThreadPoolExecutor(threads) as executor:
+		replies = list(executor.map(function, pages))
+	return time.perf_counter() - start, replies
+
+
+def records(replies):
+	return [reply['CommandResponse']['DomainGetListResult']['Domain'] for reply in replies]
+
+
+def main(count, size):
+	pages = make_pages(count, size)
+	print('{} pages of {} domain names, {:.1f} MB; {} CPU cores'.format(count, size,
+		sum(len(page) for page in pages) / 1024 / 1024, os.cpu_count()))
+
+	baseline, replies = timed(parse_list_reply, pages)
+	expected = records(replies)
+	print('{:<12} {:>10} {:>8} {:>10}'.format('processes', 'time', 'speedup', 'startup'))
+	print('{:<12} {:>9.3f}s {:>7.1f}x'.format('in place', baseline, 1))
+
+	processes = 1
+	while True:
+		with ParsePool(processes=processes, min_size=0, min_pages=0) as pool:
+			start = time.perf_counter()
+			pool.parse(parse_list_reply, pages[0])
+			startup = time.perf_counter() - start
+			# as many requests in flight as to keep every worker busy.
+			elapsed, replies = timed(lambda page: pool.parse(parse_list_reply, page), pages, processes * 2)
+		mismatches = sum(1 for a, b in zip(expected, records(replies)) if a != b)
+		print('{:<12} {:>9.3f}s {:>7.1f}x {:>9.3f}s{}{}'.format(processes, elapsed, baseline / elapsed, startup,
+			pool.in_place and '  in place, single core' or '',
+			mismatches and '  {} mismatches'.format(mismatches) or ''))
+
+		if processes >= (os.cpu_count() or 1):
+			break
+		processes = min(processes * 2, os.cpu_count())
+
+
+if __name__ == '__main__':
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+		int(sys.argv[2]) if len(sys.argv) > 2 else 100)
@@ -0,0 +1,51 @@
+'''Compare load times of the inventory as TOML, JSON and binary snapshot.
+
+$ python benchmarks/snapshot_load.py [COUNT]
+'''
+
+import sys
+import json
+import tempfile
+from pathlib import Path
+import toml
+import pendulum
+from ohmydomains import Manager
+from ohmydomains.snapshot import Snapshot
+from fixtures import BenchmarkAccount, make_domains, timed
+
+
+def main(count):
+	account = BenchmarkAccount()
+	manager = Manager(accounts=[account])
+	for domain in make_domains(account, count):
+		manager.index.add(domain)
+
+	directory = Path(tempfile.mkdtemp())
+	toml_path, json_path, snapshot_path = directory / 'inventory.toml', directory / 'inventory.json', directory / 'inventory.omds'
+
+	records = manager.export_domains()
+	timed('write TOML', lambda: toml_path.write_text(toml.dumps({ 'domains': records })))
+	timed('write JSON', lambda: json_path.write_text(json.dumps({ 'domains': records })))
+	timed('write snapshot', lambda: manager.export_snapshot(snapshot_path))
+	for path in (toml_path, json_path, snapshot_path):
+		print('{:<40} {:>8.1f}MiB'.format(path.name, path.stat().st_size / 1024 / 1024))
+
+	timed('parse TOML', lambda: toml.loads(toml_path.read_text()))
+	timed('parse JSON', lambda: json.loads(json_path.read_text()))
+	timed('parse JSON and build domains', lambda: Manager(accounts=[account]).load_domains(json.loads(json_path.read_text())['domains']))
+
+	def scan():
+		with Snapshot(snapshot_path) as snapshot:
+			return sum(1 for row in snapshot.iter_rows(expiry_before=pendulum.datetime(2021, 1, 1)))
+	timed('scan snapshot by expiry', scan)
+
+	def names():
+		with Snapshot(snapshot_path) as snapshot:
+			return [row.name for row in snapshot]
+	timed('read all names from snapshot', names)
+	timed('import snapshot, expiring before 2021', lambda: Manager(accounts=[account]).import_snapshot(snapshot_path, expiry_before='2021-01-01'))
+	timed('import whole snapshot', lambda: Manager(accounts=[account]).import_snapshot(snapshot_path))
+
+
+if __name__ == '__main__':
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,53 @@
+'''Time summarizing domain names into renewal calendars and breakdowns,
+building columns of their fields and aggregating them, checking
+results against counting them one by one.
+
+$ python benchmarks/summarize.py [COUNT]
+'''
+
+import sys
+from collections import Counter
+import pendulum
+from ohmydomains import Manager
+from ohmydomains.analytics import Columns, summarize
+from fixtures import BenchmarkAccount, make_domains, timed
+
+
+REGISTRARS = ('Name.com', 'Gandi', 'NameCheap', 'NameSilo', 'ZEIT')
+
+
+def expected_counts(domains, now, risk_days):
+	now, soon = now.int_timestamp, now.add(days=risk_days).int_timestamp
+	counts = Counter()
+	for domain in domains:
+		expiry = domain.expiry and domain.expiry.int_timestamp
+		expiring = expiry is not None and now <= expiry < soon
+		counts['expired'] += expiry is not None and expiry < now
+		counts['expiring'] += expiring
+		counts['auto_renew_off'] += domain.auto_renew is False
+		counts['at_risk'] += expiring and domain.auto_renew is not True
+		counts['registrar:' + domain.registrar_name] += 1
+	return counts
+
+
+def main(count):
+	now = pendulum.datetime(2024, 5, 15, 12)
+	manager = Manager()
+	domains = list(make_domains(BenchmarkAccount(), count, now, registrars=REGISTRARS))
+	for domain in domains:
+		manager.index.add(domain)
+
+	columns = timed('columns of {} domain names'.format(count), lambda: Columns(domains))
+	for period in ('month', 'week'):
+		summary = timed('summarize by {}'.format(period), lambda: summarize(columns, period=period, now=now.int_timestamp))
+	timed('Manager.summarize()', lambda: manager.summarize(now=now.int_timestamp))
+
+	expected = expected_counts(domains, now, 30)
+	mismatches = [key for key in ('expired', 'expiring', 'auto_renew_off', 'at_risk') if summary[key] != expected[key]]
+	mismatches += [row['name'] for row in summary['registrars'] if row['domains'] != expected['registrar:' + row['name']]]
+	print('{} periods, {} registrars, {} TLDs, {} at risk{}'.format(len(summary['calendar']), len(summary['registrars']),
+		len(summary['tlds']), summary['at_risk'], mismatches and ', mismatches: ' + ', '.join(mismatches) or ''))
+
+
+if __name__ == '__main__':
+	main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,89 @@
+'''Compare listing a Name.com account over HTTP/1.1 and HTTP/2,
+against a local stand-in server answering each request with a delay.
+
+Requires the `http2` extra, and `hypercorn` for the stand-in server.
+
+$ python benchmarks/transport.py [COUNT] [LATENCY_MS]
+'''
+
+import sys
+import time
+import json
+import socket
+import asyncio
+from multiprocessing import Process
+from ohmydomains.registrars.name import NameAccount
+from ohmydomains.transport import HTTP2Transport
+
+
+def make_app(count, latency):
+	names = ['example{}.com'.format(i) for i in range(count)]
+	detail = {
+		'createDate': '2019-10-29T00:00:00Z',
+		'expireDate': '2020-10-29T00:00:00Z',
+		'locked': True,
+		'autorenewEnabled': True,
+		'nameservers': ['ns1.name.com', 'ns2.name.com'],
+		'contacts': { kind: { 'firstName': 'Oh', 'lastName': 'My', 'email': 'oh@my.domains' }
+			for kind in ('registrant', 'admin', 'tech', 'billing') },
+	}
+
+	async def app(scope, receive, send):
+		if scope['type'] != 'http':
+			return
+		await asyncio.sleep(latency)
+		if scope['path'] == '/v4/domains':
+			body = { 'domains': [{ 'domainName': name } for name in names] }
+		else:
+			body = dict(detail, domainName=scope['path'].rsplit('/', 1)[-1])
+		await send({ 'type': 'http.response.start', 'status': 200, 'headers': [(b'content-type', b'application/json')] })
+		await send({ 'type': 'http.response.body', 'body': json.dumps(body).encode('utf-8') })
+
+	return app
+
+
+def serve(port, count, latency):
+	from hypercorn.config import Config
+	from hypercorn.asyncio import serve as hypercorn_serve
+
+	config = Config()
+	config.bind = ['127.0.0.1:{}'.format(port)]
+	config.loglevel = 'WARNING'
+	asyncio.run(hypercorn_serve(make_app(count, latency), config))
+
+
+def free_port():
+	with socket.socket() as sock:
+		sock.bind(('127.0.0.1', 0))
+		return sock.getsockname()[1]
+
+
+def run(label, port, transport, concurrency):
+	account = NameAccount(username='benchmark', token='benchmark', transport=transport)
+	account._api_base = 'http://127.0.0.1:{}/v4'.format(port)
+	account.detail_concurrency = concurrency
+	start = time.perf_counter()
+	count = sum(1 for domain in account.iter_domains())
+	elapsed = time.perf_counter() - start
+	print('{:<36} {:>6} domains {:>8.3f}s {:>8.1f}/s'.format(label, count, elapsed, count / elapsed))
+
+
+def main(count, latency):
+	port = free_port()
+	server = Process(target=serve, args=(port, count, latency), daemon=True)
+	server.start()
+	time.sleep(1)
+
+	try:
+		run('HTTP/1.1, sequential', port, 'requests', 1)
+		for concurrency in (4, 16, 64):
+			run('HTTP/1.1, {} threads'.format(concurrency), port, 'requests', concurrency)
+			run('HTTP/2, {} streams'.format(concurrency), port, HTTP2Transport(prior_knowledge=True), concurrency)
+	finally:
+		server.terminate()
+
+
+if __name__ == '__main__':
+	main(
+		int(sys.argv[1]) if len(sys.argv) > 1 else 500,
+		(int(sys.argv[2]) if len(sys.argv) > 2 else 20) / 1000)
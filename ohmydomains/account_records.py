@@ -0,0 +1,80 @@
+'''Read records of accounts to import from CSV, JSON or TOML files.
+
+Records are in the form of `RegistrarAccount.export()`, as in the config:
+a `registrar`, `credentials` keyed by name, and optionally `tags`,
+`testing`, `timeout` and `transport`. Credentials may be given as
+other keys of the record instead, as CSV files do with a column each,
+`registrar`, `tags` and `testing` being the only other ones; cells left
+empty are left out, so accounts of different registrars can share a file.
+
+JSON files hold a list of records, or an object with them as `accounts`;
+TOML files hold them as `[[accounts]]` tables.
+'''
+
+import csv
+import json
+import toml
+from pathlib import Path
+
+
+FORMATS = ('csv', 'json', 'toml')
+
+RECORD_KEYS = ('registrar', 'credentials', 'tags', 'testing', 'timeout', 'transport')
+'''Keys of a record which are not credentials.'''
+
+TRUE_TEXTS = ('1', 'true', 'yes', 'y')
+
+
+class InvalidRecord(Exception): pass
+
+
+def read_account_records(path, format=None):
+	'''Read raw records from a file at `path`, in `format`, one of `FORMATS`,
+	or as of its extension if omitted.'''
+
+	path = Path(path)
+	format = (format or path.suffix.lstrip('.')).lower()
+	if format not in FORMATS:
+		raise ValueError('Unknown format of accounts "{}", expected one of {}.'.format(format, ', '.join(FORMATS)))
+
+	text = path.read_text(encoding='utf-8-sig')
+	if format == 'csv':
+		return list(csv.DictReader(text.splitlines()))
+	data = json.loads(text) if format == 'json' else toml.loads(text)
+	if isinstance(data, dict):
+		data = data.get('accounts', [])
+	return list(data)
+
+
+def normalize_record(record):
+	'''Turn a raw record into the form of `RegistrarAccount.export()`,
+	raising `InvalidRecord` if it can not be.'''
+
+	if not isinstance(record, dict):
+		raise InvalidRecord('Not a record of an account.')
+	record = { key: value for key, value in record.items() if key is not None and value not in (None, '') }
+	registrar = str(record.get('registrar', '')).strip().lower()
+	if not registrar:
+		raise InvalidRecord('Missing registrar.')
+
+	credentials = dict(record.get('credentials', None) or {})
+	credentials.update((key, str(value).strip()) for key, value in record.items() if key not in RECORD_KEYS)
+
+	tags = record.get('tags', None) or []
+	if isinstance(tags, str):
+		tags = [tag.strip() for tag in tags.split(',') if tag.strip()]
+
+	testing = record.get('testing', False)
+	if isinstance(testing, str):
+		testing = testing.strip().lower() in TRUE_TEXTS
+
+	normalized = {
+		'registrar': registrar,
+		'credentials': credentials,
+		'testing': bool(testing),
+		'tags': list(tags),
+	}
+	for key in ('timeout', 'transport'):
+		if key in record:
+			normalized[key] = record[key]
+	return normalized
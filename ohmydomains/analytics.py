@@ -0,0 +1,157 @@
+'''Portfolio analytics of domain names: renewal calendars and breakdowns
+by registrar and TLD, computed over columns of their fields at once.
+
+Requires the `stats` extra: `pip install ohmydomains[stats]`.
+'''
+
+import time
+import datetime
+
+
+PERIODS = ('week', 'month')
+
+HORIZON = 365
+'''Default days ahead renewal calendars cover.'''
+
+RISK_DAYS = 30
+'''Default days ahead within which domain names expiring without
+auto renewal are at risk.'''
+
+NO_DATE = -(1 << 63)
+
+TRINARY_CODES = { None: 0, False: 1, True: 2 }
+'''Codes of values of `lock`, `auto_renew` and `whois_privacy` in columns.'''
+
+DAY = 86400
+
+
+def _numpy():
+	try:
+		import numpy
+	except ImportError:
+		raise ImportError('Analytics require numpy; try `pip install ohmydomains[stats]`.')
+	return numpy
+
+
+class Columns:
+	'''Fields of domain names as NumPy arrays, one item per domain name.
+
+	* `expiry`: epoch seconds, `NO_DATE` if unknown.
+	* `registrar`, `tld`: codes, indexes into `registrars` and `tlds`.
+	* `auto_renew`, `lock`, `whois_privacy`: codes of `TRINARY_CODES`.
+	'''
+
+	def __init__(self, domains):
+		np = _numpy()
+		registrars, tlds = {}, {}
+		expiry, registrar, tld, auto_renew, lock, whois_privacy = [], [], [], [], [], []
+		codes = TRINARY_CODES
+		for domain in domains:
+			expiry.append(NO_DATE if domain.expiry is None else int(domain.expiry.timestamp()))
+			name = domain.registrar_name
+			registrar.append(registrars[name] if name in registrars else registrars.setdefault(name, len(registrars)))
+			name = domain.tld.lower()
+			tld.append(tlds[name] if name in tlds else tlds.setdefault(name, len(tlds)))
+			auto_renew.append(codes[domain.auto_renew])
+			lock.append(codes[domain.lock])
+			whois_privacy.append(codes[domain.whois_privacy])
+
+		self.registrars = list(registrars)
+		self.tlds = list(tlds)
+		self.expiry = np.array(expiry, dtype=np.int64)
+		self.registrar = np.array(registrar, dtype=np.int32)
+		self.tld = np.array(tld, dtype=np.int32)
+		self.auto_renew = np.array(auto_renew, dtype=np.int8)
+		self.lock = np.array(lock, dtype=np.int8)
+		self.whois_privacy = np.array(whois_privacy, dtype=np.int8)
+
+	def __len__(self):
+		return len(self.expiry)
+
+
+def _period_starts(np, days, period):
+	'''First days of periods of `days` since the epoch, as days since the epoch.'''
+
+	if period == 'week':
+		# the epoch is a Thursday; weeks start on Monday.
+		return days - (days + 3) % 7
+	months = days.astype('datetime64[D]').astype('datetime64[M]')
+	return months.astype('datetime64[D]').astype(np.int64)
+
+
+def _breakdown(np, codes, labels, masks):
+	counts = { key: np.bincount(codes, weights=mask, minlength=len(labels)).astype(np.int64) if mask is not None
+		else np.bincount(codes, minlength=len(labels)) for key, mask in masks.items() }
+	rows = [dict({ 'name': label }, **{ key: int(values[i]) for key, values in counts.items() })
+		for i, label in enumerate(labels)]
+	rows.sort(key=lambda row: (-row['domains'], row['name'] or ''))
+	return rows
+
+
+def summarize(columns, period='month', horizon=HORIZON, risk_days=RISK_DAYS, now=None):
+	'''Summarize domain names in `columns`, a `Columns`, as a `dict`:
+
+	* `total`: number of domain names.
+	* `expired`, `unknown_expiry`: those having expired, and of unknown expiry.
+	* `expiring`: those expiring within `risk_days`.
+	* `auto_renew_off`, `unlocked`, `no_whois_privacy`: those with the field `False`.
+	* `at_risk`: those expiring within `risk_days` without auto renewal on.
+	* `calendar`: a list, a row per `period`, one of `PERIODS`, from the current one
+	to `horizon` days ahead, of `period`, its first day in ISO 8601, and number of
+	`domains` expiring in it, of which with `auto_renew_off`, and `registrars`,
+	a `dict` of number of them by registrar name.
+	* `registrars`, `tlds`: a list, a row per registrar name or TLD, most domain
+	names first, of `name`, number of `domains`, and number of those `expiring`,
+	`auto_renew_off` and `at_risk`.
+
+	Periods are in UTC. `now` is a Unix time, the current one if omitted.
+	'''
+
+	if period not in PERIODS:
+		raise ValueError('Unknown period "{}", expected one of {}.'.format(period, ', '.join(PERIODS)))
+	np = _numpy()
+	now = int(time.time() if now is None else now)
+
+	known = columns.expiry != NO_DATE
+	expired = known & (columns.expiry < now)
+	expiring = known & ~expired & (columns.expiry < now + risk_days * DAY)
+	auto_renew_off = columns.auto_renew == TRINARY_CODES[False]
+	at_risk = expiring & (columns.auto_renew != TRINARY_CODES[True])
+
+	first = int(_period_starts(np, np.array([now // DAY], dtype=np.int64), period)[0])
+	upcoming = known & (columns.expiry >= first * DAY) & (columns.expiry < now + horizon * DAY)
+	starts = _period_starts(np, columns.expiry[upcoming] // DAY, period)
+	periods, buckets = np.unique(starts, return_inverse=True)
+	registrar_count = max(len(columns.registrars), 1)
+	by_registrar = np.bincount(buckets * registrar_count + columns.registrar[upcoming],
+		minlength=len(periods) * registrar_count).reshape(len(periods), registrar_count)
+	renewal_off = np.bincount(buckets, weights=auto_renew_off[upcoming], minlength=len(periods))
+
+	calendar = []
+	for i, start in enumerate(periods.tolist()):
+		calendar.append({
+			'period': (datetime.date(1970, 1, 1) + datetime.timedelta(days=start)).isoformat(),
+			'domains': int(by_registrar[i].sum()),
+			'auto_renew_off': int(renewal_off[i]),
+			'registrars': { columns.registrars[j]: int(count) for j, count in enumerate(by_registrar[i].tolist()) if count },
+		})
+
+	masks = {
+		'domains': None,
+		'expiring': expiring,
+		'auto_renew_off': auto_renew_off,
+		'at_risk': at_risk,
+	}
+	return {
+		'total': len(columns),
+		'expired': int(expired.sum()),
+		'unknown_expiry': int((~known).sum()),
+		'expiring': int(expiring.sum()),
+		'auto_renew_off': int(auto_renew_off.sum()),
+		'unlocked': int((columns.lock == TRINARY_CODES[False]).sum()),
+		'no_whois_privacy': int((columns.whois_privacy == TRINARY_CODES[False]).sum()),
+		'at_risk': int(at_risk.sum()),
+		'calendar': calendar,
+		'registrars': _breakdown(np, columns.registrar, columns.registrars, masks),
+		'tlds': _breakdown(np, columns.tld, columns.tlds, masks),
+	}
@@ -0,0 +1,126 @@
+'''Cache of responses of registrar requests, coalescing concurrent
+identical requests into one.'''
+
+import time
+import threading
+from collections import OrderedDict
+
+
+class _Flight:
+	def __init__(self, scope):
+		self.scope = scope
+		self.done = threading.Event()
+		self.response = None
+		self.error = None
+		self.invalidated = False
+
+
+def _affects(scope, account, endpoints, names):
+	if scope[0] != account or (endpoints is not None and scope[1] not in endpoints):
+		return False
+	return not names or not scope[2] or bool(names & scope[2])
+
+
+class ResponseCache:
+	'''Responses by key, each kept for the TTL it was fetched with.
+
+	Each response has a scope of `(account, endpoint, names)`, the unique
+	identifier of the account requesting it, the endpoint requested and
+	domain names it is about, if any, through which it is invalidated.
+
+	Callers asking for a key being fetched wait for that fetch instead
+	of fetching again, and get its response or error. A fetch in flight
+	while its scope is invalidated still answers its callers, but is not
+	kept, as it may predate the change.
+
+	* `max_entries`: number of responses kept, least recently used
+	being dropped first.
+
+	It is safe to use from multiple threads.
+	'''
+
+	def __init__(self, max_entries=10000):
+		self.max_entries = max_entries
+		self.hits = self.misses = self.coalesced = 0
+		self._entries = OrderedDict()
+		self._flights = {}
+		self._lock = threading.Lock()
+
+	def __len__(self):
+		return len(self._entries)
+
+	def get(self, key, ttl, fetch, scope):
+		'''Response for `key`, calling `fetch()` for it unless it is cached,
+		or being fetched already, and keeping it `ttl` seconds.'''
+
+		with self._lock:
+			entry = self._entries.get(key, None)
+			if entry and entry[0] > time.monotonic():
+				self._entries.move_to_end(key)
+				self.hits += 1
+				return entry[1]
+
+			flight = self._flights.get(key, None)
+			if flight:
+				self.coalesced += 1
+				leader = False
+			else:
+				self.misses += 1
+				flight = self._flights[key] = _Flight((scope[0], scope[1], frozenset(scope[2])))
+				leader = True
+
+		if not leader:
+			flight.done.wait()
+			if flight.error:
+				raise flight.error
+			return flight.response
+
+		try:
+			flight.response = fetch()
+			return flight.response
+		except BaseException as e:
+			flight.error = e
+			raise
+		finally:
+			with self._lock:
+				del self._flights[key]
+				if flight.error is None and not flight.invalidated:
+					self._entries[key] = (time.monotonic() + ttl, flight.response, flight.scope)
+					self._entries.move_to_end(key)
+					while len(self._entries) > self.max_entries:
+						self._entries.popitem(last=False)
+			flight.done.set()
+
+	def invalidate(self, account, endpoints=None, names=None):
+		'''Drop responses of `account` to requests to `endpoints`, or to any,
+		about any of domain `names`, or about any domain name, along with
+		those not about a particular one.'''
+
+		endpoints = endpoints is not None and set(endpoints) or None
+		names = names and frozenset(name.lower() for name in names) or None
+		with self._lock:
+			for key in [key for key, entry in self._entries.items() if _affects(entry[2], account, endpoints, names)]:
+				del self._entries[key]
+			for flight in self._flights.values():
+				if _affects(flight.scope, account, endpoints, names):
+					flight.invalidated = True
+
+	def clear(self):
+		with self._lock:
+			self._entries.clear()
+			for flight in self._flights.values():
+				flight.invalidated = True
+
+	def stats(self):
+		with self._lock:
+			return {
+				'entries': len(self._entries),
+				'in_flight': len(self._flights),
+				'hits': self.hits,
+				'misses': self.misses,
+				'coalesced': self.coalesced,
+			}
+
+
+shared_cache = ResponseCache()
+'''Cache of registrar accounts of this process, unless given another.'''
@@ -0,0 +1,129 @@
+import json
+import hashlib
+import pendulum
+from pathlib import Path
+
+
+TRACKED_FIELDS = ('account', 'expiry', 'name_servers', 'lock', 'auto_renew', 'contacts')
+'''Fields of a domain name compared between syncs, besides its name.'''
+
+
+def _digest(data):
+	return hashlib.sha1(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def tracked_values(domain):
+	'''Compact, JSON serializable values of tracked fields of a domain.
+
+	The account is represented by its unique identifier,
+	and contacts by a digest of their content.
+	'''
+
+	return {
+		'account': domain.account and domain.account.unique_identifier,
+		'expiry': domain.expiry and domain.expiry.to_iso8601_string(),
+		'name_servers': sorted(server.lower().rstrip('.') for server in domain.name_servers or []),
+		'lock': domain.lock,
+		'auto_renew': domain.auto_renew,
+		'contacts': domain.contacts is not None and _digest(domain.contacts.export()) or None,
+	}
+
+
+def fingerprint(domain, values=None):
+	'''Content fingerprint of a domain name, changing whenever
+	any of its tracked fields does.
+
+	* `values`: its `tracked_values()`, if already at hand.
+	'''
+
+	return _digest([domain.name.lower(), tracked_values(domain) if values is None else values])
+
+
+class ChangeTracker:
+	'''Keep fingerprints of domain names between syncs,
+	to produce a feed of changes.
+
+	Feed a sync's domains through `observe()`, then call `commit()`
+	to get its changes and make it the base of the next sync.
+
+	* `state`: state of the last sync, from `export()`.
+	'''
+
+	def __init__(self, state=None):
+		state = state or {}
+		self.synced_at = state.get('synced_at', None)
+		self.domains = state.get('domains', {})
+		self._seen = {}
+
+	@classmethod
+	def load(cls, path):
+		path = Path(path)
+		return cls(path.exists() and json.loads(path.read_text()) or None)
+
+	def save(self, path):
+		Path(path).write_text(json.dumps(self.export()))
+
+	def export(self):
+		return { 'synced_at': self.synced_at, 'domains': self.domains }
+
+	def observe(self, domain):
+		'''Record a domain name seen in the current sync.'''
+
+		self._seen[domain.name.lower()] = domain
+
+	def track(self, domains):
+		'''Observe domain names while iterating through them.'''
+
+		for domain in domains:
+			self.observe(domain)
+			yield domain
+
+	def commit(self, accounts=None):
+		'''Finish the current sync, returning its change feed:
+
+		* `since`, `at`: times of the last and current sync.
+		* `added`: list of `{ name, values }`, values being those of tracked fields.
+		* `removed`: list of `{ name, values }`, values as of last sync.
+		* `modified`: list of `{ name, changes }`, changes being a `dict` of
+		field name to a list of old and new values.
+
+		A domain name not seen is only considered removed if it belonged to
+		one of `accounts`, those whose domain names were all listed;
+		if omitted, to any account.
+		'''
+
+		listed = accounts is not None and { account.unique_identifier for account in accounts }
+		feed = {
+			'since': self.synced_at,
+			'at': pendulum.now().to_iso8601_string(),
+			'added': [],
+			'removed': [],
+			'modified': [],
+		}
+
+		for name, domain in self._seen.items():
+			values = tracked_values(domain)
+			digest = fingerprint(domain, values)
+			previous = self.domains.get(name, None)
+
+			if previous is None:
+				feed['added'].append({ 'name': name, 'values': values })
+			elif previous['fingerprint'] != digest:
+				feed['modified'].append({ 'name': name, 'changes': {
+					field: [previous['values'].get(field, None), values[field]]
+					for field in TRACKED_FIELDS
+					if previous['values'].get(field, None) != values[field]
+				} })
+			self.domains[name] = { 'fingerprint': digest, 'values': values }
+
+		for name in list(self.domains):
+			if name in self._seen:
+				continue
+			values = self.domains[name]['values']
+			if listed is False or values['account'] in listed:
+				feed['removed'].append({ 'name': name, 'values': values })
+				del self.domains[name]
+
+		self.synced_at = feed['at']
+		self._seen = {}
+		return feed
@@ -0,0 +1,118 @@
+'''Checkpoints of paginated listings of accounts, so an interrupted
+listing resumes from the page it stopped at instead of the first one.
+
+Each checkpoint is a JSON lines file: a header with the account, the
+listing key (e.g. its search term) and the total count the registrar
+reported, then a line per completed page with its exported domain names.
+Pages are appended as they complete, so a crash loses at most the page
+in progress.
+'''
+
+import os
+import json
+import time
+import hashlib
+from pathlib import Path
+
+
+CHECKPOINT_TTL = 6 * 3600
+'''Seconds after its last page was saved before a checkpoint expires.'''
+
+
+class Checkpoint:
+	'''A checkpoint of a listing, from `CheckpointStore.load()` or `start()`.
+
+	* `total`: total count reported by the registrar when it started.
+	* `pages`: list of `(page, records)` of completed pages, in order.
+	'''
+
+	def __init__(self, path, total, pages=None):
+		self.path = path
+		self.total = total
+		self.pages = pages or []
+
+	@property
+	def next_page(self):
+		return self.pages and self.pages[-1][0] + 1 or 1
+
+	def records(self):
+		for page, records in self.pages:
+			yield from records
+
+	def record(self, page, domains):
+		'''Record a completed page of domain names.'''
+
+		records = [domain.export() for domain in domains]
+		with open(self.path, 'a') as f:
+			f.write(json.dumps({ 'page': page, 'domains': records }) + '\n')
+		self.pages.append((page, records))
+
+
+class CheckpointStore:
+	'''Checkpoints kept as files in directory `path`.
+
+	* `ttl`: seconds after its last page was saved before a checkpoint expires.
+	'''
+
+	def __init__(self, path, ttl=CHECKPOINT_TTL):
+		self.path = Path(path)
+		self.ttl = ttl
+
+	def _path(self, account, key):
+		digest = hashlib.sha1(json.dumps([account.unique_identifier, key]).encode('utf-8')).hexdigest()[:20]
+		return self.path.joinpath(digest + '.jsonl')
+
+	def load(self, account, key=None):
+		'''Get the checkpoint of a listing, or `None` if there is none or it expired.'''
+
+		path = self._path(account, key)
+		try:
+			if time.time() - path.stat().st_mtime > self.ttl:
+				path.unlink()
+				return None
+			lines = path.read_text().splitlines()
+		except FileNotFoundError:
+			return None
+
+		try:
+			header = json.loads(lines[0])
+		except (IndexError, ValueError):
+			path.unlink()
+			return None
+
+		pages = []
+		for line in lines[1:]:
+			try:
+				entry = json.loads(line)
+			except ValueError:
+				# interrupted while writing it.
+				break
+			pages.append((entry['page'], entry['domains']))
+		return Checkpoint(path, header['total'], pages)
+
+	def start(self, account, key=None, total=None):
+		'''Start a new checkpoint of a listing, replacing any existing one.'''
+
+		self.path.mkdir(parents=True, exist_ok=True)
+		path = self._path(account, key)
+		temp = path.with_suffix('.tmp')
+		temp.write_text(json.dumps({
+			'account': account.unique_identifier,
+			'key': key,
+			'total': total,
+			'started_at': time.time(),
+		}) + '\n')
+		os.replace(temp, path)
+		return Checkpoint(path, total)
+
+	def discard(self, account, key=None):
+		try:
+			self._path(account, key).unlink()
+		except FileNotFoundError:
+			pass
+
+	def clear(self):
+		'''Discard all checkpoints.'''
+
+		for path in self.path.glob('*.jsonl'):
+			path.unlink()
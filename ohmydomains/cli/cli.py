@@ -1,46 +1,43 @@
 import os.path
+import json
+import itertools
 import toml
 import click
 import drawtable
 import appdirs
-from ohmydomains.util import CONFIG_BASE_PATH, CONFIG_PATH, CACHE_PATH
+from ohmydomains.util import CONFIG_BASE_PATH, CONFIG_PATH, CONFIG_DB_PATH, CACHE_PATH, INVENTORY_PATH, DOMAIN_ACCOUNTS_PATH, FINGERPRINTS_PATH, CHANGES_PATH, SYNC_QUEUE_PATH, CHECKPOINTS_PATH, AVAILABILITY_PATH, JOURNAL_PATH
 from ohmydomains.manager import Manager
+from ohmydomains.checkpoint import CheckpointStore
+from ohmydomains.account_records import FORMATS, read_account_records
+from ohmydomains.parsing import ParsePool
+from ohmydomains.journal import Journal
+from ohmydomains.config_store import ConfigStore
 from ohmydomains.domain import Domain
-from ohmydomains.registrars.account import RegistrarAccount
+from ohmydomains.query import Query, InvalidQuery
 from ohmydomains.registrars import registrars
 from .registrars import registrar_cli_modifiers
 
-# monkey patch RegistrarAccount._try_request to exit on network failure.
-def _exit_on_failure_try_request(self, *args, **kwargs):
-	try:
-		return self._do_try_request(*args, **kwargs)
-	except:
-		click.echo('')
-		click.echo('Network requests unsuccessful. Please try again later.')
-		import sys
-		sys.exit()
-RegistrarAccount._do_try_request = RegistrarAccount._try_request
-RegistrarAccount._try_request = _exit_on_failure_try_request
-
-
 def load_config():
-	if not CONFIG_BASE_PATH.exists():
-		CONFIG_BASE_PATH.mkdir()
-	
-	if not CONFIG_PATH.exists():
-		return {
-			'accounts': [],
-			'raw_domains': []
-		}
+	return config_store().load()
 
-	return toml.loads(CONFIG_PATH.read_text())
 
+_config_store = None
+def config_store():
+	'''The config store, opened once per process, importing
+	`config.toml` of earlier versions the first time.'''
 
-def save_config(data):
-	CONFIG_PATH.write_text(toml.dumps(data))
+	global _config_store
+	if _config_store is None:
+		if not CONFIG_BASE_PATH.exists():
+			CONFIG_BASE_PATH.mkdir(parents=True)
+		_config_store = ConfigStore(CONFIG_DB_PATH, legacy=CONFIG_PATH)
+	return _config_store
 
 
 def load_cache():
+	if not CACHE_PATH.exists():
+		return {}
+
 	return toml.loads(CACHE_PATH.read_text())
 
 
@@ -48,24 +45,107 @@ def save_cache(data):
 	CACHE_PATH.write_text(toml.dumps(data))
 
 
+def load_inventory(manager, **criteria):
+	if not INVENTORY_PATH.exists():
+		return []
+
+	return manager.import_snapshot(INVENTORY_PATH, **criteria)
+
+
+def iter_inventory(manager, **criteria):
+	if not INVENTORY_PATH.exists():
+		return iter(())
+
+	return manager.iter_snapshot(INVENTORY_PATH, **criteria)
+
+
+def save_inventory(manager):
+	manager.export_snapshot(INVENTORY_PATH)
+	save_domain_accounts(manager)
+
+
+def load_domain_accounts(manager):
+	if DOMAIN_ACCOUNTS_PATH.exists():
+		manager.domain_accounts.update(json.loads(DOMAIN_ACCOUNTS_PATH.read_text()))
+
+
+def save_domain_accounts(manager):
+	DOMAIN_ACCOUNTS_PATH.write_text(json.dumps(manager.domain_accounts))
+
+
 def load_manager(manager, net_init=True):
+	'''Load accounts and raw domains from config into `manager`.
+
+	Timeouts of requests can be set per registrar in config,
+	as `[timeouts]` entries of `registrar = [connect, read]`, in seconds,
+	and so can transports, as `[transports]` entries of `registrar = name`,
+	`name` being one of `ohmydomains.transport.TRANSPORTS`.
+	The config is edited as a TOML file through `omd config export`
+	and `omd config import`.
+	'''
+
 	data = load_config()
+	timeouts = data.get('timeouts', {})
+	transports = data.get('transports', {})
 	manager.add_accounts((registrars[record['registrar']].Account(
 		net_init=net_init,
 		testing=record['testing'],
 		tags=record['tags'],
+		timeout=tuple(record.get('timeout', None) or timeouts.get(record['registrar'], None) or ()) or None,
+		transport=record.get('transport', None) or transports.get(record['registrar'], None),
 		**record['credentials']) for record in data.get('accounts', [])))
 	manager.add_domains(*data.get('raw_domains'))
 
 
-def save_manager(manager):
-	data = load_config()
-	data['accounts'] = [account.export() for account in manager.accounts]
-	data['raw_domains'] = manager.raw_domains
-	save_config(data)
+def echo_report(manager):
+	'''Tell which accounts were not completely retrieved.'''
+
+	for account, report in manager.report.items():
+		if report['status'] != 'complete':
+			click.echo('{}: {} after {} domain name{}. {}'.format(account, report['status'],
+				report['domains'], report['domains'] != 1 and 's' or '', report['error'] or ''))
+
+
+def echo_concurrency(manager, accounts=None):
+	'''Tell limits of requests in flight tuned for registrar endpoints.'''
+
+	def seconds(value):
+		return value is None and '-' or '{:.0f}ms'.format(value * 1000)
+
+	draw_table(([
+		endpoint, '{}/{}'.format(stats['limit'], stats['maximum']),
+		seconds(stats['latency']), seconds(stats['baseline']), stats['cuts'],
+		stats['ok'], stats['throttled'], stats['error'],
+	] for endpoint, stats in manager.concurrency_stats(accounts).items()),
+		['endpoint', 'limit', 'latency', 'baseline', 'cuts', 'ok', 'throttled', 'error'])
+
 
+def format_seconds(seconds):
+	for unit, length in (('d', 86400), ('h', 3600), ('m', 60)):
+		if seconds >= length:
+			return '{:.1f}{}'.format(seconds / length, unit)
+	return '{:.0f}s'.format(seconds)
 
-manager = Manager()
+
+PLAN_SCHEDULE_ROWS = 6
+def echo_plan(manager, operation, accounts=None, **options):
+	'''Tell requests `operation` would make per account, how long they would take,
+	and when to make them not to exceed quotas; see `Manager.plan()`.'''
+
+	plans = manager.plan(operation, accounts=accounts, **options)
+	draw_table(([
+		plan['account'], plan['items'], plan['requests'], format_seconds(plan['duration']),
+		plan['quota'] and '{}/{}'.format(plan['quota'][0], format_seconds(plan['quota'][1])) or '-',
+	] for plan in plans), ['account', 'items', 'requests', 'duration', 'quota exceeded'])
+	for plan in plans:
+		if len(plan['schedule']) > 1:
+			click.echo('{}: {}{}'.format(plan['account'], ', '.join('{} at +{}'.format(requests, format_seconds(at))
+				for at, requests in plan['schedule'][:PLAN_SCHEDULE_ROWS]), len(plan['schedule']) > PLAN_SCHEDULE_ROWS and ', ...' or ''))
+	click.echo('{} requests in total, taking about {} one account after another.'.format(
+		sum(plan['requests'] for plan in plans), format_seconds(sum(plan['duration'] for plan in plans))))
+
+
+manager = Manager(checkpoints=CheckpointStore(CHECKPOINTS_PATH))
 
 
 table_drawer = drawtable.Table()
@@ -85,6 +165,152 @@ def cli():
 def domains(): pass
 
 
+def show_domain(domain):
+	from . import list_domains_output as output
+
+	for column in output.DOMAIN_COLUMNS:
+		click.echo('{}: {}'.format(column, getattr(output, column)(domain)))
+
+
+@domains.command('show', help='''Show details of a domain name.
+
+Only the account holding it last time is asked, if known.''')
+@click.argument('name', required=True)
+def show_domain_details(name):
+	load_manager(manager)
+	load_domain_accounts(manager)
+	domain = manager.get_domain(name, refresh=True)
+	if not domain:
+		return click.echo('No tracked account holds {}.'.format(name))
+	show_domain(domain)
+	save_domain_accounts(manager)
+
+
+@domains.command('refresh', help='''Retrieve a domain name again, and update it in domain names retrieved last time.
+
+Only the account holding it last time is asked, if known.''')
+@click.argument('name', required=True)
+def refresh_domain(name):
+	load_manager(manager)
+	load_domain_accounts(manager)
+	load_inventory(manager)
+	domain = manager.get_domain(name, refresh=True)
+	save_inventory(manager)
+	if not domain:
+		return click.echo('No tracked account holds {}.'.format(name))
+	show_domain(domain)
+
+
+@domains.command('changes', help='''Retrieve domain names of all tracked accounts,
+and show what changed since last time.
+
+Each change feed is also appended, as a line of JSON, to a file.''')
+@click.option('-f', '--feed', default=str(CHANGES_PATH), help='File to append the change feed to.')
+@click.option('--plan', is_flag=True, help='Estimate requests it would make and how long it would take, without making any.')
+def sync_changes(feed, plan):
+	from ohmydomains.changes import ChangeTracker
+
+	load_manager(manager, net_init=not plan)
+	load_inventory(manager)
+	if plan:
+		load_domain_accounts(manager)
+		echo_plan(manager, 'list')
+		return
+	tracker = ChangeTracker.load(FINGERPRINTS_PATH)
+	changes = manager.sync_changes(tracker)
+	echo_report(manager)
+	tracker.save(FINGERPRINTS_PATH)
+	save_inventory(manager)
+	with open(feed, 'a') as f:
+		f.write(json.dumps(changes) + '\n')
+
+	for entry in changes['added']:
+		click.echo('+ {}'.format(entry['name']))
+	for entry in changes['removed']:
+		click.echo('- {}'.format(entry['name']))
+	for entry in changes['modified']:
+		click.echo('~ {}: {}'.format(entry['name'], ', '.join(
+			'{} {} -> {}'.format(field, old, new) for field, (old, new) in entry['changes'].items())))
+	click.echo('{} added, {} removed, {} modified.'.format(
+		len(changes['added']), len(changes['removed']), len(changes['modified'])))
+
+
+@domains.command('check', help='''Check whether domain names are available to register.
+
+Names are given as NAMES, and/or one per line in a file. Answers are reused for an hour by default.''')
+@click.option('-f', '--file', type=click.File('r'), help='File of domain names, one per line; - for standard input.')
+@click.option('-r', '--registrars', help='Comma separated list of registrars to check with.')
+@click.option('-t', '--tags', help='Comma separated list of tags of accounts to check with.')
+@click.option('--max-age', default=3600, help='Seconds to reuse answers for. Default is 3600.')
+@click.option('--available', 'available_only', is_flag=True, help='Show only available domain names.')
+@click.option('--plan', is_flag=True, help='Estimate requests it would make and how long it would take, without making any.')
+@click.argument('names', nargs=-1)
+def check_availability(file, registrars, tags, max_age, available_only, plan, names):
+	names = list(names) + (file and [line.strip() for line in file if line.strip()] or [])
+	if not names:
+		raise click.UsageError('No domain name to check.')
+
+	load_manager(manager, net_init=not plan)
+	if AVAILABILITY_PATH.exists():
+		manager.availability.update(json.loads(AVAILABILITY_PATH.read_text()))
+	accounts = manager.get_accounts(registrars=registrars and registrars.split(',') or [], tags=tags and tags.split(',') or [])
+	if plan:
+		echo_plan(manager, 'check_availability', accounts=accounts, names=names, max_age=max_age)
+		return
+	try:
+		results = manager.check_availability(names, accounts=accounts, max_age=max_age)
+	except ValueError as e:
+		raise click.UsageError(str(e))
+	finally:
+		AVAILABILITY_PATH.write_text(json.dumps(manager.availability))
+
+	counts = { True: 0, False: 0, None: 0 }
+	for name, available in results.items():
+		counts[available] += 1
+		if available or not available_only:
+			click.echo('{} {}'.format(name, { True: 'available', False: 'taken', None: 'unknown' }[available]))
+	click.echo('{} available, {} taken, {} unknown.'.format(counts[True], counts[False], counts[None]))
+
+
+@domains.command('verify-ns', help='''Check that name servers delegated to domain names at their TLD
+are those registrars report, and that they answer for them.
+
+Domain names retrieved last time are checked; NAMES, if any, narrow them down
+like search keywords of "omd list". Requires dnspython.''')
+@click.option('-T', '--tld', help='Comma separated list of TLDs.')
+@click.option('-W', '--where', help='Check only domain names matching this query, as of "omd list".')
+@click.option('-n', '--nameserver', multiple=True,
+	help='Resolver to look up TLD name servers with, as an address. Default is those of the system.')
+@click.option('-p', '--port', default=53, help='Port of all name servers. Default is 53.')
+@click.option('-w', '--workers', default=100, help='Maximum number of queries in flight. Default is 100.')
+@click.option('--timeout', default=3.0, help='Seconds to wait for each query. Default is 3.')
+@click.option('--no-lame', is_flag=True, help='Do not ask delegated name servers whether they answer.')
+@click.option('-a', '--all', 'show_all', is_flag=True, help='Show all domain names, not only those with problems.')
+@click.argument('names', nargs=-1)
+def verify_name_servers(tld, where, nameserver, port, workers, timeout, no_lame, show_all, names):
+	load_manager(manager, net_init=False)
+	try:
+		domains = load_inventory(manager, search=list(names), tld=tld and tld.split(',') or [], where=where)
+	except InvalidQuery as e:
+		raise click.BadParameter(str(e), param_hint='--where')
+
+	click.echo('Checking {} domain name{}...'.format(len(domains), len(domains) != 1 and 's' or ''))
+	results = manager.verify_name_servers(domains, nameservers=nameserver or None, port=port,
+		concurrency=workers, timeout=timeout, check_lame=not no_lame)
+
+	counts = {}
+	rows = []
+	for result in sorted(results, key=lambda result: result['name']):
+		counts[result['status']] = counts.get(result['status'], 0) + 1
+		if show_all or result['status'] != 'ok':
+			rows.append([result['name'], result['status'],
+				', '.join(result['missing']), ', '.join(result['unexpected']), ', '.join(result['lame']),
+				result['error'] or ''])
+	if rows:
+		draw_table(rows, ['name', 'status', 'missing', 'unexpected', 'lame', 'error'])
+	click.echo(', '.join('{} {}'.format(count, status) for status, count in counts.items()) or 'Nothing to check.')
+
+
 DEFAULT_COLUMNS = ('name', 'account', 'creation', 'expiry', 'auto_renew')
 @cli.command('list')
 @click.option('-w', '--columns',
@@ -101,16 +327,44 @@ DEFAULT_COLUMNS = ('name', 'account', 'creation', 'expiry', 'auto_renew')
 @click.option('-E', '--expiry-after', help='List only domain names expiring after this date.')
 @click.option('-c', '--creation-before', help='List only domain names created before this date.')
 @click.option('-C', '--creation-after', help='List only domain names created after this date.')
+@click.option('-T', '--tld', help='Comma separated list of TLDs.')
+@click.option('-W', '--where',
+	help='''List only domain names matching this query, e.g. "expiry < now+30d and auto_renew == false".''')
+@click.option('--deadline', type=float,
+	help='Stop retrieving after this many seconds, and list domain names retrieved by then.')
+@click.option('-l', '--local', is_flag=True,
+	help='Search domain names retrieved last time, without any network request.')
+@click.option('--stats', is_flag=True,
+	help='Show limits of requests in flight tuned for each registrar endpoint while retrieving.')
 @click.option('-s', '--sort-by', default='expiry',
 	help='Sort result by specified column. Default is by expiry.')
 @click.option('-o', '--order', type=click.Choice(['desc', 'asc']), default='asc',
 	help='Order of result. Default is ascending (thus earliest expiry first).')
+@click.option('-m', '--memory', type=float,
+	help='''Sort within about this many megabytes of memory, spilling to temporary files beyond it,
+	for very many domain names.''')
+@click.option('--tsv', is_flag=True,
+	help='Print tab separated rows as they come, instead of a table, which has to hold all of them.')
+@click.option('-P', '--cpu-share', type=float,
+	help='Parse large responses in worker processes, on this share of CPU cores, e.g. 0.5.')
+@click.option('-J', '--journal', is_flag=True,
+	help='Record raw responses to the journal, for "omd rebuild" to parse again later.')
+@click.option('--plan', is_flag=True,
+	help='Estimate requests retrieving would make and how long it would take, without making any.')
 @click.argument('criteria', nargs=-1)
 def list_domains(columns, registrars, accounts, account_tags, expiring_in_30_days, 
-	sort_by, order,
+	tld, where, deadline, local, stats, sort_by, order, memory, tsv, cpu_share, journal, plan,
 	**criteria):
 	'''List or search domain names in tracked accounts and manually tracked ones.
 
+	CRITERIA are keywords to search domain names, which may contain wildcards.
+
+	Queries of --where compare fields (name, tld, account, registrar_name,
+	creation, expiry, name_servers, status, lock, auto_renew, whois_privacy)
+	with ==, !=, <, <=, >, >=, in, not in, contains and matches,
+	combined with and, or, not and parentheses. Dates may be relative
+	to now, e.g. now+30d or now-1y.
+
 	All date values are in the form of YYYY-MM-DD.
 	'''
 
@@ -119,8 +373,13 @@ def list_domains(columns, registrars, accounts, account_tags, expiring_in_30_day
 	registrars = registrars and registrars.split(',') or []
 	account_criteria = accounts and accounts.split(',') or []
 	account_tags = account_tags and account_tags.split(',') or []
-	load_manager(manager)
+	load_manager(manager, net_init=not (local or plan))
 	accounts = manager.get_accounts(registrars=registrars, criteria=account_criteria, tags=account_tags)
+	if plan and not local:
+		load_inventory(manager)
+		load_domain_accounts(manager)
+		echo_plan(manager, 'list', accounts=accounts)
+		return
 
 	if columns:
 		columns = columns.split(',')
@@ -131,16 +390,151 @@ def list_domains(columns, registrars, accounts, account_tags, expiring_in_30_day
 	
 	if expiring_in_30_days:
 		criteria['expiry_in'] = 30
+	criteria['search'] = list(criteria.pop('criteria'))
+	criteria['tld'] = tld and tld.split(',') or []
+	if where:
+		try:
+			criteria['where'] = Query(where)
+		except InvalidQuery as e:
+			raise click.BadParameter(str(e), param_hint='--where')
+
+	memory = memory and int(memory * 1024 * 1024)
+	if local and memory:
+		# domain names are not kept in the index, thus memory.
+		domains = manager.sort_domains((domain for domain in iter_inventory(manager, **criteria)
+			if domain.account in accounts), sort_by=sort_by, order=order, memory=memory)
+	elif local:
+		load_inventory(manager, **criteria)
+		# in order already, through the index.
+		domains = [domain for domain in manager.find_domains(sort_by=sort_by, order=order, **criteria)
+			if domain.account in accounts]
+		click.echo('{} domain name{} found.'.format(len(domains), len(domains) > 1 and 's' or ''))
+	else:
+		load_inventory(manager)
+		if cpu_share:
+			manager.parse_pool = ParsePool(share=cpu_share)
+		if journal:
+			manager.journal = Journal(JOURNAL_PATH)
+		count = 0
+		def retrieve():
+			nonlocal count
+			click.echo('Retrieving data for domain # ', nl=False)
+			for domain in manager.iter_domains(accounts=accounts, deadline=deadline, **criteria):
+				click.echo('\b' * len(str(count)), nl=False)
+				count += 1
+				click.echo(count, nl=False)
+				yield domain
+
+		domains = manager.sort_domains(retrieve(), sort_by=sort_by, order=order, memory=memory)
+		# sorting takes all domain names before giving the first.
+		first = next(domains, None)
+		domains = itertools.chain([] if first is None else [first], domains)
+		click.echo('\nDone. {} domain name{} in total.'.format(count, count > 1 and 's' or ''))
+		if manager.parse_pool:
+			manager.parse_pool.shutdown()
+		if manager.journal:
+			manager.journal.close()
+		echo_report(manager)
+		if stats:
+			echo_concurrency(manager, accounts)
+		save_inventory(manager)
+
+	rows = ([getattr(output, k)(domain) for k in columns] for domain in domains)
+	if tsv:
+		click.echo('\t'.join(columns))
+		for row in rows:
+			click.echo('\t'.join(str(value).replace('\n', ',') for value in row))
+	else:
+		draw_table(list(rows), columns)
+
+
+@cli.command('stats', help='''Summarize domain names retrieved last time: renewal calendar,
+breakdowns by registrar and TLD, and those at risk of expiring. Requires numpy.''')
+@click.option('-r', '--registrars', help='Comma separated list of registrars.')
+@click.option('-t', '--account-tags', help='Comma separated list of (part of) account tags.')
+@click.option('-T', '--tld', help='Comma separated list of TLDs.')
+@click.option('-p', '--period', type=click.Choice(['month', 'week']), default='month',
+	help='Period of rows of the renewal calendar. Default is month.')
+@click.option('--horizon', default=365, help='Days ahead the renewal calendar covers. Default is 365.')
+@click.option('--risk-days', default=30,
+	help='Days ahead within which domain names expiring without auto renewal are at risk. Default is 30.')
+@click.option('--json', 'as_json', is_flag=True, help='Print the summary as JSON.')
+def stats(registrars, account_tags, tld, period, horizon, risk_days, as_json):
+	load_manager(manager, net_init=False)
+	accounts = manager.get_accounts(registrars=registrars and registrars.split(',') or [],
+		tags=account_tags and account_tags.split(',') or [])
+	criteria = { 'tld': tld.split(',') } if tld else {}
+	load_inventory(manager, **criteria)
+	domains = (domain for domain in manager.find_domains(**criteria) if domain.account in accounts)
+
+	try:
+		summary = manager.summarize(domains, period=period, horizon=horizon, risk_days=risk_days)
+	except ImportError as e:
+		raise click.ClickException(str(e))
+	if as_json:
+		click.echo(json.dumps(summary, indent=2))
+		return
+
+	click.echo('{total} domain names: {expired} expired, {expiring} expiring in {days} days, '
+		'{at_risk} of which without auto renewal; {auto_renew_off} with auto renewal off, '
+		'{unlocked} unlocked, {no_whois_privacy} without WHOIS privacy.'.format(days=risk_days, **summary))
+	names = [row['name'] for row in summary['registrars']]
+	draw_table(([row['period'], row['domains'], row['auto_renew_off']] + [row['registrars'].get(name, 0) for name in names]
+		for row in summary['calendar']), [period, 'expiring', 'auto renew off'] + names)
+	for key in ('registrars', 'tlds'):
+		draw_table(([row['name'], row['domains'], row['expiring'], row['auto_renew_off'], row['at_risk']]
+			for row in summary[key]), [key[:-1], 'domains', 'expiring', 'auto renew off', 'at risk'])
+
+
+@cli.group()
+def sync(): pass
+
 
-	domains = []
-	click.echo('Retrieving data for domain # ', nl=False)
-	for domain in manager.iter_domains(accounts=accounts, **criteria):
-		click.echo('\b' * len(str(len(domains))), nl=False)
-		domains.append(domain)
-		click.echo(len(domains), nl=False)
-	click.echo('\nDone. {} domain name{} in total.'.format(len(domains), len(domains) > 1 and 's' or ''))
-	domains = sorted(domains, key=lambda domain: domain[sort_by], reverse=order == 'desc')
-	draw_table([[getattr(output, k)(domain) for k in columns] for domain in domains], columns)
+@sync.command('run', help='''Retrieve domain names of all tracked accounts through a work queue,
+processed by local worker processes and those started by "omd sync work".''')
+@click.option('-w', '--workers', default=4, help='Number of local worker processes. Default is 4.')
+@click.option('-q', '--queue', default=str(SYNC_QUEUE_PATH), help='Path to the queue database.')
+@click.option('--lease', default=300, help='Seconds before an unresponsive worker loses its work. Default is 300.')
+@click.option('--plan', is_flag=True, help='Estimate requests it would make and how long it would take, without making any.')
+def run_sync(workers, queue, lease, plan):
+	load_manager(manager, net_init=False)
+	load_inventory(manager)
+	if plan:
+		load_domain_accounts(manager)
+		echo_plan(manager, 'list')
+		return
+	status = manager.sync(queue, processes=workers, lease=lease)
+	save_inventory(manager)
+	for account, state in status.items():
+		click.echo('{}: {}'.format(account, state))
+	click.echo('Done. {} domain names known.'.format(len(manager.index)))
+
+
+@sync.command('work', help='Process work from a queue, e.g. one shared by several hosts.')
+@click.argument('queue', default=str(SYNC_QUEUE_PATH))
+@click.option('--lease', default=300, help='Seconds before an unresponsive worker loses its work. Default is 300.')
+@click.option('-s', '--sync-id', help='Sync to work on. Default is the one started last.')
+def run_sync_worker(queue, lease, sync_id):
+	from ohmydomains.sync import work
+	work(queue, lease=lease, wait=True, checkpoints=str(CHECKPOINTS_PATH), sync_id=sync_id)
+
+
+@cli.command('rebuild', help='''Rebuild the inventory from raw responses recorded by "omd list --journal",
+parsing them again without any network request.''')
+@click.option('-r', '--registrars', help='Comma separated list of registrars.')
+@click.option('-t', '--tags', help='Comma separated list of tags of accounts.')
+def rebuild(registrars, tags):
+	load_manager(manager, net_init=False)
+	accounts = manager.get_accounts(registrars=registrars and registrars.split(',') or [],
+		tags=tags and tags.split(',') or [])
+	load_inventory(manager)
+
+	count = 0
+	for domain in manager.replay_journal(Journal(JOURNAL_PATH), accounts=accounts):
+		count += 1
+	click.echo('{} domain name{} rebuilt.'.format(count, count != 1 and 's' or ''))
+	echo_report(manager)
+	save_inventory(manager)
 
 
 @cli.group()
@@ -153,10 +547,44 @@ LIST_ACCOUNTS_HEADER = ('registrar', 'identifier', 'tags')
 @click.option('-t', '--tags', help='Comma separated list of tags.')
 @click.argument('criteria', nargs=-1)
 def list_accounts(registrars, tags, criteria):
+	registrars = registrars and registrars.split(',') or []
+	tags = tags and tags.split(',') or []
 	load_manager(manager, net_init=False)
 	accounts = manager.get_accounts(registrars=registrars, tags=tags, criteria=criteria)
 	table = ((account.REGISTRAR_NAME, (account.identifier + (account.is_testing_account and '(testing)' or '')), ','.join(account.tags)) for account in accounts)
-	draw_table(table, headers=LIST_ACCOUNTS_HEADER)
+	draw_table(table, LIST_ACCOUNTS_HEADER)
+
+
+@accounts.command('check', help='Check credentials of accounts and latency of registrar endpoints.')
+@click.option('-r', '--registrars', help='Comma separated list of registrars.')
+@click.option('-t', '--tags', help='Comma separated list of tags.')
+@click.option('-n', '--probes', default=3, help='Number of requests to time per endpoint. Default is 3.')
+@click.option('--timeout', default=10, help='Seconds to wait for each request. Default is 10.')
+@click.option('-w', '--workers', default=8, help='Maximum number of requests in flight. Default is 8.')
+@click.argument('criteria', nargs=-1)
+def check_accounts(registrars, tags, probes, timeout, workers, criteria):
+	from ohmydomains.health import PHASES, PERCENTILES
+
+	registrars = registrars and registrars.split(',') or []
+	tags = tags and tags.split(',') or []
+	load_manager(manager)
+	accounts = manager.get_accounts(registrars=registrars, tags=tags, criteria=criteria)
+	report = manager.check_accounts(accounts=accounts, probes=probes, timeout=timeout, workers=workers)
+
+	def seconds(value):
+		return value is None and '-' or '{:.0f}ms'.format(value * 1000)
+
+	draw_table(([
+		account,
+		result['error'] and 'failed' or { True: 'valid', False: 'invalid', None: 'timed out' }[result['valid']],
+		seconds(result['elapsed']),
+		result['error'] or '',
+	] for account, result in report['accounts'].items()), ('account', 'credentials', 'elapsed', 'error'))
+
+	draw_table(([endpoint] + [
+		'/'.join(seconds(result[phase][rank]) for rank in PERCENTILES) for phase in PHASES
+	] + ['{}/{}'.format(len(result['errors']), result['probes'])] for endpoint, result in report['endpoints'].items()),
+		['endpoint'] + ['{} p{}'.format(phase, '/'.join(map(str, PERCENTILES))) for phase in PHASES] + ['failed'])
 
 
 @accounts.command('track', help='''Track a registrar account.
@@ -210,12 +638,52 @@ def track_account(registrar, credentials, tags, testing):
 	if tags:
 		account.tags = tags.split(',')
 	
-	load_manager(manager, net_init=False)
-	manager.add_accounts(account)
-	save_manager(manager)
+	config_store().put_accounts(account)
 	click.echo('Account tracked.')
 
 
+@accounts.command('import', help='''Track many registrar accounts at once, from a CSV, JSON or TOML file.
+
+Each account has a registrar, its credentials, and optionally tags and
+whether it is a testing account. CSV files have a column for each of
+them, credentials being all other columns, e.g. "registrar,username,token,tags";
+JSON and TOML files have records as the config file does, "accounts".
+
+Credentials are checked concurrently, and only accounts with valid ones are tracked.
+''')
+@click.argument('file', type=click.Path(exists=True, dir_okay=False))
+@click.option('-f', '--format', type=click.Choice(FORMATS), help='Format of FILE. Default is as of its extension.')
+@click.option('-t', '--tags', help='Comma separated list of tags to add to all accounts.')
+@click.option('--no-validate', is_flag=True, help='Track accounts without checking their credentials.')
+@click.option('-w', '--workers', default=16, help='Maximum number of accounts checked at a time. Default is 16.')
+@click.option('--timeout', default=10, help='Seconds to wait for each check. Default is 10.')
+@click.option('--rate', type=float, help='Maximum number of checks per second per registrar.')
+def import_accounts(file, format, tags, no_validate, workers, timeout, rate):
+	try:
+		records = read_account_records(file, format)
+	except ValueError as e:
+		raise click.BadParameter(str(e), param_hint='FILE')
+
+	load_manager(manager, net_init=False)
+	tracked = set(manager.accounts)
+	results = manager.import_accounts(records,
+		tags=tags and tags.split(',') or [],
+		validate=not no_validate,
+		workers=workers,
+		timeout=timeout,
+		rate_limit=rate and (rate, 1))
+	config_store().put_accounts(*(account for account in manager.accounts if account not in tracked))
+
+	failed = [result for result in results if result['status'] != 'imported']
+	if failed:
+		draw_table(([result['row'], result['registrar'] or '-', result['account'] or '-', result['status'], result['error'] or '']
+			for result in failed), ['row', 'registrar', 'account', 'status', 'error'])
+	counts = {}
+	for result in results:
+		counts[result['status']] = counts.get(result['status'], 0) + 1
+	click.echo(', '.join('{} {}'.format(count, status) for status, count in counts.items()) or 'No accounts found.')
+
+
 @accounts.command('untrack')
 @click.argument('criteria', nargs=-1, required=True)
 def untrack_accounts(criteria):
@@ -227,8 +695,7 @@ def untrack_accounts(criteria):
 	for account in to_be_untracked:
 		if not click.confirm('Are you sure you want to untrack the {} account {}?'.format(account.REGISTRAR_NAME, account.identifier)):
 			to_be_untracked.remove(account)
-	manager.delete_accounts(*to_be_untracked)
-	save_manager(manager)
+	config_store().delete_accounts(*to_be_untracked)
 	click.echo('Accounts untracked.')
 
 
@@ -250,7 +717,7 @@ def tag_accounts(tags, registrars, criteria):
 			if tag not in account.tags:
 				account.tags.append(tag)
 		click.echo('Tagged account {}'.format(account.unique_identifier))
-	save_manager(manager)
+	config_store().put_accounts(*accounts)
 
 
 @accounts.command('untag')
@@ -269,9 +736,31 @@ def untag_accounts(tags, registrars, criteria):
 			if tag in account.tags:
 				account.tags.remove(tag)
 		click.echo('Untagged account {}'.format(account.unique_identifier))
-	save_manager(manager)
+	config_store().put_accounts(*accounts)
 
 
+@cli.group(help='''Export or import the config: tracked accounts, raw domain names, and settings
+such as "timeouts" and "transports", as TOML, e.g. to edit or back it up.''')
+def config(): pass
+
+
+@config.command('export', help='Write the config to FILE, replacing it at once.')
+@click.argument('file', type=click.Path(dir_okay=False))
+def export_config(file):
+	config_store().export_toml(file)
+	click.echo('Config exported.')
+
+
+@config.command('import', help='Replace the config with that of FILE, as written by "omd config export".')
+@click.argument('file', type=click.Path(exists=True, dir_okay=False))
+@click.option('-m', '--merge', is_flag=True, help='Add accounts, raw domain names and settings of FILE to the config instead, updating those already in it.')
+def import_config(file, merge):
+	try:
+		config_store().import_toml(file, replace=not merge)
+	except toml.TomlDecodeError as e:
+		raise click.BadParameter(str(e), param_hint='FILE')
+	click.echo('Config imported.')
+
 
 @accounts.command('update')
 def update_account():
@@ -1,3 +1,8 @@
+DOMAIN_COLUMNS = ('name', 'account', 'registrar_name', 'creation', 'expiry', 'name_servers', 'status',
+	'lock', 'auto_renew', 'whois_privacy', 'contacts')
+'''Columns available, in the order to show a single domain name.'''
+
+
 def name(domain): return domain.name
 def registrar_name(domain): return domain.registrar_name
 def creation(domain): return domain.creation.to_date_string()
@@ -20,4 +25,4 @@ def account(domain): return domain.account.unique_identifier + (domain.account.i
 
 
 def contacts(domain):
-	return '\n'.join(domain.contacts.registrant[field] for field in domain.contacts.registrant.FIELDS)
+	return '\n'.join(domain.contacts.registrant[field] or '' for field in domain.contacts.registrant.FIELDS)
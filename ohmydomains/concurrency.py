@@ -0,0 +1,149 @@
+'''Adaptive limits of requests in flight per registrar endpoint.'''
+
+import time
+import threading
+
+
+OUTCOMES = ('ok', 'throttled', 'error')
+'''Outcomes of requests reported to limiters: answered, answered with 429,
+or failed otherwise, e.g. with 5xx or timing out.'''
+
+
+class AdaptiveLimiter:
+	'''Limit requests in flight, tuning the limit by additive increase,
+	multiplicative decrease (AIMD), as TCP congestion control does.
+
+	Starting from `initial`, the limit doubles every round trip until
+	the first sign of congestion, then grows by `increase` per round trip,
+	i.e. once per as many answers as the limit. It is cut by `decrease`
+	on throttling, errors, or latency rising over `tolerance` times its
+	baseline, at most once per round trip, since requests in flight then
+	were sent under the limit being cut.
+
+	* `initial`, `minimum`, `maximum`: the limit, and its bounds.
+	* `increase`: requests added to the limit per round trip.
+	* `decrease`: factor the limit is multiplied by when cut.
+	* `tolerance`: factor of the baseline latency above which latency is rising.
+	* `smoothing`: weight of each answer in the moving average of latency.
+
+	It is safe to use from multiple threads.
+	'''
+
+	def __init__(self, initial=1, minimum=1, maximum=16, increase=1, decrease=0.5, tolerance=2, smoothing=0.2):
+		self.minimum = minimum
+		self.maximum = maximum
+		self.increase = increase
+		self.decrease = decrease
+		self.tolerance = tolerance
+		self.smoothing = smoothing
+
+		self.limit = float(max(minimum, min(initial, maximum)))
+		self.in_flight = 0
+		self.latency = None
+		'''Moving average of latency of answers, in seconds.'''
+		self.baseline = None
+		'''Lowest latency seen lately, following rises slowly.'''
+		self.slow_start = True
+		self.counts = { outcome: 0 for outcome in OUTCOMES }
+		self.cuts = 0
+		self._cut_at = 0
+		self._condition = threading.Condition()
+
+	def acquire(self, deadline=None):
+		'''Block until fewer requests than the limit are in flight, returning
+		`True`, or `False` if that does not happen before `deadline`,
+		as of `time.monotonic()`.
+		'''
+
+		with self._condition:
+			while self.in_flight >= int(self.limit):
+				if deadline is None:
+					self._condition.wait()
+					continue
+				remaining = deadline - time.monotonic()
+				if remaining <= 0:
+					return False
+				self._condition.wait(remaining)
+			self.in_flight += 1
+			return True
+
+	def release(self, latency=None, outcome='ok'):
+		'''Tell a request acquired for is done, having taken `latency` seconds,
+		with `outcome`, one of `OUTCOMES`, or `None` if it tells nothing
+		about the endpoint, e.g. it was abandoned.
+		'''
+
+		with self._condition:
+			self.in_flight -= 1
+			if outcome is not None:
+				self.counts[outcome] += 1
+			if outcome == 'ok' and latency is not None:
+				self._answered(latency)
+			elif outcome is not None:
+				self._cut()
+			self._condition.notify_all()
+
+	def _answered(self, latency):
+		if self.latency is None:
+			self.latency = self.baseline = latency
+		else:
+			self.latency += (latency - self.latency) * self.smoothing
+			# drop to lower latencies at once, rise to higher ones slowly,
+			# so that a changing endpoint gets a new baseline eventually.
+			self.baseline = min(self.latency, self.baseline + (self.latency - self.baseline) * self.smoothing / 10)
+
+		if self.latency > self.baseline * self.tolerance:
+			self._cut()
+		elif self.slow_start:
+			self.limit = min(self.maximum, self.limit + 1)
+		else:
+			self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+
+	def _cut(self):
+		now = time.monotonic()
+		if now - self._cut_at < (self.latency or 0):
+			return
+		self._cut_at = now
+		self.slow_start = False
+		self.limit = max(self.minimum, self.limit * self.decrease)
+		self.cuts += 1
+
+	def stats(self):
+		'''Current state, as a `dict`.'''
+
+		with self._condition:
+			return {
+				'limit': int(self.limit),
+				'minimum': self.minimum,
+				'maximum': self.maximum,
+				'in_flight': self.in_flight,
+				'latency': self.latency,
+				'baseline': self.baseline,
+				'slow_start': self.slow_start,
+				'cuts': self.cuts,
+				**self.counts,
+			}
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(endpoint, **options):
+	'''The limiter of `endpoint`, shared by all accounts requesting it
+	in this process, created with `options` if there is none yet.'''
+
+	with _limiters_lock:
+		limiter = _limiters.get(endpoint, None)
+		if limiter is None:
+			limiter = _limiters[endpoint] = AdaptiveLimiter(**options)
+		return limiter
+
+
+def limiter_stats(endpoints=None):
+	'''Stats of limiters of `endpoints`, or of all, by endpoint.'''
+
+	with _limiters_lock:
+		limiters = dict(_limiters)
+	return { endpoint: limiter.stats() for endpoint, limiter in limiters.items()
+		if endpoints is None or endpoint in endpoints }
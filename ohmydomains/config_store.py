@@ -0,0 +1,197 @@
+'''Config of the CLI, tracked accounts, raw domain names and settings,
+in an SQLite database, each account a row of its own, so tracking,
+untracking or tagging accounts writes only rows of those accounts,
+whatever the number of accounts tracked.
+
+Each change is a transaction: concurrent processes, e.g. a scheduled sync
+and an interactive `omd`, wait for each other's, rather than losing or
+corrupting them, and a crash leaves the previous config in place.
+
+Configs can be imported from, and exported to, TOML files, as `config.toml`
+was: `accounts`, records as of `RegistrarAccount.export()`, `raw_domains`,
+and other top-level entries, e.g. `timeouts` and `transports`, as settings.
+'''
+
+import os
+import json
+import sqlite3
+import tempfile
+from pathlib import Path
+import toml
+from ohmydomains.registrars import account_from_export
+
+
+def account_key(account):
+	'''Key of an account, or a record of one, in the store:
+	a tuple of registrar, identifier, and whether it is a testing account.'''
+
+	if isinstance(account, dict):
+		account = account_from_export(account, net_init=False)
+	return account.REGISTRAR, account.identifier, int(bool(account.is_testing_account))
+
+
+def write_atomically(path, text):
+	'''Replace the content of file `path` with `text` at once, so readers
+	see either the old content or the new one, even after a crash.'''
+
+	path = Path(path)
+	fd, temp = tempfile.mkstemp(dir=str(path.parent), prefix=path.name + '.', suffix='.tmp')
+	try:
+		with os.fdopen(fd, 'w') as f:
+			f.write(text)
+			f.flush()
+			os.fsync(f.fileno())
+		os.replace(temp, str(path))
+	except:
+		os.remove(temp)
+		raise
+
+
+class ConfigStore:
+	'''Config in an SQLite database at `path`, created if not existing.
+
+	* `legacy`: path to a TOML config, imported if the database is new,
+	then renamed with a suffix of `.imported`, not to be mistaken for the config.
+	'''
+
+	SCHEMA = '''
+		CREATE TABLE IF NOT EXISTS accounts (
+			id INTEGER PRIMARY KEY,
+			registrar TEXT NOT NULL,
+			identifier TEXT NOT NULL,
+			testing INTEGER NOT NULL,
+			record TEXT NOT NULL,
+			UNIQUE (registrar, identifier, testing)
+		);
+		CREATE TABLE IF NOT EXISTS raw_domains (
+			id INTEGER PRIMARY KEY,
+			name TEXT NOT NULL UNIQUE
+		);
+		CREATE TABLE IF NOT EXISTS settings (
+			name TEXT PRIMARY KEY,
+			value TEXT NOT NULL
+		);
+	'''
+
+	VERSION = 1
+
+	def __init__(self, path, legacy=None):
+		self.path = str(path)
+		self._db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+		self._db.execute('PRAGMA journal_mode=WAL')
+		self._db.executescript(self.SCHEMA)
+
+		self._begin()
+		try:
+			if self._db.execute('PRAGMA user_version').fetchone()[0] == 0:
+				legacy = legacy and Path(legacy)
+				if legacy and legacy.exists():
+					self._import(toml.loads(legacy.read_text()), replace=True)
+					os.replace(str(legacy), str(legacy) + '.imported')
+				self._db.execute('PRAGMA user_version = {}'.format(self.VERSION))
+			self._db.execute('COMMIT')
+		except:
+			self._db.execute('ROLLBACK')
+			raise
+
+	def close(self):
+		self._db.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def _begin(self):
+		# take the write lock up front, so transactions reading before
+		# writing do not fail upon a concurrent write.
+		self._db.execute('BEGIN IMMEDIATE')
+
+	def accounts(self):
+		'''Records of accounts, in the order they were first added.'''
+
+		return [json.loads(row[0]) for row in self._db.execute('SELECT record FROM accounts ORDER BY id')]
+
+	def raw_domains(self):
+		return [row[0] for row in self._db.execute('SELECT name FROM raw_domains ORDER BY id')]
+
+	def settings(self):
+		'''Settings, e.g. `timeouts` and `transports`, as a `dict` by name.'''
+
+		return { name: json.loads(value) for name, value in self._db.execute('SELECT name, value FROM settings ORDER BY name') }
+
+	def load(self):
+		'''The whole config, as a `dict` in the shape of a TOML config.'''
+
+		self._db.execute('BEGIN')
+		try:
+			return dict(self.settings(), accounts=self.accounts(), raw_domains=self.raw_domains())
+		finally:
+			self._db.execute('COMMIT')
+
+	def _put_accounts(self, records):
+		self._db.executemany('''
+			INSERT INTO accounts (registrar, identifier, testing, record) VALUES (?, ?, ?, ?)
+			ON CONFLICT (registrar, identifier, testing) DO UPDATE SET record = excluded.record
+		''', ((*account_key(record), json.dumps(record)) for record in records))
+
+	def put_accounts(self, *accounts):
+		'''Add accounts, or update those already in the store, e.g. their tags.'''
+
+		with self._db:
+			self._begin()
+			self._put_accounts(account.export() for account in accounts)
+
+	def delete_accounts(self, *accounts):
+		with self._db:
+			self._begin()
+			self._db.executemany('DELETE FROM accounts WHERE registrar = ? AND identifier = ? AND testing = ?',
+				(account_key(account) for account in accounts))
+
+	def add_raw_domains(self, *names):
+		with self._db:
+			self._begin()
+			self._db.executemany('INSERT OR IGNORE INTO raw_domains (name) VALUES (?)', ((name,) for name in names))
+
+	def delete_raw_domains(self, *names):
+		with self._db:
+			self._begin()
+			self._db.executemany('DELETE FROM raw_domains WHERE name = ?', ((name,) for name in names))
+
+	def set_setting(self, name, value):
+		'''Set setting `name` to `value`, any TOML value, or delete it if `None`.'''
+
+		with self._db:
+			self._begin()
+			if value is None:
+				self._db.execute('DELETE FROM settings WHERE name = ?', (name,))
+			else:
+				self._db.execute('INSERT OR REPLACE INTO settings (name, value) VALUES (?, ?)', (name, json.dumps(value)))
+
+	def _import(self, data, replace):
+		if replace:
+			for table in ('accounts', 'raw_domains', 'settings'):
+				self._db.execute('DELETE FROM {}'.format(table))
+		self._put_accounts(data.get('accounts', None) or [])
+		self._db.executemany('INSERT OR IGNORE INTO raw_domains (name) VALUES (?)',
+			((name,) for name in data.get('raw_domains', None) or []))
+		self._db.executemany('INSERT OR REPLACE INTO settings (name, value) VALUES (?, ?)',
+			((name, json.dumps(value)) for name, value in data.items() if name not in ('accounts', 'raw_domains')))
+
+	def import_toml(self, path, replace=True):
+		'''Import the config of TOML file `path`, all at once.
+
+		* `replace`: whether to replace the whole config, or else add accounts
+		and raw domain names, updating those already in the store, and settings.
+		'''
+
+		data = toml.loads(Path(path).read_text())
+		with self._db:
+			self._begin()
+			self._import(data, replace)
+
+	def export_toml(self, path):
+		'''Export the config to TOML file `path`, replacing it at once.'''
+
+		write_atomically(path, toml.dumps(self.load()))
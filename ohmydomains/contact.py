@@ -1,7 +1,112 @@
+import weakref
+import threading
 from ohmydomains.util import ObjectDict
 
 
-class Contact(ObjectDict):
+def _interned_key(obj):
+	try:
+		return InternableObjectDict._key.__get__(obj)
+	except AttributeError:
+		return None
+
+
+class InternableObjectDict(ObjectDict):
+	'''`ObjectDict` which can be interned, i.e. made immutable and shared
+	by all equal ones, through `interned()` of subclasses.
+
+	Interned ones are hashable, and compare by identity among themselves.
+	'''
+
+	__slots__ = ('_key',)
+
+	_interned = None
+	_interning_lock = None
+
+	@classmethod
+	def _intern(cls, key, build):
+		'''Get the interned instance for `key`, calling `build` to create it if missing.'''
+
+		try:
+			hash(key)
+		except TypeError:
+			# unhashable values, can't be shared.
+			return build()
+
+		with cls._interning_lock:
+			instance = cls._interned.get(key, None)
+			if instance is None:
+				instance = build()
+				object.__setattr__(instance, '_key', key)
+				cls._interned[key] = instance
+			return instance
+
+	def is_interned(self):
+		return _interned_key(self) is not None
+
+	def _check_mutable(self):
+		if _interned_key(self) is not None:
+			raise TypeError('{} is interned and immutable, use replace() to get a changed copy.'.format(
+				self.__class__.__name__))
+
+	def __setitem__(self, key, value):
+		self._check_mutable()
+		super().__setitem__(key, value)
+
+	def __delitem__(self, key):
+		self._check_mutable()
+		super().__delitem__(key)
+
+	def __setattr__(self, key, value):
+		self._check_mutable()
+		super().__setattr__(key, value)
+
+	def __delattr__(self, key):
+		self._check_mutable()
+		super().__delattr__(key)
+
+	def update(self, *args, **kwargs):
+		self._check_mutable()
+		super().update(*args, **kwargs)
+
+	def pop(self, *args):
+		self._check_mutable()
+		return super().pop(*args)
+
+	def popitem(self):
+		self._check_mutable()
+		return super().popitem()
+
+	def setdefault(self, *args):
+		self._check_mutable()
+		return super().setdefault(*args)
+
+	def clear(self):
+		self._check_mutable()
+		super().clear()
+
+	def __eq__(self, other):
+		if self is other:
+			return True
+		if type(self) is type(other) and _interned_key(self) is not None and _interned_key(other) is not None:
+			return False
+		return dict.__eq__(self, other)
+
+	def __ne__(self, other):
+		return not self.__eq__(other)
+
+	def __hash__(self):
+		key = _interned_key(self)
+		if key is None:
+			raise TypeError('unhashable type: {} which is not interned'.format(self.__class__.__name__))
+		return hash(key)
+
+	def __reduce__(self):
+		if _interned_key(self) is None:
+			return (self.__class__, (dict(self),))
+		return (self.__class__.interned, (dict(self),))
+
+
+class Contact(InternableObjectDict):
 	'''Internal class holding contact information for a specific kind.
 	'''
 
@@ -12,28 +117,89 @@ class Contact(ObjectDict):
 		'phone', 'phone_ext', 'email',
 	)
 
+	_interned = weakref.WeakValueDictionary()
+	_interning_lock = threading.Lock()
+
 	def __init__(self, *args, **data):
 		if len(args) > 0 and isinstance(args[0], dict):
-			contacts = args[0]
+			data = dict(args[0], **data)
 		data = { key: value for key, value in data.items() if key in self.FIELDS }
 		super().__init__(data)
 		for key in self.FIELDS:
 			if key not in self:
 				self[key] = None
 
+	@classmethod
+	def interned(cls, *args, **data):
+		'''Get the shared, immutable contact with provided information.'''
+
+		if len(args) > 0 and isinstance(args[0], Contact) and _interned_key(args[0]) is not None and not data:
+			return args[0]
+		if len(args) > 0 and isinstance(args[0], dict):
+			data = dict(args[0], **data)
+
+		key = tuple(data.get(field, None) for field in cls.FIELDS)
+		return cls._intern(key, lambda: cls(data))
+
+	def replace(self, **changes):
+		'''Get the interned contact with `changes` applied.'''
+
+		return self.interned(dict(self, **changes))
 
-class ContactList(ObjectDict):
+
+class ContactList(InternableObjectDict):
 	'''Internal class holding four kinds of domain contacts.'''
 
 	KINDS = ('registrant', 'technical', 'administrative', 'billing')
 
+	_interned = weakref.WeakValueDictionary()
+	_interning_lock = threading.Lock()
+
 	def __init__(self, *args, **contacts):
 		if len(args) > 0 and isinstance(args[0], dict):
 			contacts = args[0]
-		for kind in self.KINDS:
-			self.__dict__[kind] = contacts.get(kind, None) or Contact(kind=kind)
+		super().__init__({ kind: contacts.get(kind, None) or Contact(kind=kind) for kind in self.KINDS })
 
 	def __getattr__(self, key):
 		if key in self.KINDS:
 			return self[key]
 
+	@classmethod
+	def interned(cls, *args, **contacts):
+		'''Get the shared, immutable contact list with provided contacts,
+		which are interned as well.
+
+		Each contact may be a `Contact` or a `dict`.
+		'''
+
+		if len(args) > 0 and isinstance(args[0], dict):
+			contacts = args[0]
+		contacts = { kind: Contact.interned(contacts.get(kind, None) or { 'kind': kind }) for kind in cls.KINDS }
+
+		key = tuple(_interned_key(contacts[kind]) for kind in cls.KINDS)
+		return cls._intern(key, lambda: cls(contacts))
+
+	def replace(self, **changes):
+		'''Get the interned contact list with `changes` applied.
+
+		Each change is keyed by kind, and is a `Contact` replacing the current one,
+		or a `dict` of fields to change in it.
+		'''
+
+		contacts = {}
+		for kind in self.KINDS:
+			change = changes.get(kind, None)
+			if isinstance(change, Contact):
+				contacts[kind] = change
+			elif change:
+				contacts[kind] = Contact.interned(dict(self[kind], **change))
+			else:
+				contacts[kind] = self[kind]
+		return self.interned(contacts)
+
+	def export(self):
+		return { kind: dict(self[kind]) for kind in self.KINDS }
+
+	@classmethod
+	def from_export(cls, record):
+		return cls.interned(record)
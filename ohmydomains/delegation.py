@@ -0,0 +1,212 @@
+'''Verify that name servers delegated to domain names at their TLD
+are those registrars report, and that they answer for them.
+
+Requires the `dns` extra: `pip install ohmydomains[dns]`.
+'''
+
+import asyncio
+
+
+STATUSES = ('ok', 'mismatch', 'lame', 'error')
+
+
+def _host(name):
+	return str(name).lower().rstrip('.')
+
+
+class DelegationChecker:
+	'''Check delegations of many domain names concurrently,
+	through `asyncio` and `dnspython`.
+
+	For each domain name, a name server of its TLD is asked for the
+	delegation, which is compared with `Domain.name_servers`; then each
+	delegated name server is asked for the SOA record, and is lame if
+	it does not answer authoritatively.
+
+	Answers are shared by all domain names checked in a run,
+	e.g. TLD name servers and addresses of name servers.
+
+	* `nameservers`: addresses of recursive resolvers to look up TLD name
+	servers and addresses with. If omitted, those of the system.
+	* `port`: port of all name servers, resolvers included. Other than 53,
+	it is mostly useful for testing against a local stand-in server.
+	* `concurrency`: maximum number of queries in flight.
+	* `timeout`: seconds to wait for each query.
+	* `tries`: number of times to send a query before giving up,
+	as UDP queries may be lost.
+	* `check_lame`: whether to ask delegated name servers.
+	'''
+
+	def __init__(self, nameservers=None, port=53, concurrency=100, timeout=3, tries=2, check_lame=True):
+		try:
+			import dns.asyncquery
+			import dns.asyncresolver
+			import dns.exception
+			import dns.flags
+			import dns.message
+			import dns.rcode
+			import dns.rdatatype
+			import dns.resolver
+		except ImportError:
+			raise ImportError('Verifying delegations requires dnspython; try `pip install ohmydomains[dns]`.')
+
+		self._dns = dns
+		self.nameservers = nameservers
+		self.port = port
+		self.concurrency = concurrency
+		self.timeout = timeout
+		self.tries = tries
+		self.check_lame = check_lame
+
+	async def _query(self, address, name, rdtype):
+		dns = self._dns
+		query = dns.message.make_query(name, rdtype)
+		query.flags &= ~dns.flags.RD
+		response = None
+		async with self._semaphore:
+			for i in range(self.tries):
+				try:
+					response = await dns.asyncquery.udp(query, address, timeout=self.timeout, port=self.port)
+					break
+				except dns.exception.Timeout:
+					if i == self.tries - 1:
+						raise
+			if response is None:
+				raise dns.exception.Timeout()
+			if response.flags & dns.flags.TC:
+				response = await dns.asyncquery.tcp(query, address, timeout=self.timeout, port=self.port)
+		return response
+
+	async def _resolve(self, name, rdtype):
+		resolver = self._dns.resolver
+		async with self._semaphore:
+			try:
+				answer = await self._resolver.resolve(name, rdtype)
+			except (resolver.NXDOMAIN, resolver.NoAnswer, resolver.NoNameservers):
+				# no such records, or none to be had.
+				return []
+		return [rdata.to_text() for rdata in answer]
+
+	def _cached(self, key, function, *args):
+		'''Run `function(*args)` once per run for `key`, concurrent callers sharing it.'''
+
+		task = self._cache.get(key, None)
+		if task is None:
+			task = self._cache[key] = asyncio.ensure_future(function(*args))
+		return task
+
+	async def _addresses(self, host):
+		'''IPv4 and IPv6 addresses of `host`, from glue if any.'''
+
+		addresses = self._glue.get(host, None)
+		if addresses:
+			return addresses
+		ipv4, ipv6 = await asyncio.gather(*(self._cached((rdtype, host), self._resolve, host + '.', rdtype)
+			for rdtype in ('A', 'AAAA')))
+		return ipv4 + ipv6
+
+	async def _tld_servers(self, tld):
+		hosts = await self._cached(('NS', tld), self._resolve, tld + '.', 'NS')
+		addresses = []
+		for host in hosts:
+			addresses.extend(await self._addresses(_host(host)))
+		return addresses
+
+	async def _delegation(self, name, tld):
+		'''Name servers delegated to `name` at its TLD, trying each of its name servers.'''
+
+		dns = self._dns
+		error = None
+		for address in await self._tld_servers(tld):
+			try:
+				response = await self._query(address, name + '.', 'NS')
+			except (dns.exception.DNSException, OSError) as e:
+				error = e
+				continue
+			if response.rcode() == dns.rcode.NXDOMAIN:
+				return []
+
+			hosts = set()
+			# a referral, or an answer if the server is also authoritative for the domain.
+			for rrset in response.authority + response.answer:
+				if rrset.rdtype == dns.rdatatype.NS and _host(rrset.name) == name:
+					hosts.update(_host(rdata.target) for rdata in rrset)
+			glue = {}
+			for rrset in response.additional:
+				if rrset.rdtype in (dns.rdatatype.A, dns.rdatatype.AAAA):
+					glue.setdefault(_host(rrset.name), []).extend(rdata.address for rdata in rrset)
+			for host, addresses in glue.items():
+				self._glue.setdefault(host, addresses)
+			return sorted(hosts)
+		raise error or LookupError('No name server found for {}'.format(tld))
+
+	async def _is_lame(self, host, name):
+		dns = self._dns
+		for address in await self._addresses(host):
+			try:
+				response = await self._query(address, name + '.', 'SOA')
+			except (dns.exception.DNSException, OSError):
+				continue
+			return not (response.rcode() == dns.rcode.NOERROR and response.flags & dns.flags.AA)
+		return True
+
+	async def _verify(self, domain):
+		name = domain.name.lower().rstrip('.')
+		tld = (domain.tld or '.' + name.rsplit('.', 1)[-1]).lower().strip('.')
+		expected = sorted({ _host(host) for host in domain.name_servers or [] })
+		result = {
+			'name': name,
+			'expected': expected,
+			'delegated': None,
+			'missing': [],
+			'unexpected': [],
+			'lame': [],
+			'status': 'ok',
+			'error': None,
+		}
+
+		try:
+			delegated = result['delegated'] = await self._delegation(name, tld)
+			if self.check_lame:
+				lame = await asyncio.gather(*(self._is_lame(host, name) for host in delegated))
+				result['lame'] = [host for host, is_lame in zip(delegated, lame) if is_lame]
+		except Exception as e:
+			result['status'], result['error'] = 'error', repr(e)
+			return result
+
+		result['missing'] = [host for host in expected if host not in delegated]
+		result['unexpected'] = [host for host in delegated if host not in expected]
+		if not delegated or result['missing'] or result['unexpected']:
+			result['status'] = 'mismatch'
+		elif result['lame']:
+			result['status'] = 'lame'
+		return result
+
+	async def _verify_all(self, domains):
+		self._semaphore = asyncio.Semaphore(self.concurrency)
+		self._cache = {}
+		self._glue = {}
+		self._resolver = self._dns.asyncresolver.Resolver(configure=not self.nameservers)
+		if self.nameservers:
+			self._resolver.nameservers = list(self.nameservers)
+		self._resolver.port = self.port
+		self._resolver.lifetime = self.timeout
+
+		return await asyncio.gather(*(self._verify(domain) for domain in domains))
+
+	def verify(self, domains):
+		'''Check delegations of `domain`s, returning a list of `dict`s,
+		in the same order, of:
+
+		* `name`
+		* `expected`: name servers the registrar reports, sorted.
+		* `delegated`: name servers delegated at the TLD, sorted,
+		or `None` if they could not be found.
+		* `missing`, `unexpected`: name servers expected but not delegated,
+		and the other way round.
+		* `lame`: delegated name servers not answering authoritatively.
+		* `status`: one of `STATUSES`.
+		* `error`: why delegated name servers could not be found, if so.
+		'''
+
+		return asyncio.run(self._verify_all(list(domains)))
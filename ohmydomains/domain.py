@@ -1,4 +1,6 @@
+import pendulum
 from ohmydomains.util import ObjectDict
+from ohmydomains.contact import ContactList
 
 
 class Domain(ObjectDict):
@@ -34,14 +36,66 @@ class Domain(ObjectDict):
 
 		self.tld = self.name[self.name.index('.'):]
 
-	def update_contacts(self, contacts=None):
+	@classmethod
+	def from_fields(cls, values):
+		'''Build from a `dict` of every one of `FIELDS`, as converters of
+		`ohmydomains.mapping` give, without checking them.'''
+
+		name = values['name']
+		values['tld'] = name[name.index('.'):]
+		domain = dict.__new__(cls)
+		dict.update(domain, values)
+		domain.__dict__.update(values)
+		return domain
+
+	def export(self):
+		'''Export to a plain `dict`, with the account replaced by its
+		unique identifier and dates by ISO 8601 strings.
+		'''
+
+		record = { key: self[key] for key in self.FIELDS if key not in ('account', 'contacts') }
+		for key in ('creation', 'expiry'):
+			if record[key] is not None:
+				record[key] = record[key].to_iso8601_string()
+		if record['name_servers'] is not None:
+			record['name_servers'] = list(record['name_servers'])
+		record['account'] = self.account and self.account.unique_identifier
+		record['contacts'] = self.contacts.export() if self.contacts is not None else None
+		return record
+
+	@classmethod
+	def from_export(cls, record, account=None):
+		'''Rebuild a domain from the result of `export()`.'''
+
+		data = dict(record)
+		for key in ('creation', 'expiry'):
+			if data.get(key, None):
+				data[key] = pendulum.parse(data[key])
+		contacts = data.pop('contacts', None)
+		data.pop('account', None)
+		return cls(
+			contacts=ContactList.from_export(contacts or {}),
+			account=account,
+			**data)
+
+	def update_contacts(self, contacts=None, **changes):
 		'''Try updating contacts of this domain name to registrar.
+
+		* `contacts`: a `ContactList`. If omitted, current contacts with
+		`changes` applied, each keyed by kind and being a `Contact` or
+		a `dict` of fields to change, e.g. `registrant={ 'email': ... }`.
+
+		Contacts are shared between domain names, thus never changed in place;
+		this domain name gets a changed copy instead, once the registrar
+		reports it updated.
 		'''
 
 		try:
 			if not contacts:
-				contacts = self.contacts
-			self.account.update_contacts([self.name], contacts)
+				contacts = self.contacts.replace(**changes)
+			finished = self.account.update_contacts([self.name], contacts) or []
+			if self.name in finished:
+				self.contacts = contacts
 		except:
 			pass
 
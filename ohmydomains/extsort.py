@@ -0,0 +1,77 @@
+'''Sort more items than fit in memory, spilling sorted runs of
+compact records to temporary files and merging them.'''
+
+import os
+import heapq
+import pickle
+import tempfile
+from operator import itemgetter
+
+
+SORT_MEMORY = 64 * 1024 * 1024
+'''Default memory budget of `external_sort()`, in bytes.'''
+
+RECORD_OVERHEAD = 128
+'''Estimated bytes of memory a record takes besides its encoded item.'''
+
+
+def _write_run(directory, records):
+	fd, path = tempfile.mkstemp(dir=directory, suffix='.run')
+	with os.fdopen(fd, 'wb') as f:
+		pickler = pickle.Pickler(f, pickle.HIGHEST_PROTOCOL)
+		for record in records:
+			pickler.dump(record)
+	return path
+
+
+def _read_run(path):
+	with open(path, 'rb', buffering=1024 * 1024) as f:
+		unpickler = pickle.Unpickler(f)
+		while True:
+			try:
+				yield unpickler.load()
+			except EOFError:
+				return
+
+
+def external_sort(items, key, reverse=False, memory=SORT_MEMORY,
+	encode=pickle.dumps, decode=pickle.loads, directory=None):
+	'''Iterate through `items` in order of `key`, keeping records of
+	up to about `memory` bytes in memory at a time.
+
+	Each item is turned into a record of its sort key and its encoding by
+	`encode`, a `bytes`, and turned back by `decode` when it comes out.
+	Records are sorted in runs as they come, each written to a temporary
+	file in `directory`, or that of the system, once it outgrows `memory`.
+	Runs are then merged, reading each a record at a time. If all records
+	fit, nothing is written.
+
+	Sort keys must be picklable if runs are written. The sort is stable,
+	even if `reverse`.
+	'''
+
+	sort_key = itemgetter(0)
+	run, size = [], 0
+	paths = []
+	spill_directory = None
+	try:
+		for item in items:
+			record = (key(item), encode(item))
+			run.append(record)
+			size += len(record[1]) + RECORD_OVERHEAD
+			if size >= memory:
+				if spill_directory is None:
+					spill_directory = tempfile.mkdtemp(prefix='omd-sort-', dir=directory)
+				run.sort(key=sort_key, reverse=reverse)
+				paths.append(_write_run(spill_directory, run))
+				run, size = [], 0
+
+		run.sort(key=sort_key, reverse=reverse)
+		runs = [_read_run(path) for path in paths] + [run]
+		for record in heapq.merge(*runs, key=sort_key, reverse=reverse):
+			yield decode(record[1])
+	finally:
+		for path in paths:
+			os.remove(path)
+		if spill_directory:
+			os.rmdir(spill_directory)
@@ -0,0 +1,111 @@
+import ssl
+import time
+import socket
+from urllib.parse import urlsplit
+from ohmydomains.util import RequestTimeout, MaxTriesReached, DeadlineExceeded
+
+
+PHASES = ('connect', 'tls', 'first_byte')
+'''Phases of a request timed by `probe()`, each measured from the end of the previous one.'''
+
+PERCENTILES = (50, 90, 99)
+
+TIMEOUT_ERRORS = (RequestTimeout, DeadlineExceeded)
+'''Errors of checks out of time, rather than failed.'''
+
+
+def probe(url, timeout=10):
+	'''Time phases of a `HEAD` request to `url`, in seconds.
+
+	Returns a `dict` of phase name to seconds, `tls` being `None` for
+	plain HTTP, plus the response `status` line.
+	'''
+
+	parts = urlsplit(url)
+	https = parts.scheme == 'https'
+	host = parts.hostname
+	port = parts.port or (https and 443 or 80)
+
+	result = {}
+	start = time.perf_counter()
+	sock = socket.create_connection((host, port), timeout=timeout)
+	try:
+		connected = time.perf_counter()
+		result['connect'] = connected - start
+
+		if https:
+			sock = ssl.create_default_context().wrap_socket(sock, server_hostname=host)
+			handshaken = time.perf_counter()
+			result['tls'] = handshaken - connected
+		else:
+			handshaken = connected
+			result['tls'] = None
+
+		sock.sendall('HEAD {} HTTP/1.1\r\nHost: {}\r\nUser-Agent: ohmydomains\r\nConnection: close\r\n\r\n'.format(
+			parts.path or '/', host).encode('ascii'))
+		response = sock.recv(1024)
+		result['first_byte'] = time.perf_counter() - handshaken
+		result['status'] = response.split(b'\r\n', 1)[0].decode('ascii', 'replace')
+	finally:
+		sock.close()
+
+	return result
+
+
+def percentiles(values, ranks=PERCENTILES):
+	'''Nearest rank percentiles of `values`, as a `dict` of rank to value.'''
+
+	values = sorted(values)
+	if not values:
+		return { rank: None for rank in ranks }
+	return { rank: values[max(0, -(-rank * len(values) // 100) - 1)] for rank in ranks }
+
+
+def profile_endpoint(url, probes=3, timeout=10):
+	'''Probe `url` `probes` times, returning latency percentiles
+	of each phase, and failures.
+	'''
+
+	samples = { phase: [] for phase in PHASES }
+	errors = []
+	for i in range(probes):
+		try:
+			result = probe(url, timeout=timeout)
+		except Exception as e:
+			errors.append(repr(e))
+			continue
+		for phase in PHASES:
+			if result[phase] is not None:
+				samples[phase].append(result[phase])
+
+	report = { phase: percentiles(samples[phase]) for phase in PHASES }
+	report['probes'] = probes
+	report['errors'] = errors
+	return report
+
+
+def check_credentials(account, timeout=10):
+	'''Test credentials of an account, giving up after `timeout` seconds.
+
+	Requests are made by a copy of the account, each waiting no longer
+	than `timeout`, and none made past it, so no request outlives the check.
+
+	Returns a `dict` of `valid`, which is `None` if it could not be told,
+	`error`, telling why if not timed out, and `elapsed` seconds.
+	'''
+
+	start = time.perf_counter()
+	account = account.copy()
+	account.timeout = tuple(min(value, timeout) for value in account.timeout)
+	account.deadline = time.monotonic() + timeout
+	valid = error = None
+	try:
+		valid = account.test_credentials()
+	except MaxTriesReached as e:
+		if not isinstance(e.__cause__, TIMEOUT_ERRORS):
+			error = repr(e.__cause__ or e)
+	except TIMEOUT_ERRORS:
+		pass
+	except Exception as e:
+		error = repr(e)
+	return { 'valid': valid, 'error': error, 'elapsed': time.perf_counter() - start }
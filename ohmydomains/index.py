@@ -0,0 +1,308 @@
+import threading
+from bisect import bisect_left, bisect_right
+from fnmatch import fnmatchcase
+
+
+DATE_FIELDS = ('expiry', 'creation')
+'''Fields of domains kept in order, for range queries.'''
+
+
+def normalize_tld(tld):
+	'''Normalize a TLD to the form of `Domain.tld`, e.g. `IO` to `.io`.'''
+
+	tld = tld.strip().lower()
+	return tld if tld.startswith('.') else '.' + tld
+
+
+def trigrams(text):
+	return { text[i:i + 3] for i in range(len(text) - 2) }
+
+
+def match_name(name, term):
+	'''Whether `name` contains `term`, or matches it if it is
+	a wildcard pattern (`*` and `?`). Both should be lowercase.
+	'''
+
+	if '*' in term or '?' in term:
+		return fnmatchcase(name, term)
+	return term in name
+
+
+def _timestamp(value):
+	return None if value is None else value.timestamp()
+
+
+class DomainIndex:
+	'''In-memory search index over known domain names.
+
+	Domains are keyed by their lowercased name, with a trigram index for
+	substring and wildcard search, a bucket per TLD, and names in order
+	of each of `DATE_FIELDS`, for range queries returning them in order.
+	Adding a domain already indexed replaces the old one.
+
+	Names in order are kept as arrays of timestamps and names, which
+	changes are merged into when next queried, so that listing many domains
+	does not shift them for each.
+
+	It is safe to use from multiple threads; iterating through it
+	iterates through a copy.
+	'''
+
+	def __init__(self, domains=()):
+		self._lock = threading.RLock()
+		self._domains = {}
+		self._trigrams = {}
+		self._tlds = {}
+		# per date field: name to timestamp, timestamps and names in order,
+		# and changes not merged into them yet.
+		self._stamps = { field: {} for field in DATE_FIELDS }
+		self._sorted = { field: ([], []) for field in DATE_FIELDS }
+		self._added = { field: {} for field in DATE_FIELDS }
+		self._removed = { field: set() for field in DATE_FIELDS }
+
+		for domain in domains:
+			self.add(domain)
+
+	def __len__(self):
+		return len(self._domains)
+
+	def __contains__(self, name):
+		return name.lower() in self._domains
+
+	def __iter__(self):
+		with self._lock:
+			return iter(list(self._domains.values()))
+
+	def add(self, domain):
+		key = domain.name.lower()
+		with self._lock:
+			if key in self._domains:
+				self.remove(key)
+
+			self._domains[key] = domain
+			for gram in trigrams(key):
+				self._trigrams.setdefault(gram, set()).add(key)
+			self._tlds.setdefault(domain.tld.lower(), set()).add(key)
+			for field in DATE_FIELDS:
+				if domain[field] is not None:
+					self._stamps[field][key] = self._added[field][key] = domain[field].timestamp()
+
+	def remove(self, name):
+		key = name.lower()
+		with self._lock:
+			domain = self._domains.pop(key, None)
+			if domain is None:
+				return None
+
+			for gram in trigrams(key):
+				bucket = self._trigrams[gram]
+				bucket.discard(key)
+				if not bucket:
+					del self._trigrams[gram]
+			bucket = self._tlds[domain.tld.lower()]
+			bucket.discard(key)
+			if not bucket:
+				del self._tlds[domain.tld.lower()]
+			for field in DATE_FIELDS:
+				if self._stamps[field].pop(key, None) is not None:
+					if self._added[field].pop(key, None) is None:
+						self._removed[field].add(key)
+
+			return domain
+
+	def retain(self, account, names):
+		'''Drop domains of `account` whose names are not in `names`.
+
+		Used after a full listing of an account to forget domains
+		it no longer holds.
+		'''
+
+		names = { name.lower() for name in names }
+		with self._lock:
+			for key, domain in list(self._domains.items()):
+				if domain.account is account and key not in names:
+					self.remove(key)
+
+	def clear(self):
+		with self._lock:
+			self._domains.clear()
+			self._trigrams.clear()
+			self._tlds.clear()
+			for field in DATE_FIELDS:
+				self._stamps[field].clear()
+				self._sorted[field] = ([], [])
+				self._added[field].clear()
+				self._removed[field].clear()
+
+	def get(self, name):
+		'''Exact lookup by domain name.'''
+
+		return self._domains.get(name.lower(), None)
+
+	def tlds(self):
+		with self._lock:
+			return { tld: len(names) for tld, names in self._tlds.items() }
+
+	def _candidates(self, fragments):
+		'''Names containing all trigrams of `fragments`,
+		or `None` if no fragment is long enough to narrow the search.
+		'''
+
+		grams = set()
+		for fragment in fragments:
+			grams |= trigrams(fragment)
+		if not grams:
+			return None
+
+		buckets = sorted((self._trigrams.get(gram, ()) for gram in grams), key=len)
+		if not buckets[0]:
+			return set()
+		candidates = set(buckets[0])
+		for bucket in buckets[1:]:
+			candidates &= bucket
+			if not candidates:
+				break
+		return candidates
+
+	def _match_keys(self, term, keys=None):
+		term = term.lower()
+		if '*' in term or '?' in term:
+			fragments = [part for part in term.replace('?', '*').split('*') if part]
+			candidates = self._candidates(fragments)
+		else:
+			candidates = self._candidates([term])
+		if candidates is None:
+			candidates = self._domains.keys() if keys is None else keys
+		elif keys is not None:
+			candidates = candidates & keys
+		return { key for key in candidates if match_name(key, term) }
+
+	def _ordered(self, field):
+		'''Timestamps and names in order of `field`, merging changes into them.'''
+
+		stamps, keys = self._sorted[field]
+		added, removed = self._added[field], self._removed[field]
+		if removed:
+			pairs = [(stamp, key) for stamp, key in zip(stamps, keys) if key not in removed]
+			removed.clear()
+		elif added:
+			pairs = list(zip(stamps, keys))
+		else:
+			return stamps, keys
+
+		# both runs are sorted, which sorting merges in linear time.
+		pairs.extend(sorted((stamp, key) for key, stamp in added.items()))
+		pairs.sort()
+		added.clear()
+		self._sorted[field] = [stamp for stamp, key in pairs], [key for stamp, key in pairs]
+		return self._sorted[field]
+
+	def _range(self, field, after=None, before=None):
+		'''Bounds of names in order of `field` between timestamps `after` and `before`, inclusive.'''
+
+		stamps, keys = self._ordered(field)
+		low = 0 if after is None else bisect_left(stamps, after)
+		high = len(stamps) if before is None else bisect_right(stamps, before)
+		return keys, low, max(low, high)
+
+	def range(self, field, after=None, before=None, reverse=False):
+		'''Domains with `field`, one of `DATE_FIELDS`, between `after` and
+		`before`, inclusive, in order of it; both are optional.'''
+
+		with self._lock:
+			keys, low, high = self._range(field, _timestamp(after), _timestamp(before))
+			keys = keys[low:high]
+			if reverse:
+				keys.reverse()
+			return [self._domains[key] for key in keys]
+
+	def query(self, search=None, tld=None, order_by=None, reverse=False, **bounds):
+		'''Find indexed domains.
+
+		* `search`: a string or list of strings, each being a substring
+		of the domain name, or a wildcard pattern (`*` and `?`) matching
+		the whole name. All must match.
+		* `tld`: a TLD or list of TLDs, with or without the leading dot.
+		* `expiry_before`, `expiry_after`, `creation_before`, `creation_after`:
+		inclusive bounds of dates, as `datetime.datetime`s.
+		* `order_by`: one of `DATE_FIELDS` to return domains in order of,
+		those without it last; `reverse` to return them latest first.
+
+		Dates bounded or ordered by are looked up in names in order of them,
+		in logarithmic time plus that of going through those in range.
+
+		Returns a list of `Domain`s, in no particular order unless `order_by`.
+		'''
+
+		with self._lock:
+			return self._query(search, tld, order_by, reverse, bounds)
+
+	def _query(self, search, tld, order_by=None, reverse=False, bounds=None):
+		keys = self._name_keys(search, tld)
+		ranges = {}
+		for field in DATE_FIELDS:
+			after = _timestamp((bounds or {}).get(field + '_after', None))
+			before = _timestamp((bounds or {}).get(field + '_before', None))
+			if after is not None or before is not None:
+				ranges[field] = (after, before)
+
+		if not ranges and order_by not in DATE_FIELDS:
+			if keys is None:
+				return list(self._domains.values())
+			return [self._domains[key] for key in keys]
+
+		# go through names in range of the date ordered by if any,
+		# or else the narrowest range, unless names found are fewer.
+		spans = { field: self._range(field, *ranges.get(field, (None, None)))
+			for field in set(ranges) | ({ order_by } & set(DATE_FIELDS)) }
+		if order_by in spans:
+			field = order_by
+		else:
+			field = min(spans, key=lambda field: spans[field][2] - spans[field][1])
+		ordered, low, high = spans[field]
+
+		def within(key, skip=None):
+			for other, (after, before) in ranges.items():
+				if other == skip:
+					continue
+				stamp = self._stamps[other].get(key, None)
+				if stamp is None or (after is not None and stamp < after) or (before is not None and stamp > before):
+					return False
+			return True
+
+		if keys is not None and len(keys) < high - low:
+			stamps = self._stamps[field]
+			found = sorted((key for key in keys if key in stamps and within(key)), key=stamps.__getitem__, reverse=reverse)
+		else:
+			found = [key for key in ordered[low:high] if (keys is None or key in keys) and within(key, field)]
+			if reverse:
+				found.reverse()
+
+		stamps = self._stamps[field]
+		if field not in ranges and len(stamps) < len(self._domains):
+			# those without the date ordered by, last.
+			found.extend(key for key in (self._domains if keys is None else keys)
+				if key not in stamps and within(key))
+		return [self._domains[key] for key in found]
+
+	def _name_keys(self, search, tld):
+		'''Names matching `search` and `tld`, or `None` if there are neither.'''
+
+		keys = None
+
+		if tld:
+			if isinstance(tld, str):
+				tld = [tld]
+			keys = set()
+			for item in tld:
+				keys |= self._tlds.get(normalize_tld(item), set())
+
+		if search:
+			if isinstance(search, str):
+				search = [search]
+			# longer terms are usually more selective.
+			for term in sorted(search, key=len, reverse=True):
+				keys = self._match_keys(term, keys)
+				if not keys:
+					break
+		return keys
@@ -0,0 +1,243 @@
+'''Append-only journal of raw responses of registrar requests, to parse
+them again later, e.g. after parsing changes, without requesting anything.
+
+A journal is a directory of gzip compressed JSON lines segments, named
+by sequence number, each line an entry of a response: the unique
+identifier of the `account` requesting it, `method`, `url`, `params`
+and `json` of the request, `at`, as a Unix time, and the `status`,
+`headers` and `body` of the response. Params of the request depending
+on where it is made from, e.g. the client IP address, are left out. Values of credentials of the account
+in `params` and `json` are replaced by `REDACTED`; headers and auth
+of requests, where most registrars take credentials, are not kept.
+
+Each `Journal` writes segments of its own, starting a new one when
+the current one outgrows `segment_size`, so several processes can
+journal into the same directory. Entries are flushed as they are written,
+so a crash loses at most the entry being written.
+'''
+
+import os
+import json
+import gzip
+import time
+import base64
+import threading
+from pathlib import Path
+from ohmydomains.transport import Transport
+
+
+SEGMENT_SIZE = 64 * 1024 * 1024
+'''Default compressed size of segments, in bytes, beyond which a new one is started.'''
+
+SEGMENT_SUFFIX = '.jsonl.gz'
+
+RESPONSE_HEADERS = ('Content-Type', 'Content-Encoding', 'Retry-After')
+'''Headers of responses kept, besides those accounts declare as `JOURNAL_HEADERS`.'''
+
+REDACTED = '<redacted>'
+
+
+class NotJournaled(Exception): pass
+
+
+def _redact(data, secrets):
+	if not isinstance(data, dict) or not secrets:
+		return data
+	return { key: REDACTED if isinstance(value, str) and value in secrets else value for key, value in data.items() }
+
+
+def _drop(data, keys):
+	if not isinstance(data, dict) or not keys:
+		return data
+	return { key: value for key, value in data.items() if key not in keys }
+
+
+def request_key(method, url, params=None, json_data=None):
+	'''Key of a request, as journaled, by which responses are replayed.'''
+
+	return json.dumps([method.lower(), url, params or None, json_data or None], sort_keys=True, default=str)
+
+
+class Journal:
+	'''A journal in directory `path`, created if missing.
+
+	* `segment_size`: compressed size of segments, in bytes, beyond which a new one is started.
+	* `keep`: number of segments kept, oldest being deleted as new ones
+	are started, or `None` to keep all.
+	* `compresslevel`: gzip compression level.
+
+	It is safe to use from multiple threads.
+	'''
+
+	def __init__(self, path, segment_size=SEGMENT_SIZE, keep=None, compresslevel=6):
+		self.path = Path(path)
+		self.segment_size = segment_size
+		self.keep = keep
+		self.compresslevel = compresslevel
+		self.entries = 0
+		self._file = self._gzip = None
+		self._lock = threading.Lock()
+
+	def segments(self):
+		'''Paths of segments, oldest first.'''
+
+		if not self.path.exists():
+			return []
+		return sorted(path for path in self.path.iterdir() if path.name.endswith(SEGMENT_SUFFIX))
+
+	def _start_segment(self):
+		self._close_segment()
+		self.path.mkdir(parents=True, exist_ok=True)
+		segments = self.segments()
+		number = segments and int(segments[-1].name[:-len(SEGMENT_SUFFIX)]) + 1 or 1
+		while True:
+			try:
+				# other processes may start segments at the same time.
+				self._file = open(self.path.joinpath('{:08d}{}'.format(number, SEGMENT_SUFFIX)), 'xb')
+				break
+			except FileExistsError:
+				number += 1
+		self._gzip = gzip.GzipFile(fileobj=self._file, mode='wb', compresslevel=self.compresslevel)
+
+		if self.keep:
+			for path in self.segments()[:-self.keep]:
+				try:
+					os.remove(path)
+				except FileNotFoundError:
+					pass
+
+	def _close_segment(self):
+		if self._gzip:
+			self._gzip.close()
+			self._file.close()
+			self._file = self._gzip = None
+
+	def record(self, account, method, url, params, json_data, response, secrets=(), headers=(), volatile=()):
+		'''Append an entry of `response` to a request of `account`,
+		a unique identifier, redacting values in `secrets`.
+
+		* `headers`: headers of the response kept besides `RESPONSE_HEADERS`.
+		* `volatile`: params of the request left out.
+		'''
+
+		content = response.content
+		try:
+			body = { 'body': content.decode('utf-8') }
+		except UnicodeDecodeError:
+			body = { 'body_base64': base64.b64encode(content).decode('ascii') }
+		line = json.dumps(dict({
+			'account': account,
+			'method': method.lower(),
+			'url': url,
+			'params': _redact(_drop(params, volatile), secrets),
+			'json': _redact(json_data, secrets),
+			'at': time.time(),
+			'status': response.status_code,
+			'headers': { key: response.headers[key] for key in RESPONSE_HEADERS + tuple(headers) if key in response.headers },
+		}, **body), default=str).encode('utf-8') + b'\n'
+
+		with self._lock:
+			if self._gzip is None or self._file.tell() >= self.segment_size:
+				self._start_segment()
+			self._gzip.write(line)
+			self._gzip.flush()
+			self.entries += 1
+
+	def close(self):
+		with self._lock:
+			self._close_segment()
+
+	def iter_entries(self, accounts=None):
+		'''Iterate through entries, oldest first, of `accounts`, unique
+		identifiers, if provided. The end of a segment cut short,
+		e.g. by a crash, is skipped.'''
+
+		accounts = accounts is not None and set(accounts) or None
+		for path in self.segments():
+			try:
+				with gzip.open(path, 'rb') as f:
+					for line in f:
+						entry = json.loads(line)
+						if accounts is None or entry['account'] in accounts:
+							yield entry
+			except (EOFError, gzip.BadGzipFile, ValueError):
+				continue
+
+	def responses(self, accounts=None):
+		'''Latest entry of each request of `accounts`, if provided,
+		by unique identifier of account, then by `request_key()`.'''
+
+		responses = {}
+		for entry in self.iter_entries(accounts):
+			key = request_key(entry['method'], entry['url'], entry['params'], entry['json'])
+			responses.setdefault(entry['account'], {})[key] = entry
+		return responses
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+
+class JournaledResponse:
+	'''A response replayed from a journal entry, as those of transports.'''
+
+	def __init__(self, entry):
+		self.status_code = entry['status']
+		self.headers = entry['headers']
+		if 'body_base64' in entry:
+			self.content = base64.b64decode(entry['body_base64'])
+		else:
+			self.content = entry['body'].encode('utf-8')
+
+	@property
+	def text(self):
+		return self.content.decode('utf-8', 'replace')
+
+	def json(self):
+		return json.loads(self.content)
+
+
+class JournalingTransport(Transport):
+	'''Requests through `transport`, recording responses of `account`
+	to `journal`. See `RegistrarAccount.journal`.'''
+
+	def __init__(self, transport, journal, account):
+		self.transport = transport
+		self.journal = journal
+		self._account = account
+
+	def request(self, method, url, params=None, json=None, headers=None, auth=None, timeout=None):
+		response = self.transport.request(method, url, params=params, json=json, headers=headers, auth=auth, timeout=timeout)
+		self.journal.record(self._account.unique_identifier, method, url, params, json, response,
+			secrets=self._account.secrets(), headers=self._account.JOURNAL_HEADERS, volatile=self._account.VOLATILE_PARAMS)
+		return response
+
+	def close(self):
+		self.transport.close()
+
+
+class ReplayTransport(Transport):
+	'''Answers requests of an account with `responses`, by `request_key()`,
+	as of `Journal.responses()`, raising `NotJournaled` for others.
+
+	* `secrets`: values redacted in requests, as they were journaled.
+	* `volatile`: params left out of requests, as they were journaled;
+	entries journaled with them, e.g. by earlier versions, match too.
+	'''
+
+	def __init__(self, responses, secrets=(), volatile=()):
+		self.secrets = secrets
+		self.volatile = volatile
+		if volatile:
+			responses = { request_key(entry['method'], entry['url'], _drop(entry['params'], volatile), entry['json']): entry
+				for entry in sorted(responses.values(), key=lambda entry: entry['at']) }
+		self.responses = responses
+
+	def request(self, method, url, params=None, json=None, headers=None, auth=None, timeout=None):
+		params = _redact(_drop(params, self.volatile), self.secrets)
+		entry = self.responses.get(request_key(method, url, params, _redact(json, self.secrets)), None)
+		if entry is None:
+			raise NotJournaled(method, url, params)
+		return JournaledResponse(entry)
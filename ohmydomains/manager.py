@@ -1,6 +1,35 @@
+import os
+import time
+import pickle
+import datetime
+import threading
+from collections import Counter
 import pendulum
-from ohmydomains.registrars import registrars, UnsupportedRegistrarError
+from ohmydomains.analytics import HORIZON, RISK_DAYS, Columns, summarize
+from ohmydomains.contact import ContactList
+from ohmydomains.domain import Domain
+from ohmydomains.index import DATE_FIELDS, DomainIndex, normalize_tld
+from ohmydomains.planning import OPERATIONS, plan_requests
+from ohmydomains.query import WILDCARDS, Query, compile_predicate, criteria_node
+from ohmydomains.registrars import account_from_export, registrars, UnsupportedRegistrarError
 from ohmydomains.registrars.account import RegistrarAccount
+from ohmydomains.util import DeadlineExceeded
+
+
+IMPORT_STATUSES = ('imported', 'invalid', 'duplicate', 'rejected', 'timed out', 'failed')
+'''Outcomes of records of `Manager.import_accounts()`: imported, not a valid record,
+of an account already tracked or earlier in the records, with credentials
+the registrar rejected, which could not be checked in time, or whose check
+failed otherwise, e.g. of a connection error.'''
+
+AVAILABILITY_MAX_AGE = 3600
+'''Seconds an answer of `Manager.check_availability()` is reused for.'''
+
+DATE_CRITERIA = ('expiry_before', 'expiry_after', 'creation_before', 'creation_after')
+'''Criteria bounding dates, inclusive.'''
+
+FILTER_CRITERIA = ('search', 'tld', 'where', 'expiry_in') + DATE_CRITERIA
+'''Criteria which narrow down results of `Manager.iter_domains()`.'''
 
 
 class Manager:
@@ -9,8 +38,49 @@ class Manager:
 	their domain names.
 	'''
 
-	def __init__(self, accounts=[], raw_domains=[]):
-		self.accounts, self.raw_domains = accounts, raw_domains
+	def __init__(self, accounts=None, raw_domains=None, checkpoints=None, parse_pool=None, journal=None):
+		self._lock = threading.RLock()
+		self._accounts = tuple(accounts or ())
+		self._raw_domains = tuple(raw_domains or ())
+		self.index = DomainIndex()
+		'''Index of domain names known to this manager, updated as they are iterated through.'''
+		self.report = {}
+		'''Status of each account in the last `iter_domains()`, by unique identifier:
+		a `dict` of `status`, one of `complete`, `deadline exceeded` and `failed`,
+		number of `domains` retrieved, and `error` if any.'''
+		self.domain_accounts = {}
+		'''Unique identifiers of accounts holding domain names, by lowercased name.
+		Unlike `index`, it can be persisted and loaded cheaply.'''
+		self.availability = {}
+		'''Answers of `check_availability()`, by lowercased name: a list of
+		whether it is available, and when it was checked, as a Unix time.'''
+		self.checkpoints = checkpoints
+		'''An `ohmydomains.checkpoint.CheckpointStore`, if any, for interrupted
+		listings of accounts to resume from the page they stopped at.'''
+		self.parse_pool = parse_pool
+		'''An `ohmydomains.parsing.ParsePool`, if any, for accounts listed
+		without one of their own to parse large responses in, lent
+		for each listing only.'''
+		self.journal = journal
+		'''An `ohmydomains.journal.Journal`, if any, for accounts listed
+		without one of their own to record raw responses to, lent
+		for each listing only.'''
+
+	@property
+	def accounts(self):
+		'''Tracked accounts, as a tuple.
+
+		Adding or deleting accounts replaces it rather than changing it,
+		so it can be iterated through while other threads do so.
+		'''
+
+		return self._accounts
+
+	@property
+	def raw_domains(self):
+		'''Domain names not belonging to any tracked account, as a tuple.'''
+
+		return self._raw_domains
 
 	def get_accounts(self, registrars=[], criteria=[], tags=[]):
 		'''Get all or search accounts.
@@ -20,13 +90,12 @@ class Manager:
 		* `tags`: optional.
 		'''
 
-		if not registrars and not criteria:
-			return self.accounts
+		accounts = list(self.accounts)
+		if not registrars and not criteria and not tags:
+			return accounts
 
 		if registrars:
-			accounts = [account for account in self.accounts if account.REGISTRAR in registrars]
-		else:
-			accounts = self.accounts.copy()
+			accounts = [account for account in accounts if account.REGISTRAR in registrars]
 
 		if criteria:
 			for account in accounts[:]:
@@ -44,6 +113,45 @@ class Manager:
 
 		return accounts
 
+	def _normalize_criteria(self, criteria):
+		where = criteria.get('where', None)
+		if isinstance(where, str):
+			where = criteria['where'] = Query(where)
+		if where:
+			# let the index, snapshots and registrars narrow down domain names.
+			for key, value in where.criteria.items():
+				if key == 'search':
+					criteria['search'] = list(criteria.get('search', None) or []) + value
+				elif not criteria.get(key, None):
+					criteria[key] = value
+
+		for key in DATE_CRITERIA:
+			if isinstance(criteria.get(key, None), str):
+				criteria[key] = pendulum.parse(criteria[key])
+
+		if criteria.get('expiry_in', None):
+			criteria['expiry_before'] = pendulum.now().add(days=int(criteria['expiry_in']))
+
+		if isinstance(criteria.get('search', None), str):
+			criteria['search'] = [criteria['search']]
+		if isinstance(criteria.get('tld', None), str):
+			criteria['tld'] = [criteria['tld']]
+		if criteria.get('tld', None):
+			criteria['tld'] = [normalize_tld(tld) for tld in criteria['tld']]
+
+		return criteria
+
+	def _predicate(self, criteria, names=True, dates=True):
+		'''Compile normalized criteria into a single function matching domain names,
+		leaving out name or date criteria, already applied otherwise.'''
+
+		return compile_predicate(criteria_node(criteria, names=names, dates=dates))
+
+	def _remember(self, domain):
+		with self._lock:
+			self.index.add(domain)
+			self.domain_accounts[domain.name.lower()] = domain.account.unique_identifier
+
 	def iter_domains(self, accounts=None, **criteria):
 		'''Iterate through tracked domain names, in specified accounts, if any.
 
@@ -51,32 +159,399 @@ class Manager:
 
 		* No sorting functionality, thus related arguments,
 		since we are iterating through them.
+
+		* `deadline`: seconds after which no more requests are made.
+
+		Every domain name retrieved is added to `index`.
+		An account failing or running out of time does not stop others;
+		check `report` for the status of each.
 		'''
 
+		reports = self.report = {}
+		yield from self._iter_domains(accounts, reports, **criteria)
+
+	def _iter_domains(self, accounts, reports, replay=None, **criteria):
+		'''`iter_domains()`, reporting into `reports`, which unlike `report`
+		is not shared with listings in other threads, and answering
+		requests with `replay`, responses of a journal, if provided.'''
+
 		if not accounts:
-			accounts = self.accounts.copy()
+			accounts = self.accounts
 
-		for key in ('expiry_before', 'expiry_after', 'creation_before', 'creation_after'):
-			if isinstance(criteria.get(key, None), str):
-				criteria[key] = pendulum.parse(criteria[key])
+		deadline = criteria.pop('deadline', None)
+		deadline = deadline and time.monotonic() + deadline
 
-		if criteria.get('expiry_in', None):
-			criteria['expiry_before'] = pendulum.now().add(days=int(criteria['expiry_in']))
+		criteria = self._normalize_criteria(criteria)
+		full_listing = not any(criteria.get(key, None) for key in FILTER_CRITERIA)
+
+		account_criteria = dict(criteria)
+		# only a single search term can be passed down to registrars,
+		# which take wildcards literally.
+		search = criteria.get('search', None)
+		account_criteria['search'] = search[0] if search and len(search) == 1 and not WILDCARDS.search(search[0]) else None
+		account_criteria.pop('where', None)
+		account_criteria.pop('patterns', None)
+		# replayed listings are not to be resumed from checkpoints of real ones.
+		account_criteria['checkpoints'] = replay is None and self.checkpoints or None
+		match = self._predicate(criteria)
 
 		for account in accounts:
-			for domain in account.iter_domains(**criteria):
-				if criteria.get('expiry_before', None) and domain.expiry > criteria['expiry_before']:
-					continue
-				if criteria.get('expiry_after', None) and domain.expiry < criteria['expiry_after']:
-					continue
-				if criteria.get('creation_before', None) and domain.creation > criteria['creation_before']:
-					continue
-				if criteria.get('creation_after', None) and domain.creation < criteria['creation_after']:
+			names = []
+			report = reports[account.unique_identifier] = { 'status': 'complete', 'domains': 0, 'error': None }
+			# replays list through a copy of the account, which other listings share.
+			lister = replay is None and account or account.replaying(replay.get(account.unique_identifier, {}))
+			# so are the pool and journal, lent for this listing only.
+			if self.parse_pool and account.parse_pool is None:
+				lister = lister is account and account.copy() or lister
+				lister.parse_pool = self.parse_pool
+			if replay is None and self.journal and account.journal is None:
+				lister = lister is account and account.copy() or lister
+				lister.journal = self.journal
+			lister.deadline = deadline
+			try:
+				for domain in lister.iter_domains(**account_criteria):
+					if domain is None:
+						continue
+					domain.account = account
+					self._remember(domain)
+					names.append(domain.name)
+					report['domains'] += 1
+
+					if match(domain):
+						yield domain
+			except DeadlineExceeded as e:
+				report['status'], report['error'] = 'deadline exceeded', repr(e)
+				continue
+			except Exception as e:
+				report['status'], report['error'] = 'failed', repr(e)
+				continue
+			finally:
+				lister.deadline = None
+
+			if full_listing:
+				self.index.retain(account, names)
+
+	def replay_journal(self, journal, accounts=None, **criteria):
+		'''Iterate through domain names as `iter_domains()` does, answering
+		requests of accounts with their latest responses recorded in `journal`,
+		an `ohmydomains.journal.Journal`, instead of requesting registrars,
+		e.g. to rebuild the inventory after parsing changes.
+
+		Listings of accounts making requests not journaled fail,
+		as reported in `report`. Responses of accounts replayed are
+		held in memory meanwhile.
+		'''
+
+		accounts = accounts or self.accounts
+		replay = journal.responses([account.unique_identifier for account in accounts])
+		reports = self.report = {}
+		yield from self._iter_domains(accounts, reports, replay=replay, **criteria)
+
+	def get_domain(self, name, refresh=False, accounts=None):
+		'''Get a single domain name, or `None` if no account holds it.
+
+		Unless `refresh` is true, a domain name in `index` is returned as is.
+		Otherwise responses of registrars cached about it are dropped, and only the account which held it last time, according to
+		`domain_accounts`, is asked; failing that, accounts are probed
+		from the cheapest to look up a domain name in.
+
+		* `accounts`: accounts to look in. If omitted, look in all.
+		'''
+
+		key = name.lower()
+		accounts = accounts or self.accounts
+
+		if not refresh:
+			domain = self.index.get(key)
+			if domain and domain.account in accounts:
+				return domain
+
+		owner = self.domain_accounts.get(key, None)
+		candidates = sorted(accounts, key=lambda account: (
+			account.unique_identifier != owner,
+			account.DOMAIN_LOOKUP_COST is None,
+			account.DOMAIN_LOOKUP_COST or 0))
+
+		for account in candidates:
+			if refresh:
+				account.invalidate_cache([key])
+			domain = account.get_domain(name)
+			if domain:
+				self._remember(domain)
+				return domain
+
+		# none of the accounts holds it now, forget what we knew.
+		with self._lock:
+			if owner in { account.unique_identifier for account in accounts }:
+				self.domain_accounts.pop(key, None)
+			domain = self.index.get(key)
+			if domain and domain.account in accounts:
+				self.index.remove(key)
+		return None
+
+	def find_domains(self, sort_by=None, order='asc', **criteria):
+		'''Search through known domain names in `index`,
+		without any network request.
+
+		Criteria are the same as of `get_domains()`, plus:
+
+		* `tld`: a TLD or list of TLDs, with or without the leading dot.
+
+		`search` terms may contain wildcards (`*` and `?`),
+		in which case they match the whole domain name.
+
+		Unless `sort_by` a field, domain names are in no particular order.
+		Date ranges, and order of `expiry` or `creation`, are looked up
+		in `index` without going through other domain names.
+		'''
+
+		criteria = self._normalize_criteria(criteria)
+		match = self._predicate(criteria, names=False, dates=False)
+		domains = [
+			domain for domain in self.index.query(
+				search=(criteria.get('search', None) or []) + (criteria.get('patterns', None) or []) or None,
+				tld=criteria.get('tld', None),
+				order_by=sort_by, reverse=order == 'desc',
+				**{ key: criteria.get(key, None) for key in DATE_CRITERIA })
+			if match(domain)
+		]
+		if sort_by and sort_by not in DATE_FIELDS:
+			domains.sort(key=lambda domain: (domain[sort_by] is None, domain[sort_by]), reverse=order == 'desc')
+		return domains
+
+	def summarize(self, domains=None, period='month', horizon=HORIZON, risk_days=RISK_DAYS, now=None, **criteria):
+		'''Summarize known domain names matching `criteria`, as of `find_domains()`,
+		or `domains` if provided, into renewal calendars and breakdowns
+		by registrar and TLD; see `ohmydomains.analytics.summarize()`.
+
+		Requires the `stats` extra: `pip install ohmydomains[stats]`.
+		'''
+
+		if domains is None:
+			domains = self.find_domains(**criteria) if criteria else self.index
+		return summarize(Columns(domains), period=period, horizon=horizon, risk_days=risk_days, now=now)
+
+	def check_availability(self, names, accounts=None, max_age=AVAILABILITY_MAX_AGE):
+		'''Check whether domain names are available to register.
+
+		Names are spread over accounts whose registrars can check them,
+		which check them in batches, concurrently.
+
+		* `names`: domain names to check.
+		* `accounts`: accounts to check with. If omitted, use all which can.
+		* `max_age`: seconds to reuse answers in `availability` for.
+
+		Returns a `dict` of lowercased name to `True` or `False`,
+		or `None` if unknown, e.g. because a request failed.
+		'''
+
+		from concurrent.futures import ThreadPoolExecutor
+
+		names = list(dict.fromkeys(name.lower() for name in names))
+		now = time.time()
+		results = {}
+		pending = []
+		for name in names:
+			answer = self.availability.get(name, None)
+			if answer and now - answer[1] <= max_age:
+				results[name] = answer[0]
+			else:
+				pending.append(name)
+
+		accounts = [account for account in accounts or self.accounts if account.AVAILABILITY_BATCH_SIZE]
+		if pending and not accounts:
+			raise ValueError('None of the accounts can check availability.')
+
+		if pending:
+			with ThreadPoolExecutor(max_workers=len(accounts)) as executor:
+				futures = [executor.submit(account.check_availability, pending[i::len(accounts)])
+					for i, account in enumerate(accounts)]
+				for future in futures:
+					answers = future.result()
+					results.update(answers)
+					with self._lock:
+						self.availability.update((name, [available, now])
+							for name, available in answers.items() if available is not None)
+
+		return { name: results.get(name, None) for name in names }
+
+	def plan(self, operation='list', accounts=None, names=None, max_age=AVAILABILITY_MAX_AGE):
+		'''Plan requests `operation`, one of `ohmydomains.planning.OPERATIONS`,
+		would make, without making any, as a list of plans per account,
+		as of `ohmydomains.planning.plan_requests()`, leaving out accounts
+		not supporting it or with nothing to do.
+
+		* `accounts`: accounts to plan for. If omitted, all.
+		* `names`: domain names the operation is about, but for listing.
+		They are spread over accounts as `check_availability()` does,
+		answers younger than `max_age` seconds being reused, or
+		go to accounts holding them, as of `domain_accounts`.
+
+		Listings are planned for as many domain names as each account
+		is known to hold, as of `domain_accounts` or `index`.
+		'''
+
+		if operation not in OPERATIONS:
+			raise ValueError('Unknown operation "{}", expected one of {}.'.format(operation, ', '.join(OPERATIONS)))
+		accounts = accounts or self.accounts
+		names = list(dict.fromkeys(name.lower() for name in names or ()))
+
+		if operation == 'list':
+			held = Counter(domain.account.unique_identifier for domain in self.index if domain.account)
+			held.update(Counter(self.domain_accounts.values()) - held)
+		elif operation == 'check_availability':
+			now = time.time()
+			pending = [name for name in names
+				if not (name in self.availability and now - self.availability[name][1] <= max_age)]
+			accounts = [account for account in accounts if account.AVAILABILITY_BATCH_SIZE]
+			held = { account.unique_identifier: len(pending[i::len(accounts)]) for i, account in enumerate(accounts) }
+		else:
+			held = Counter(self.domain_accounts.get(name, None) for name in names)
+
+		plans = []
+		for account in accounts:
+			items = held.get(account.unique_identifier, 0)
+			if operation != 'list' and not items:
+				continue
+			plan = plan_requests(account, operation, items)
+			if plan:
+				plans.append(plan)
+		return plans
+
+	def verify_name_servers(self, domains=None, **options):
+		'''Check that name servers delegated to domain names at their TLD
+		are those their registrars report, and that they answer for them,
+		without any request to registrars.
+
+		* `domains`: domain names to check. If omitted, check those in `index`;
+		can be result of `find_domains()`.
+		* `options`: keyword arguments of `ohmydomains.delegation.DelegationChecker`,
+		e.g. `nameservers`, `port` and `concurrency`.
+
+		Returns results of `DelegationChecker.verify()`.
+		'''
+
+		from ohmydomains.delegation import DelegationChecker
+
+		return DelegationChecker(**options).verify(self.index if domains is None else domains)
+
+	def export_domains(self):
+		'''Export known domain names as a list of plain `dict`s.'''
+
+		return [domain.export() for domain in self.index]
+
+	def load_domains(self, records):
+		'''Load domain names exported by `export_domains()` into `index`.
+
+		Records of accounts not tracked by this manager are skipped.
+		'''
+
+		accounts = { account.unique_identifier: account for account in self.accounts }
+		for record in records:
+			account = accounts.get(record.get('account', None), None)
+			if account:
+				self._remember(Domain.from_export(record, account=account))
+
+	def sync_changes(self, tracker, accounts=None):
+		'''Retrieve all domain names of accounts, returning changes since
+		the last sync recorded by `tracker`, an `ohmydomains.changes.ChangeTracker`.
+
+		See `ChangeTracker.commit()` for the format of changes.
+		'''
+
+		accounts = accounts or self.accounts
+		reports = self.report = {}
+		for domain in tracker.track(self._iter_domains(accounts, reports)):
+			pass
+		return tracker.commit([account for account in accounts
+			if reports[account.unique_identifier]['status'] == 'complete'])
+
+	def export_snapshot(self, path, domains=None):
+		'''Write known domain names, or `domains` if provided,
+		into a binary snapshot file at `path`.
+
+		See `ohmydomains.snapshot` for details.
+		'''
+
+		from ohmydomains.snapshot import write_snapshot
+
+		write_snapshot(path, self.index if domains is None else domains)
+
+	def import_snapshot(self, path, **criteria):
+		'''Load domain names from a snapshot file at `path` into `index`,
+		returning them.
+
+		Criteria are the same as of `find_domains()`; only matching ones are
+		loaded, and others are never fully decoded. Rows of accounts not
+		tracked by this manager are skipped.
+		'''
+
+		domains = []
+		for domain in self.iter_snapshot(path, **criteria):
+			self._remember(domain)
+			domains.append(domain)
+		return domains
+
+	def iter_snapshot(self, path, **criteria):
+		'''Iterate through domain names in a snapshot file at `path`,
+		as `import_snapshot()` loads them, without keeping them in `index`.'''
+
+		from ohmydomains.snapshot import Snapshot
+
+		criteria = self._normalize_criteria(criteria)
+		# dates are compared on raw values of rows.
+		match = self._predicate(criteria, dates=False)
+		accounts = { account.unique_identifier: account for account in self.accounts }
+
+		with Snapshot(path) as snapshot:
+			for row in snapshot.iter_rows(**{ key: criteria.get(key, None) for key in DATE_CRITERIA }):
+				if not match(row):
 					continue
+				account = accounts.get(row.account, None)
+				if account:
+					yield row.to_domain(account)
+
+	def sync(self, queue_path, accounts=None, processes=4, **kwargs):
+		'''Retrieve domain names of accounts through a durable work queue,
+		then load them into `index`.
 
-				yield domain
+		Work items are created in the queue at `queue_path` and processed by
+		`processes` local worker processes; more workers, on this or other
+		hosts, may join with `ohmydomains.sync.work()`. They are deleted
+		once results are loaded.
+		Other keyword arguments are passed to it.
 
-	def get_domains(self, accounts=None, sort_by='expiring_before', order='desc', **criteria):
+		Returns states of accounts, as of `ohmydomains.sync.SyncQueue.status()`.
+		'''
+
+		from ohmydomains.sync import SyncQueue, run_workers
+
+		accounts = accounts or self.accounts
+		if self.checkpoints:
+			kwargs.setdefault('checkpoints', str(self.checkpoints.path))
+		queue = SyncQueue(queue_path, **{ key: kwargs[key] for key in ('lease', 'max_tries') if key in kwargs })
+		sync_id = queue.enqueue(accounts)
+		try:
+			run_workers(queue_path, processes=processes, sync_id=sync_id, **kwargs)
+
+			names = {}
+			records = []
+			for record in queue.iter_results(sync_id):
+				names.setdefault(record['account'], []).append(record['name'])
+				records.append(record)
+			self.load_domains(records)
+
+			status = queue.status(sync_id)
+			for account in accounts:
+				if status.get(account.unique_identifier, None) == 'done':
+					self.index.retain(account, names.get(account.unique_identifier, []))
+			return status
+		finally:
+			# results of the sync are of no use to anyone else.
+			queue.delete(sync_id)
+			queue.close()
+
+	def get_domains(self, accounts=None, sort_by='expiry', order='desc', memory=None, **criteria):
 		'''List or search through tracked domain names,
 		in specified accounts, if any.
 
@@ -87,15 +562,25 @@ class Manager:
 		* `accounts`: accounts to search through. If omitted, search through all;
 		can be result of `get_accounts()`.
 		* `criteria`: keyword arguments, each being one of below:
-		** `search`: keywords to search domain names.
+		** `search`: keyword or list of keywords to search domain names;
+		each may be a wildcard pattern (`*` and `?`) matching the whole name.
 		** `search_columns`: which columns to search provided keywords.
+		** `tld`: a TLD or list of TLDs, with or without the leading dot.
 		** `expiry_in` / `expiry_before`: only one of them should be present.
 		`expiry_in` is in days.
 		** `expiry_after`
 		** `creation_before`
 		** `creation_after`
-		** `sort_by`: one of criteria above, `expiring_before` by default.
-		** `order`: `asc`ending or `desc`ending, `desc` by default.
+		** `where`: a query, as a string or `ohmydomains.query.Query`, e.g.
+		`expiry < now+30d and tld in ('.io', '.dev') and auto_renew == false`;
+		see `ohmydomains.query` for its syntax. Its name, TLD and date conditions
+		narrow down what is requested, looked up or decoded, as other criteria do.
+		** `deadline`: seconds after which no more requests are made;
+		domain names retrieved by then are still returned.
+		* `sort_by`: field of domain names to sort by, `expiry` by default.
+		* `order`: `asc`ending or `desc`ending, `desc` by default.
+		* `memory`: bytes of memory to sort in, see `sort_domains()`; if
+		provided, an iterator is returned instead of a list.
 
 		Criteria listed above which are dates should be `datetime.datetime`-like objects,
 		or strings in the form of `YYYY-MM-DD`.
@@ -103,10 +588,68 @@ class Manager:
 		'''
 
 
-		return sorted(
-			self.iter_domains(accounts=accounts or self.accounts.copy(), **criteria),
-			key=lambda r: r[sort_by],
-			reverse=order == 'desc')
+		domains = self.sort_domains(self.iter_domains(accounts=accounts or self.accounts, **criteria),
+			sort_by=sort_by, order=order, memory=memory)
+		return domains if memory else list(domains)
+
+	def sort_domains(self, domains, sort_by='expiry', order='asc', memory=None, directory=None):
+		'''Iterate through `domains` in order of their `sort_by` field,
+		those without it last.
+
+		* `memory`: bytes of memory to keep domain names being sorted in,
+		encoded compactly, beyond which sorted runs of them are spilled
+		to temporary files in `directory`, and merged, as of
+		`ohmydomains.extsort.external_sort()`. If omitted, they are sorted
+		in memory as they are.
+
+		Domain names come out of spilled runs as new `Domain`s, with accounts
+		of this manager, contacts and other fields being the same.
+		'''
+
+		reverse = order == 'desc'
+
+		def key(domain):
+			value = domain[sort_by]
+			if value is None:
+				return (not reverse, 0)
+			if isinstance(value, datetime.datetime):
+				value = value.timestamp()
+			elif isinstance(value, RegistrarAccount):
+				value = value.unique_identifier
+			elif isinstance(value, list):
+				value = tuple(value)
+			return (reverse, value)
+
+		if not memory:
+			yield from sorted(domains, key=key, reverse=reverse)
+			return
+
+		from ohmydomains.extsort import external_sort
+
+		accounts = { account.unique_identifier: account for account in self.accounts }
+		# contacts are interned, thus few; records refer to them by number.
+		contact_lists, contact_numbers = [], {}
+		fields = Domain.FIELDS[2:]
+
+		def encode(domain):
+			contacts = domain.contacts
+			if contacts is not None and not contacts.is_interned():
+				contacts = ContactList.interned(contacts)
+			number = contact_numbers.get(id(contacts), None)
+			if number is None:
+				number = contact_numbers[id(contacts)] = len(contact_lists)
+				contact_lists.append(contacts)
+			return pickle.dumps((domain.account and domain.account.unique_identifier, number)
+				+ tuple(domain[field] for field in fields), pickle.HIGHEST_PROTOCOL)
+
+		def decode(data):
+			values = pickle.loads(data)
+			domain = Domain(contacts=contact_lists[values[1]], account=accounts.get(values[0], None),
+				**dict(zip(fields, values[2:])))
+			return domain
+
+		yield from external_sort(domains, key, reverse=reverse, memory=memory,
+			encode=encode, decode=decode, directory=directory)
 
 	def add_accounts(self, *accounts):
 		'''Add accounts.
@@ -125,20 +668,147 @@ class Manager:
 			except:
 				pass
 
-		for account in accounts:
-			if isinstance(account, RegistrarAccount):
-				self.accounts.append(account)
-			else:
-				if account['registrar'] not in registrars:
-					raise UnsupportedRegistrarError(account['registrar'])
-				self.accounts.append(registrars[account['registrar']].Account(account['credentials']))
+		# accounts may make requests when created, so do it before locking.
+		accounts = tuple(account if isinstance(account, RegistrarAccount) else account_from_export(account)
+			for account in accounts)
+		with self._lock:
+			self._accounts = self._accounts + accounts
+
+	def import_accounts(self, records, tags=None, validate=True, workers=16, timeout=10, rate_limit=None):
+		'''Add many accounts at once, checking their credentials concurrently.
+
+		* `records`: records of accounts, see `ohmydomains.account_records`,
+		or the path to a CSV, JSON or TOML file of them.
+		* `tags`: tags to add to all accounts.
+		* `validate`: whether to check credentials; if so, only accounts with
+		valid ones are added.
+		* `workers`: maximum number of accounts being checked at a time.
+		* `timeout`: seconds to wait for each check.
+		* `rate_limit`: maximum number of checks per registrar, as `(checks, seconds)`,
+		on top of the limits each account keeps to.
+
+		Returns a list of a `dict` per record, in order, of its `row`, from 1,
+		`registrar`, `account` unique identifier, `status`, one of
+		`IMPORT_STATUSES`, and `error`, telling why it is invalid or failed if so.
+		'''
 
-	def delete_accounts(self, *accounts):
-		for account in accounts:
-			if account not in self.accounts:
-				print(account, 'not in', self.accounts)
+		from concurrent.futures import ThreadPoolExecutor
+		from ohmydomains.account_records import read_account_records, normalize_record, InvalidRecord
+		from ohmydomains.health import check_credentials
+		from ohmydomains.ratelimit import TokenBucket
+
+		if isinstance(records, (str, os.PathLike)):
+			records = read_account_records(records)
+
+		known = { account.unique_identifier for account in self.accounts }
+		results = []
+		candidates = []
+		for row, record in enumerate(records, 1):
+			result = { 'row': row, 'registrar': None, 'account': None, 'status': 'invalid', 'error': None }
+			results.append(result)
+			try:
+				record = normalize_record(record)
+				record['tags'] += [tag for tag in tags or [] if tag not in record['tags']]
+				result['registrar'] = record['registrar']
+				if record['registrar'] not in registrars:
+					raise UnsupportedRegistrarError('Registrar "{}" is not supported.'.format(record['registrar']))
+				Account = registrars[record['registrar']].Account
+				missing = [key for key in Account.NEEDED_CREDENTIALS if not record['credentials'].get(key, None)]
+				if missing:
+					raise InvalidRecord('Missing credentials: {}.'.format(', '.join(missing)))
+				if record['testing'] and not Account.API_BASE_TESTING:
+					raise InvalidRecord('Registrar "{}" does not support testing API.'.format(record['registrar']))
+				account = account_from_export(record)
+			except (InvalidRecord, UnsupportedRegistrarError) as e:
+				result['error'] = str(e)
+				continue
+			except Exception as e:
+				result['error'] = repr(e)
 				continue
-			self.accounts.remove(account)
+
+			result['account'] = account.unique_identifier
+			if account.unique_identifier in known:
+				result['status'] = 'duplicate'
+				continue
+			known.add(account.unique_identifier)
+			result['status'] = 'imported'
+			candidates.append((result, account))
+
+		if validate and candidates:
+			buckets = rate_limit and { account.REGISTRAR: TokenBucket(*rate_limit) for result, account in candidates } or {}
+
+			def check(account):
+				if buckets:
+					buckets[account.REGISTRAR].acquire()
+				return check_credentials(account, timeout)
+
+			with ThreadPoolExecutor(max_workers=workers) as executor:
+				checks = [executor.submit(check, account) for result, account in candidates]
+				for (result, account), future in zip(candidates, checks):
+					checked = future.result()
+					if checked['error']:
+						result['status'], result['error'] = 'failed', checked['error']
+					elif not checked['valid']:
+						result['status'] = checked['valid'] is None and 'timed out' or 'rejected'
+
+		self.add_accounts([account for result, account in candidates if result['status'] == 'imported'])
+		return results
+
+	def check_accounts(self, accounts=None, probes=3, timeout=10, workers=8):
+		'''Check health of accounts and their registrar endpoints, concurrently.
+
+		* `accounts`: accounts to check. If omitted, check all.
+		* `probes`: number of requests to time per endpoint.
+		* `timeout`: seconds to wait for each request.
+		* `workers`: maximum number of requests in flight.
+
+		Returns a `dict` of:
+
+		* `accounts`: unique identifier to result of `ohmydomains.health.check_credentials()`.
+		* `endpoints`: API base URL to result of `ohmydomains.health.profile_endpoint()`,
+		i.e. latency percentiles of `connect`, `tls` and `first_byte` in seconds.
+		'''
+
+		from concurrent.futures import ThreadPoolExecutor
+		from ohmydomains.health import check_credentials, profile_endpoint
+
+		accounts = accounts or self.accounts
+		endpoints = sorted({ account._api_base for account in accounts if account._api_base })
+
+		with ThreadPoolExecutor(max_workers=workers) as executor:
+			credentials = { account.unique_identifier: executor.submit(check_credentials, account, timeout)
+				for account in accounts }
+			latencies = { endpoint: executor.submit(profile_endpoint, endpoint, probes, timeout)
+				for endpoint in endpoints }
+
+			return {
+				'accounts': { key: future.result() for key, future in credentials.items() },
+				'endpoints': { key: future.result() for key, future in latencies.items() },
+			}
+
+	def concurrency_stats(self, accounts=None):
+		'''Adaptive limits of requests in flight to registrar endpoints of
+		`accounts`, or of all, as tuned so far in this process.
+
+		Returns a `dict` of API base URL to result of
+		`ohmydomains.concurrency.AdaptiveLimiter.stats()`, i.e. the current
+		`limit`, its bounds, requests `in_flight`, `latency` and its `baseline`
+		in seconds, number of `cuts`, and counts of each outcome of requests.
+		'''
+
+		from ohmydomains.concurrency import limiter_stats
+
+		return limiter_stats({ account._api_base for account in accounts or self.accounts if account._api_base })
+
+	def delete_accounts(self, *accounts):
+		with self._lock:
+			remaining = list(self._accounts)
+			for account in accounts:
+				if account not in remaining:
+					print(account, 'not in', remaining)
+					continue
+				remaining.remove(account)
+			self._accounts = tuple(remaining)
 	
 	def add_domains(self, *domains):
 		'''Manually add domain name(s) not belonging to any stored account.
@@ -146,7 +816,8 @@ class Manager:
 		Each must be a string and valid domain name.
 		'''
 
-		self.raw_domains.extend(domains)
+		with self._lock:
+			self._raw_domains = self._raw_domains + domains
 
 	def whois(self, *names):
 		'''Query whois data for provided domain names.
@@ -0,0 +1,195 @@
+'''Declarative mappings of raw registrar payloads to `Domain`s and
+`Contact`s, compiled into specialized converter functions.
+
+A domain mapping is a `dict` of `Domain` field to how to get it from
+a raw payload, a `dict` as decoded from JSON or XML:
+
+* `'a.b'`: value of key `b` in the value of key `a`, `None` if any
+is missing. Alternatives are separated by `|`, e.g. `'a|b'`,
+the first not `None` being used.
+* `(path, converter)` or `(path, converter, default)`: value of `path`
+converted by a function, or one of `CONVERTERS` by name, unless it is
+`None`. `default` replaces a missing value, and is not converted.
+* `constant(value)`: always `value`.
+* A function, called with the whole payload.
+
+Fields left out are `None`. Registrar accounts declare theirs as
+`DOMAIN_MAPPINGS`, and are given converters at class creation,
+see `RegistrarAccount.__init_subclass__()`.
+
+A contact mapping is a `dict` of `Contact` field to a path, as
+`CONTACT_ATTR_MAP` of registrar accounts.
+'''
+
+import datetime
+import pendulum
+from ohmydomains.domain import Domain
+from ohmydomains.contact import Contact, ContactList
+
+
+class constant:
+	def __init__(self, value):
+		self.value = value
+
+
+def parse_date(text):
+	'''Parse an ISO 8601 date, faster than `pendulum.parse()` for common forms.'''
+
+	try:
+		return pendulum.instance(datetime.datetime.fromisoformat(text))
+	except ValueError:
+		return pendulum.parse(text)
+
+
+def as_list(value):
+	'''A list of values, XML decoding giving a single one as is.'''
+
+	return value if isinstance(value, list) else [value]
+
+
+def texts(value):
+	'''Texts of one or more XML elements with attributes.'''
+
+	return [item['#text'] if isinstance(item, dict) else item for item in as_list(value)]
+
+
+CONVERTERS = {
+	'date': parse_date,
+	'timestamp_ms': lambda value: pendulum.from_timestamp(value / 1000),
+	'list': as_list,
+	'texts': texts,
+}
+'''Converters available by name in mappings.'''
+
+INLINE_CONVERTERS = {
+	'true': "{} == 'true'",
+	'yes': "{} == 'Yes'",
+	'enabled': "{} == 'ENABLED'",
+	'bool': 'bool({})',
+	'timestamp_ms': '_from_timestamp({} / 1000)',
+}
+'''Converters inlined as expressions, available by name in mappings.'''
+
+
+class _Compiler:
+	def __init__(self):
+		self.namespace = { '_EMPTY': {}, '_from_timestamp': pendulum.from_timestamp }
+		self.temporaries = 0
+
+	def constant(self, value):
+		name = '_c{}'.format(len(self.namespace))
+		self.namespace[name] = value
+		return name
+
+	def temporary(self):
+		self.temporaries += 1
+		return '_t{}'.format(self.temporaries)
+
+	def path(self, path, source):
+		alternatives = []
+		for alternative in path.split('|'):
+			keys = alternative.split('.')
+			expression = source
+			for key in keys[:-1]:
+				expression = '({}.get({!r}) or _EMPTY)'.format(expression, key)
+			alternatives.append('{}.get({!r})'.format(expression, keys[-1]))
+
+		expression = alternatives[-1]
+		for alternative in reversed(alternatives[:-1]):
+			temporary = self.temporary()
+			expression = '({} if ({} := {}) is not None else {})'.format(temporary, temporary, alternative, expression)
+		return expression
+
+	def spec(self, spec, source):
+		if isinstance(spec, constant):
+			return self.constant(spec.value)
+		if isinstance(spec, str):
+			return self.path(spec, source)
+		if callable(spec):
+			return '{}({})'.format(self.constant(spec), source)
+
+		path, converter, default = (tuple(spec) + (None,))[:3]
+		value = self.path(path, source)
+		temporary = self.temporary()
+		if converter in INLINE_CONVERTERS:
+			converted = INLINE_CONVERTERS[converter].format(temporary)
+		else:
+			converted = '{}({})'.format(self.constant(CONVERTERS.get(converter, converter)), temporary)
+		return '({} if ({} := {}) is None else {})'.format(self.constant(default), temporary, value, converted)
+
+	def build(self, name, source):
+		exec(compile(source, '<mapping {}>'.format(name), 'exec'), self.namespace)
+		function = self.namespace[name]
+		function.__source__ = source
+		return function
+
+
+def compile_domain_mapping(mapping, registrar_name=None):
+	'''Compile a domain mapping into a function taking a raw payload,
+	an account and contacts, plus fields overriding those of the mapping,
+	and returning a `Domain`.
+	'''
+
+	compiler = _Compiler()
+	mapping = dict(mapping)
+	if registrar_name and 'registrar_name' not in mapping:
+		mapping['registrar_name'] = constant(registrar_name)
+
+	lines = ['def convert_domain(raw, account, contacts=None, **fields):']
+	lines.append('	values = {')
+	lines.append("		'account': account,")
+	lines.append("		'contacts': contacts,")
+	for field in Domain.FIELDS:
+		if field in ('account', 'contacts'):
+			continue
+		expression = field in mapping and compiler.spec(mapping[field], 'raw') or 'None'
+		lines.append('		{!r}: {},'.format(field, expression))
+	lines.append('	}')
+	lines.append('	if fields:')
+	lines.append('		values.update(fields)')
+	lines.append('	return _from_fields(values)')
+
+	compiler.namespace['_from_fields'] = Domain.from_fields
+	return compiler.build('convert_domain', '\n'.join(lines) + '\n')
+
+
+def compile_contact_mapping(mapping, kinds=None):
+	'''Compile a contact mapping into a function taking a raw contact
+	and its kind, and returning an interned `Contact`.
+
+	If `kinds`, a `dict` of kind to the key of its raw contact, is provided,
+	another function is compiled, taking a `dict` of raw contacts and returning
+	an interned `ContactList`; both are returned.
+	'''
+
+	compiler = _Compiler()
+	values = []
+	for field in Contact.FIELDS:
+		if field == 'kind':
+			values.append('kind')
+		else:
+			values.append(field in mapping and compiler.spec(mapping[field], 'raw') or 'None')
+
+	lines = [
+		'def convert_contact(raw, kind):',
+		'	raw = raw or _EMPTY',
+		'	key = ({},)'.format(', '.join(values)),
+		'	return _intern(key, lambda: _Contact(dict(zip(_FIELDS, key))))',
+	]
+	compiler.namespace.update(_intern=Contact._intern, _Contact=Contact, _FIELDS=Contact.FIELDS)
+	convert_contact = compiler.build('convert_contact', '\n'.join(lines) + '\n')
+	if kinds is None:
+		return convert_contact
+
+	lines = [
+		'def convert_contacts(raw):',
+		'	raw = raw or _EMPTY',
+		'	return _interned({',
+	] + [
+		'		{!r}: convert_contact(raw.get({!r}), {!r}),'.format(kind, key, kind)
+		for kind, key in kinds.items()
+	] + [
+		'	})',
+	]
+	compiler.namespace.update(_interned=ContactList.interned)
+	return convert_contact, compiler.build('convert_contacts', '\n'.join(lines) + '\n')
@@ -0,0 +1,123 @@
+'''Parse large responses of registrar requests in worker processes,
+so that pages arriving together are parsed on several cores at once.
+
+Workers are given raw response bodies, with a parse function of
+a registrar module, and give back what it returns, which must be
+picklable. Domain names are given back as compact records, tuples of
+their fields but `account` and `contacts`, rehydrated in the parent
+with `domain_from_record()`, as accounts are not to be pickled.
+'''
+
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from ohmydomains.domain import Domain
+
+
+PARSE_SHARE = 0.5
+'''Default share of CPU cores worker processes of `ParsePool` take.'''
+
+PARSE_MIN_SIZE = 16 * 1024
+'''Default size of responses, in bytes, below which they are parsed in
+the process requesting them, shipping them to workers costing more.'''
+
+PARSE_MIN_PAGES = 4
+'''Default number of large responses parsed in place before worker
+processes are started, so that listings of a few pages do not pay
+for starting them.'''
+
+RECORD_FIELDS = tuple(field for field in Domain.FIELDS if field not in ('account', 'contacts'))
+'''Fields of domain names in records, in order, `name` first.'''
+
+
+def domain_record(domain):
+	'''Compact, picklable record of `domain`.'''
+
+	return tuple(domain[field] for field in RECORD_FIELDS)
+
+
+def domain_from_record(record, account, contacts=None, **fields):
+	'''Rebuild a domain name of `account` from its record, `fields`
+	overriding those of the record.'''
+
+	values = dict(zip(RECORD_FIELDS, record))
+	if fields:
+		values.update(fields)
+	values['account'], values['contacts'] = account, contacts
+	return Domain.from_fields(values)
+
+
+class ParsePool:
+	'''Worker processes parsing responses, started when first needed.
+
+	* `share`: share of CPU cores to take, at least one process.
+	* `processes`: number of processes, overriding `share`.
+	* `min_size`: size of responses below which they are parsed in place.
+	* `min_pages`: number of large responses parsed in place before
+	worker processes are started.
+
+	With a single CPU core, workers would only compete with the process
+	requesting responses, so all are parsed in place.
+
+	It is safe to use from multiple threads, which is how responses
+	fetched concurrently are parsed concurrently.
+	'''
+
+	def __init__(self, share=PARSE_SHARE, processes=None, min_size=PARSE_MIN_SIZE, min_pages=PARSE_MIN_PAGES):
+		cores = os.cpu_count() or 1
+		self.processes = processes or max(1, int(cores * share))
+		self.min_size = min_size
+		self.min_pages = min_pages
+		self.in_place = cores < 2
+		'''Whether all responses are parsed in place, as with a single CPU core.'''
+		self.offloaded = self.inline = self.large = 0
+		self._executor = None
+		self._lock = threading.Lock()
+
+	def _get_executor(self):
+		with self._lock:
+			if self._executor is None:
+				# forking a process with threads in flight may copy locks
+				# held by them, so workers are started afresh.
+				self._executor = ProcessPoolExecutor(self.processes,
+					mp_context=multiprocessing.get_context('spawn'))
+			return self._executor
+
+	def parse(self, function, payload, *args):
+		'''`function(payload, *args)`, called in a worker process if
+		`payload` is large enough, and enough large ones came before it.'''
+
+		large = len(payload) >= self.min_size
+		if large:
+			with self._lock:
+				self.large += 1
+				large = self.large > self.min_pages
+		if self.in_place or not large:
+			self.inline += 1
+			return function(payload, *args)
+		executor = self._get_executor()
+		self.offloaded += 1
+		return executor.submit(function, payload, *args).result()
+
+	def shutdown(self):
+		'''Stop worker processes, to be started again if needed.'''
+
+		with self._lock:
+			executor, self._executor = self._executor, None
+		if executor:
+			executor.shutdown()
+
+	def stats(self):
+		return {
+			'processes': self.processes,
+			'in_place': self.in_place,
+			'offloaded': self.offloaded,
+			'inline': self.inline,
+		}
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.shutdown()
@@ -0,0 +1,132 @@
+'''Estimate requests operations of registrar accounts would make, and
+schedule them within rate limits and quotas of registrars, without
+making any, to tell beforehand how long a sync or bulk change takes
+and whether it fits in quotas.
+
+Registrar accounts declare a `Cost` per operation as `REQUEST_COSTS`,
+and limits of requests as `RATE_LIMIT` and `QUOTAS`.
+'''
+
+from math import ceil
+from collections import deque
+
+
+OPERATIONS = ('list', 'check_availability', 'update_name_servers', 'update_contacts')
+'''Operations planned for: listing all domain names of an account, and
+`check_availability()`, `update_name_servers()` and `update_contacts()`
+of domain names.'''
+
+REQUEST_LATENCY = 0.5
+'''Seconds a request is estimated to take, unless measured already.'''
+
+
+class Cost:
+	'''Requests an operation makes on a number of items, e.g. domain names:
+
+	* `fixed`: requests made once, whatever the number of items.
+	* `per_batch`, `batch_size`: requests per batch, e.g. page, of up to `batch_size` items.
+	* `per_item`: requests per item.
+	* `minimum`: requests made at least, e.g. a page of an empty listing.
+	* `concurrent`: whether requests per batch and item are made
+	concurrently, up to `detail_concurrency` of the account.
+	'''
+
+	def __init__(self, fixed=0, per_batch=0, batch_size=None, per_item=0, minimum=0, concurrent=False):
+		self.fixed = fixed
+		self.per_batch = per_batch
+		self.batch_size = batch_size
+		self.per_item = per_item
+		self.minimum = minimum
+		self.concurrent = concurrent
+
+	def requests(self, items):
+		batches = self.batch_size and ceil(items / self.batch_size) or 0
+		return max(self.minimum, self.fixed + self.per_batch * batches + self.per_item * items)
+
+
+def schedule(requests, windows):
+	'''Send `requests` in batches as early as `windows` allow, each
+	a `(requests, seconds)` limit of requests in any span of `seconds`.
+
+	Returns batches as a list of `[at, requests]`, `at` being seconds
+	from the start, requests of a batch being sent at once.
+	'''
+
+	batches = []
+	sent = [deque() for _ in windows]
+	totals = [0] * len(windows)
+	at = 0
+	while requests > 0:
+		for i, (limit, seconds) in enumerate(windows):
+			while sent[i] and sent[i][0][0] <= at - seconds:
+				totals[i] -= sent[i].popleft()[1]
+		allowed = min([limit - total for (limit, seconds), total in zip(windows, totals)] + [requests])
+		if allowed > 0:
+			batches.append([at, allowed])
+			requests -= allowed
+			for i in range(len(windows)):
+				sent[i].append((at, allowed))
+				totals[i] += allowed
+		if requests > 0:
+			# until requests sent earliest leave a window.
+			at = min(sent[i][0][0] + seconds for i, (limit, seconds) in enumerate(windows) if sent[i])
+	return batches
+
+
+def blocks(batches, seconds):
+	'''Batches summed up per span of `seconds`, as a list of `[at, requests]`.'''
+
+	summed = []
+	for at, requests in batches:
+		start = at // seconds * seconds
+		if summed and summed[-1][0] == start:
+			summed[-1][1] += requests
+		else:
+			summed.append([start, requests])
+	return summed
+
+
+def plan_requests(account, operation, items):
+	'''Plan `operation`, one of `OPERATIONS`, of `account` on `items`
+	of them, as a `dict`, or `None` if the registrar does not support it:
+
+	* `account`: unique identifier of the account.
+	* `operation`, `items`: as given.
+	* `requests`: number of requests estimated.
+	* `duration`: seconds they are estimated to take, waiting for
+	rate limits and quotas, or as long as they take with as many
+	in flight as allowed, and latency as measured or `REQUEST_LATENCY`.
+	* `quota`: the longest `(requests, seconds)` limit they exceed, if any.
+	* `schedule`: requests to send, as a list of `[at, requests]`, `at` being
+	seconds from the start, a row per span of `quota`, or one if none.
+	'''
+
+	cost = account.request_cost(operation)
+	if cost is None:
+		return None
+
+	requests = cost.requests(items)
+	windows = account.quotas()
+	exceeded = [window for window in windows if window[0] < requests]
+	quota = exceeded and max(exceeded, key=lambda window: window[1]) or None
+	batches = schedule(requests, windows)
+
+	limiter = account._limiter and account._limiter.stats() or {}
+	latency = limiter.get('latency', None)
+	concurrency = 1
+	if cost.concurrent:
+		# limits not tuned by any answer yet tell nothing.
+		concurrency = max(1, min(account.detail_concurrency, latency and limiter['limit'] or account.detail_concurrency))
+	latency = latency or REQUEST_LATENCY
+	last = batches and batches[-1] or [0, 0]
+	duration = max(last[0] + last[1] * latency / concurrency, requests * latency / concurrency)
+
+	return {
+		'account': account.unique_identifier,
+		'operation': operation,
+		'items': items,
+		'requests': requests,
+		'duration': duration,
+		'quota': quota,
+		'schedule': quota and blocks(batches, quota[1]) or [[0, requests]],
+	}
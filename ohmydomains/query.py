@@ -0,0 +1,336 @@
+'''A small query language to filter domain names, e.g.
+
+	expiry < now+30d and tld in ('.io', '.dev') and auto_renew == false
+
+Comparisons are `==`, `!=`, `<`, `<=`, `>` and `>=`, plus
+`field [not] in (value, ...)`, `field contains value` and
+`name matches 'wildcard*pattern'`, combined with `and`, `or`, `not`
+and parentheses. Values are quoted strings, numbers, `true`, `false`,
+`null`, dates in the form of `YYYY-MM-DD`, and `now` or `today`,
+optionally offset like `now+30d`, in hours, days, weeks, months or years.
+
+Queries are compiled once into a single predicate, usable on `Domain`s
+and snapshot rows alike. Comparing a missing date is always false.
+'''
+
+import re
+from fnmatch import fnmatchcase
+import pendulum
+from ohmydomains.index import match_name, normalize_tld
+
+
+class InvalidQuery(Exception): pass
+
+
+FIELDS = (
+	'name', 'tld', 'account', 'registrar_name',
+	'creation', 'expiry',
+	'name_servers', 'status',
+	'lock', 'auto_renew', 'whois_privacy',
+)
+'''Fields available in queries. `account` is the unique identifier of the account.'''
+
+DATE_FIELDS = ('creation', 'expiry')
+
+ORDERING = ('<', '<=', '>', '>=')
+
+WILDCARDS = re.compile(r'[*?]')
+
+OFFSET_UNITS = { 'h': 'hours', 'd': 'days', 'w': 'weeks', 'm': 'months', 'y': 'years' }
+
+TOKEN = re.compile(r'''\s*(?:
+	(?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+	|(?P<now>(?:now|today)\b(?:\s*[+-]\s*\d+\s*[hdwmy]\b)?)
+	|(?P<date>\d{4}-\d{2}-\d{2}(?:T[\d:.]+(?:Z|[+-]\d{2}:?\d{2})?)?)
+	|(?P<number>-?\d+(?:\.\d+)?)
+	|(?P<op>==|!=|<=|>=|<|>|=|\(|\)|,)
+	|(?P<word>[A-Za-z_][A-Za-z_0-9]*)
+)''', re.X)
+
+KEYWORDS = { 'true': True, 'false': False, 'null': None, 'none': None }
+
+
+def parse_relative_date(text):
+	'''Parse `now` or `today`, optionally with an offset like `+30d`.'''
+
+	match = re.fullmatch(r'(now|today)(?:\s*([+-])\s*(\d+)\s*([hdwmy]))?', text)
+	date = pendulum.now()
+	if match.group(1) == 'today':
+		date = pendulum.today()
+	if match.group(2):
+		amount = int(match.group(3)) * (match.group(2) == '-' and -1 or 1)
+		date = date.add(**{ OFFSET_UNITS[match.group(4)]: amount })
+	return date
+
+
+def tokenize(text):
+	tokens = []
+	position = 0
+	text = text.strip()
+	while position < len(text):
+		match = TOKEN.match(text, position)
+		if not match or match.end() == position:
+			raise InvalidQuery('Unexpected input at {}: {}'.format(position, text[position:position + 16]))
+		position = match.end()
+		kind = match.lastgroup
+		value = match.group(kind)
+
+		if kind == 'string':
+			value = re.sub(r'\\(.)', r'\1', value[1:-1])
+		elif kind == 'now':
+			kind, value = 'value', parse_relative_date(value)
+		elif kind == 'date':
+			kind, value = 'value', pendulum.parse(value)
+		elif kind == 'number':
+			kind, value = 'value', float(value) if '.' in value else int(value)
+		elif kind == 'op' and value == '=':
+			value = '=='
+		elif kind == 'word' and value.lower() in KEYWORDS:
+			kind, value = 'value', KEYWORDS[value.lower()]
+		elif kind == 'word':
+			value = value.lower()
+		tokens.append((kind, value))
+	return tokens
+
+
+class Parser:
+	'''Parse tokens into a tree of tuples:
+
+	* `('and', [node, ...])`, `('or', [node, ...])`, `('not', node)`
+	* `('cmp', field, op, value)`
+	* `('in', field, [value, ...])`
+	* `('contains', field, value)`, `('matches', field, pattern)`
+	'''
+
+	def __init__(self, tokens):
+		self.tokens, self.position = tokens, 0
+
+	def peek(self):
+		return self.position < len(self.tokens) and self.tokens[self.position] or (None, None)
+
+	def next(self):
+		token = self.peek()
+		self.position += 1
+		return token
+
+	def expect(self, kind, value=None):
+		token = self.next()
+		if token[0] != kind or (value is not None and token[1] != value):
+			raise InvalidQuery('Expected {}, got {}'.format(value or kind, token[1]))
+		return token[1]
+
+	def is_word(self, word):
+		return self.peek() == ('word', word)
+
+	def parse(self):
+		node = self.parse_or()
+		if self.position < len(self.tokens):
+			raise InvalidQuery('Unexpected {}'.format(self.peek()[1]))
+		return node
+
+	def parse_or(self):
+		nodes = [self.parse_and()]
+		while self.is_word('or'):
+			self.next()
+			nodes.append(self.parse_and())
+		return len(nodes) > 1 and ('or', nodes) or nodes[0]
+
+	def parse_and(self):
+		nodes = [self.parse_not()]
+		while self.is_word('and'):
+			self.next()
+			nodes.append(self.parse_not())
+		return len(nodes) > 1 and ('and', nodes) or nodes[0]
+
+	def parse_not(self):
+		if self.is_word('not'):
+			self.next()
+			return ('not', self.parse_not())
+		return self.parse_atom()
+
+	def parse_value(self, field):
+		kind, value = self.next()
+		if kind not in ('value', 'string'):
+			raise InvalidQuery('Expected a value, got {}'.format(value))
+		if field in DATE_FIELDS and isinstance(value, str):
+			value = pendulum.parse(value)
+		elif field in ('name', 'tld', 'name_servers') and isinstance(value, str):
+			value = value.lower()
+			if field == 'tld':
+				value = normalize_tld(value)
+		return value
+
+	def parse_atom(self):
+		if self.peek() == ('op', '('):
+			self.next()
+			node = self.parse_or()
+			self.expect('op', ')')
+			return node
+
+		field = self.expect('word')
+		if field not in FIELDS:
+			raise InvalidQuery('Unknown field {}'.format(field))
+
+		kind, value = self.next()
+		if kind == 'op' and value in ('==', '!=') + ORDERING:
+			return ('cmp', field, value, self.parse_value(field))
+
+		negated = kind == 'word' and value == 'not'
+		if negated:
+			kind, value = self.next()
+		if kind == 'word' and value == 'in':
+			self.expect('op', '(')
+			values = [self.parse_value(field)]
+			while self.peek() == ('op', ','):
+				self.next()
+				values.append(self.parse_value(field))
+			self.expect('op', ')')
+			node = ('in', field, values)
+		elif kind == 'word' and value in ('contains', 'matches'):
+			node = (value, field, self.parse_value(field))
+		else:
+			raise InvalidQuery('Unexpected {} after {}'.format(value, field))
+		return negated and ('not', node) or node
+
+
+def parse(text):
+	return Parser(tokenize(text)).parse()
+
+
+def _account(account):
+	if account is None or isinstance(account, str):
+		return account
+	return account.unique_identifier
+
+
+def _lower(value):
+	return value and value.lower()
+
+
+FIELD_EXPRESSIONS = {
+	'name': '_lower(d.name)',
+	'tld': '_lower(d.tld)',
+	'account': '_account(d.account)',
+}
+
+
+def _compile_node(node, constants):
+	def constant(value):
+		constants.append(value)
+		return 'c{}'.format(len(constants) - 1)
+
+	kind = node[0]
+	if kind == 'true':
+		return 'True'
+	if kind in ('and', 'or'):
+		return '(' + ' {} '.format(kind).join(_compile_node(child, constants) for child in node[1]) + ')'
+	if kind == 'not':
+		return '(not {})'.format(_compile_node(node[1], constants))
+
+	field = node[1]
+	value = FIELD_EXPRESSIONS.get(field, 'd.' + field)
+	if kind == 'cmp':
+		op = node[2]
+		if op in ORDERING:
+			return '((_v := {}) is not None and _v {} {})'.format(value, op, constant(node[3]))
+		return '({} {} {})'.format(value, op, constant(node[3]))
+	if kind == 'in':
+		return '({} in {})'.format(value, constant(frozenset(node[2])))
+	if kind == 'contains':
+		return '({} in ((_v := {}) or ()))'.format(constant(node[2]), value)
+	if kind == 'matches':
+		return '_fnmatch((_v := {}) or "", {})'.format(value, constant(node[2]))
+	if kind == 'match_name':
+		return '_match_name({}, {})'.format(value, constant(node[2]))
+	raise InvalidQuery('Unknown node {}'.format(kind))
+
+
+def compile_predicate(node):
+	'''Compile a tree from `parse()` into a single function,
+	taking a domain and returning whether it matches.
+	'''
+
+	constants = []
+	source = 'lambda d: ' + _compile_node(node, constants)
+	namespace = { 'c{}'.format(i): value for i, value in enumerate(constants) }
+	namespace.update(_account=_account, _lower=_lower, _fnmatch=fnmatchcase, _match_name=match_name)
+	return eval(compile(source, '<query>', 'eval'), namespace)
+
+
+def criteria_node(criteria, names=True, dates=True):
+	'''Build a tree equivalent to criteria of `Manager.iter_domains()`,
+	normalized, plus its `where` query, if any.
+	'''
+
+	nodes = []
+	if dates:
+		for field in DATE_FIELDS:
+			if criteria.get(field + '_before', None):
+				nodes.append(('cmp', field, '<=', criteria[field + '_before']))
+			if criteria.get(field + '_after', None):
+				nodes.append(('cmp', field, '>=', criteria[field + '_after']))
+	if names:
+		if criteria.get('tld', None):
+			nodes.append(('in', 'tld', [tld.lower() for tld in criteria['tld']]))
+		for term in criteria.get('search', None) or ():
+			nodes.append(('match_name', 'name', term.lower()))
+	if criteria.get('where', None):
+		nodes.append(criteria['where'].tree)
+
+	if not nodes:
+		return ('true',)
+	return len(nodes) > 1 and ('and', nodes) or nodes[0]
+
+
+def pushdown(node):
+	'''Criteria of `Manager.iter_domains()` implied by a tree, which
+	registrars, the index and snapshots can use to narrow down their work,
+	plus `patterns`, wildcard patterns of names for the index only.
+	The tree still has to be matched against what they return.
+	'''
+
+	criteria = {}
+	for child in node[0] == 'and' and node[1] or [node]:
+		kind, field = child[0], len(child) > 1 and child[1]
+		if kind == 'contains' and field == 'name' and isinstance(child[2], str):
+			# search terms with wildcards match whole names, unlike `contains`.
+			if not WILDCARDS.search(child[2]):
+				criteria.setdefault('search', []).append(child[2])
+		elif kind == 'cmp' and field == 'name' and child[2] == '==' and isinstance(child[3], str):
+			if not WILDCARDS.search(child[3]):
+				criteria.setdefault('search', []).append(child[3])
+		elif kind == 'matches' and field == 'name' and isinstance(child[2], str):
+			# registrars take wildcards literally, so patterns only narrow down
+			# the index, which does not support character classes in them.
+			if '[' not in child[2]:
+				criteria.setdefault('patterns', []).append(child[2])
+		elif kind == 'in' and field == 'tld' and all(isinstance(value, str) for value in child[2]):
+			criteria['tld'] = list(child[2])
+		elif kind == 'cmp' and field == 'tld' and child[2] == '==' and isinstance(child[3], str):
+			criteria['tld'] = [child[3]]
+		elif kind == 'cmp' and field in DATE_FIELDS and child[3] is not None:
+			if child[2] in ('<', '<=', '=='):
+				criteria[field + '_before'] = child[3]
+			if child[2] in ('>', '>=', '=='):
+				criteria[field + '_after'] = child[3]
+	return criteria
+
+
+class Query:
+	'''A parsed and compiled query.
+
+	Call it with a domain to tell whether it matches.
+	'''
+
+	def __init__(self, text):
+		self.text = text
+		self.tree = parse(text)
+		self.criteria = pushdown(self.tree)
+		'''Criteria implied by this query, see `pushdown()`.'''
+		self._predicate = compile_predicate(self.tree)
+
+	def __call__(self, domain):
+		return self._predicate(domain)
+
+	def __repr__(self):
+		return 'Query({!r})'.format(self.text)
@@ -0,0 +1,40 @@
+import time
+import threading
+
+
+class TokenBucket:
+	'''Allow up to `requests` per `seconds` on average, in bursts of up
+	to `requests`, shared by all threads using it.
+	'''
+
+	def __init__(self, requests, seconds):
+		self.capacity = requests
+		self.rate = requests / seconds
+		self._tokens = float(requests)
+		self._updated = time.monotonic()
+		self._lock = threading.Lock()
+
+	def _wait(self):
+		'''Take a token if there is one, or return seconds until there is.'''
+
+		with self._lock:
+			now = time.monotonic()
+			self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+			self._updated = now
+			if self._tokens >= 1:
+				self._tokens -= 1
+				return 0
+			return (1 - self._tokens) / self.rate
+
+	def acquire(self, deadline=None):
+		'''Block until a request is allowed, returning `True`, or `False`
+		if it would not be before `deadline`, as of `time.monotonic()`.
+		'''
+
+		while True:
+			wait = self._wait()
+			if not wait:
+				return True
+			if deadline is not None and time.monotonic() + wait > deadline:
+				return False
+			time.sleep(wait)
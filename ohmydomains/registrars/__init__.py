@@ -10,6 +10,7 @@ SUPPORTED_REGISTRARS = (
 	'namesilo',
 	'name',
 	'zeit',
+	'gandi',
 )
 '''Supported registrars.
 Each entry corresponds to a submodule in `ohmydomains.registrars`.'''
@@ -25,3 +26,17 @@ def get_registrar(name):
 
 registrars = ObjectDict({ name: get_registrar(name) for name in SUPPORTED_REGISTRARS })
 
+
+
+def account_from_export(record, net_init=True):
+	'''Rebuild an account from the result of `RegistrarAccount.export()`.'''
+
+	if record['registrar'] not in registrars:
+		raise UnsupportedRegistrarError(record['registrar'])
+	return registrars[record['registrar']].Account(
+		net_init=net_init,
+		testing=record.get('testing', False),
+		tags=list(record.get('tags', [])),
+		timeout=record.get('timeout', None) and tuple(record['timeout']),
+		transport=record.get('transport', None),
+		**record['credentials'])
@@ -1,4 +1,18 @@
-from ohmydomains.util import RequestTimeout, MaxTriesReached
+import copy
+import json
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from ohmydomains.cache import ResponseCache, shared_cache
+from ohmydomains.concurrency import get_limiter
+from ohmydomains.domain import Domain
+from ohmydomains.journal import JournalingTransport, ReplayTransport, NotJournaled
+from ohmydomains.mapping import compile_domain_mapping, compile_contact_mapping
+from ohmydomains.planning import Cost
+from ohmydomains.ratelimit import TokenBucket
+from ohmydomains.transport import get_transport
+from ohmydomains.util import RequestTimeout, RequestFailed, MaxTriesReached, DeadlineExceeded, ServerBusy
 
 
 class RegistrarAccount:
@@ -10,20 +24,173 @@ class RegistrarAccount:
 	NEEDED_CREDENTIALS = ()
 	OPTIONAL_CREDENTIALS = ()
 
-	def __init__(self, testing=False, net_init=True, tags=[], **credentials):
+	TIMEOUT = (10, 60)
+	'''Default connect and read timeouts of requests, in seconds.'''
+
+	TRANSPORT = 'requests'
+	'''Name of the default transport, one of `ohmydomains.transport.TRANSPORTS`.'''
+
+	DETAIL_CONCURRENCY = 1
+	'''Maximum number of per domain requests in flight while listing.'''
+
+	ENDPOINT_CONCURRENCY = 16
+	'''Maximum number of requests in flight to the API endpoint, by all accounts
+	of a process together, below which it is tuned adaptively, see
+	`ohmydomains.concurrency.AdaptiveLimiter`.'''
+
+	RETRY_AFTER_MAX = 30
+	'''Maximum seconds to wait before trying again a request the endpoint was busy for.'''
+
+	DOMAIN_LOOKUP_COST = None
+	'''Number of requests `get_domain()` makes, used to order accounts
+	when probing which one holds a domain name. `None` if it has to
+	list all domain names.'''
+
+	RATE_LIMIT = None
+	'''Maximum number of requests to the registrar API, as `(requests, seconds)`,
+	or `None` if there is no known limit.'''
+
+	QUOTAS = ()
+	'''Limits of requests to the registrar API besides `RATE_LIMIT`, as
+	`(requests, seconds)`, e.g. hourly caps; not enforced, but planned for.'''
+
+	AVAILABILITY_BATCH_SIZE = None
+	'''Maximum number of domain names checked per request by `check_availability()`,
+	or `None` if not supported. Registrars supporting it implement
+	`_check_availability(names)`, checking a batch of lowercased names,
+	returning a `dict` of name to whether it is available; names left out are unknown.'''
+
+	REQUEST_COSTS = {}
+	'''Requests operations make, as `ohmydomains.planning.Cost`, by operation,
+	one of `ohmydomains.planning.OPERATIONS`; see `request_cost()`.'''
+
+	CACHE_TTLS = {}
+	'''Seconds to cache responses of requests for, by endpoint, as of
+	`_cache_scope()`; requests to endpoints left out are not cached.'''
+
+	INVALIDATES = {}
+	'''Endpoints of cached responses which requests to each mutating
+	endpoint invalidate, for the same domain names.'''
+
+	JOURNAL_HEADERS = ()
+	'''Headers of responses the account reads, journaled besides
+	`ohmydomains.journal.RESPONSE_HEADERS`.'''
+
+	VOLATILE_PARAMS = ()
+	'''Params of requests depending on where they are made from rather
+	than what they ask, e.g. the client IP address, left out of journals
+	and of keys responses are replayed by.'''
+
+	DOMAIN_MAPPINGS = {}
+	'''Mappings of raw domain payloads to `Domain` fields, by shape of
+	payload, e.g. `list` for items of listings; see `ohmydomains.mapping`.
+	Compiled at class creation, used through `_domain_from_raw()`.'''
+
+	CONTACT_KIND_MAP = None
+	'''Keys of raw contacts by contact kind, if the registrar gives all at once.'''
+
+	CONTACT_ATTR_MAP = None
+	'''Mapping of raw contacts to `Contact` fields, see `ohmydomains.mapping`.
+	Compiled at class creation into `_convert_contact(raw, kind)`, and
+	`_convert_contacts(raw)` with `CONTACT_KIND_MAP`.'''
+
+	def __init_subclass__(cls, **kwargs):
+		super().__init_subclass__(**kwargs)
+		cls._domain_converters = { shape: compile_domain_mapping(mapping, registrar_name=cls.REGISTRAR_NAME)
+			for shape, mapping in cls.DOMAIN_MAPPINGS.items() }
+		if cls.CONTACT_ATTR_MAP and cls.CONTACT_KIND_MAP:
+			convert_contact, convert_contacts = compile_contact_mapping(cls.CONTACT_ATTR_MAP, cls.CONTACT_KIND_MAP)
+			cls._convert_contact, cls._convert_contacts = staticmethod(convert_contact), staticmethod(convert_contacts)
+		elif cls.CONTACT_ATTR_MAP:
+			cls._convert_contact = staticmethod(compile_contact_mapping(cls.CONTACT_ATTR_MAP))
+
+	def __init__(self, testing=False, net_init=True, tags=None, timeout=None, transport=None, **credentials):
 		self._credentials = credentials
 		self.is_testing_account = testing
-		self.tags = tags
+		self.tags = list(tags or [])
 		self._api_base = testing and self.API_BASE_TESTING or self.API_BASE
+		self.timeout = timeout or self.TIMEOUT
+		'''Connect and read timeouts of requests, in seconds.'''
+		self._transport_name = isinstance(transport, str) and transport or None
+		self._transport = get_transport(transport or self.TRANSPORT)
+		self.detail_concurrency = self.DETAIL_CONCURRENCY
+		self._rate_limiter = self.RATE_LIMIT and TokenBucket(*self.RATE_LIMIT)
+		self._limiter = self._api_base and get_limiter(self._api_base, maximum=self.ENDPOINT_CONCURRENCY) or None
+		self._local = threading.local()
+		self.response_cache = shared_cache
+		'''An `ohmydomains.cache.ResponseCache`, shared by accounts by default.'''
+		self.parse_pool = None
+		'''An `ohmydomains.parsing.ParsePool` to parse large responses in, if any.'''
+
+	@property
+	def deadline(self):
+		'''Time, as of `time.monotonic()`, after which no more requests are made,
+		or `None`. It is per thread, so concurrent listings of an account
+		each have their own.'''
+
+		return getattr(self._local, 'deadline', None)
+
+	@deadline.setter
+	def deadline(self, deadline):
+		self._local.deadline = deadline
 
 	def export(self):
-		return {
+		record = {
 			'registrar': self.REGISTRAR,
 			'credentials': self._credentials,
 			'testing': self.is_testing_account,
 			'tags': self.tags
 		}
+		if tuple(self.timeout) != tuple(self.TIMEOUT):
+			record['timeout'] = list(self.timeout)
+		if self._transport_name and self._transport_name != self.TRANSPORT:
+			record['transport'] = self._transport_name
+		return record
 	
+	def secrets(self):
+		'''Values of credentials, kept out of anything written but the config.'''
+
+		return frozenset(str(value) for value in self._credentials.values() if value)
+
+	@property
+	def journal(self):
+		'''An `ohmydomains.journal.Journal` raw responses of requests
+		are recorded to, if any.'''
+
+		return isinstance(self._transport, JournalingTransport) and self._transport.journal or None
+
+	@journal.setter
+	def journal(self, journal):
+		transport = self._transport
+		if isinstance(transport, JournalingTransport):
+			transport = transport.transport
+		self._transport = journal and JournalingTransport(transport, journal, self) or transport
+
+	def copy(self):
+		'''A copy of this account, sharing its credentials, rate limits,
+		limiters and cached responses, for a listing to change, e.g. its
+		transport, without affecting other listings of this account.'''
+
+		account = copy.copy(self)
+		account._local = threading.local()
+		return account
+
+	def replaying(self, responses):
+		'''A copy of this account answering requests with `responses` of it
+		in a journal, as of `ohmydomains.journal.Journal.responses()`,
+		instead of requesting the registrar, with no rate limits nor
+		responses cached before. Requests not journaled raise `NotJournaled`.
+
+		This account is left as is, so its other requests, e.g. in other
+		threads, still go to the registrar.
+		'''
+
+		account = self.copy()
+		account._transport = ReplayTransport(responses, self.secrets(), volatile=self.VOLATILE_PARAMS)
+		account._rate_limiter = account._limiter = None
+		account.response_cache = ResponseCache()
+		return account
+
 	@property
 	def identifier(self): pass
 
@@ -33,27 +200,264 @@ class RegistrarAccount:
 	
 	def test_credentials(self): return True
 	
+	def _request_timeout(self):
+		'''Timeouts to pass to `requests`, cut short by `deadline`.'''
+
+		if self.deadline is None:
+			return self.timeout
+		remaining = self.deadline - time.monotonic()
+		if remaining <= 0:
+			raise DeadlineExceeded(self)
+		return tuple(min(value, remaining) for value in self.timeout)
+
 	def _request(self, *args, **kwargs): pass
 
+	def request_cost(self, operation):
+		'''`ohmydomains.planning.Cost` of `operation`, as of `REQUEST_COSTS`,
+		or `None` if it is not supported, or its cost is not known.'''
+
+		if operation == 'check_availability' and operation not in self.REQUEST_COSTS:
+			return self.AVAILABILITY_BATCH_SIZE and Cost(per_batch=1, batch_size=self.AVAILABILITY_BATCH_SIZE, concurrent=True) or None
+		return self.REQUEST_COSTS.get(operation, None)
+
+	def quotas(self):
+		'''`RATE_LIMIT` and `QUOTAS` together.'''
+
+		return (self.RATE_LIMIT and (tuple(self.RATE_LIMIT),) or ()) + tuple(self.QUOTAS)
+
+	def _parse(self, function, payload, *args):
+		'''`function(payload, *args)`, through `parse_pool` if any.'''
+
+		if self.parse_pool is None:
+			return function(payload, *args)
+		return self.parse_pool.parse(function, payload, *args)
+
+	def _domain_from_raw(self, raw, shape, contacts=None, **fields):
+		'''Convert a raw domain payload of `shape` in `DOMAIN_MAPPINGS`,
+		`fields` overriding those mapped.'''
+
+		return self._domain_converters[shape](raw, self, contacts, **fields)
+
+	def _cache_scope(self, *args, **kwargs):
+		'''Endpoint a request is to, with names of domains replaced by `{}`,
+		and lowercased domain names it is about, from arguments of `_request()`.'''
+
+		return args[0], ()
+
+	def invalidate_cache(self, names=None):
+		'''Drop cached responses of this account, about any of `names`
+		if provided, e.g. to get domain names again as they are now.'''
+
+		self.response_cache.invalidate(self.unique_identifier, names=names)
+
 	def _try_request(self, *args, max_tries=3, **kwargs):
+		'''Make a request through `_request()`, trying again if it fails
+		without an answer of the registrar.
+
+		Responses of endpoints in `CACHE_TTLS` are cached, and identical
+		requests in flight share one; requests to endpoints in `INVALIDATES`
+		drop those cached they affect.
+		'''
+
+		endpoint, names = self._cache_scope(*args, **kwargs)
+		ttl = self.CACHE_TTLS.get(endpoint, None)
+		if ttl:
+			key = (self.unique_identifier, json.dumps([args, kwargs], sort_keys=True, default=str))
+			return self.response_cache.get(key, ttl,
+				lambda: self._request_tries(*args, max_tries=max_tries, **kwargs),
+				(self.unique_identifier, endpoint, names))
+
+		try:
+			return self._request_tries(*args, max_tries=max_tries, **kwargs)
+		finally:
+			if endpoint in self.INVALIDATES:
+				# even a failed request may have changed something.
+				self.response_cache.invalidate(self.unique_identifier, self.INVALIDATES[endpoint], names)
+
+	def _request_tries(self, *args, max_tries=3, **kwargs):
 		tries = 0
 		response = None
+		error = None
 		while tries < max_tries:
+			if self.deadline is not None and time.monotonic() >= self.deadline:
+				raise DeadlineExceeded(self)
+			if self._rate_limiter and not self._rate_limiter.acquire(self.deadline):
+				raise DeadlineExceeded(self)
+			if self._limiter and not self._limiter.acquire(self.deadline):
+				raise DeadlineExceeded(self)
+
+			start = time.monotonic()
+			outcome = 'error'
+			busy = None
 			try:
 				response = self._request(*args, **kwargs)
+				outcome = 'ok'
 				break
-			except:
+			except RequestFailed:
+				# the registrar did answer; trying again will not help.
+				outcome = 'ok'
+				raise
+			except (DeadlineExceeded, NotJournaled):
+				# we are out of time, or replaying, which tells nothing of the endpoint.
+				outcome = None
+				raise
+			except ServerBusy as e:
+				outcome = e.args[0] == 429 and 'throttled' or 'error'
+				busy = error = e
 				tries += 1
+			except Exception as e:
+				error = e
+				tries += 1
+			finally:
+				if self._limiter:
+					self._limiter.release(time.monotonic() - start, outcome)
+
+			if busy and tries < max_tries:
+				self._back_off(tries, busy.args[1])
 		if tries == max_tries and not response:
-			raise MaxTriesReached(self, tries)
+			# chained to the last error, e.g. to tell timeouts from others.
+			raise MaxTriesReached(self, tries) from error
 
 		return response
+
+	def _back_off(self, tries, retry_after=None):
+		'''Wait before trying again a request the endpoint was busy for,
+		as long as it asked for, if it did, or exponentially longer.'''
+
+		try:
+			wait = float(retry_after)
+		except (TypeError, ValueError):
+			wait = 0.5 * 2 ** (tries - 1)
+		wait = min(wait, self.RETRY_AFTER_MAX)
+		if self.deadline is not None and time.monotonic() + wait >= self.deadline:
+			raise DeadlineExceeded(self)
+		time.sleep(wait)
 	
+	def _map_details(self, function, items):
+		'''Like `map()`, but with up to `detail_concurrency` calls in flight,
+		for per domain requests while listing. Order is preserved.
+		'''
+
+		if self.detail_concurrency <= 1:
+			yield from map(function, items)
+			return
+
+		deadline = self.deadline
+
+		def call(item):
+			# workers keep to the deadline of the listing thread.
+			self.deadline = deadline
+			return function(item)
+
+		with ThreadPoolExecutor(max_workers=self.detail_concurrency) as executor:
+			pending = deque()
+			try:
+				for item in items:
+					pending.append(executor.submit(call, item))
+					if len(pending) >= self.detail_concurrency * 2:
+						yield pending.popleft().result()
+				while pending:
+					yield pending.popleft().result()
+			finally:
+				for future in pending:
+					future.cancel()
+
+	def _iter_pages(self, fetch_page, checkpoints=None, key=None):
+		'''Iterate through domain names of a paginated listing,
+		resuming from and recording checkpoints in `checkpoints`,
+		an `ohmydomains.checkpoint.CheckpointStore`, if provided.
+
+		* `fetch_page`: function taking a page number, from 1, and returning
+		an iterable of its domain names, the total count reported by the registrar,
+		and the number of the last page.
+		* `key`: what distinguishes this listing from others of this account,
+		e.g. its search term.
+
+		A checkpoint is discarded when the listing completes, or when
+		the total count changed, in which case the listing starts over.
+		'''
+
+		checkpoint = checkpoints and checkpoints.load(self, key)
+		page = checkpoint and checkpoint.next_page or 1
+		domains, total, last_page = fetch_page(page)
+
+		if checkpoint and checkpoint.total != total:
+			# pages have shifted on the registrar side.
+			checkpoint = None
+			if page != 1:
+				page = 1
+				domains, total, last_page = fetch_page(page)
+		if checkpoint:
+			for record in checkpoint.records():
+				yield Domain.from_export(record, account=self)
+		elif checkpoints:
+			checkpoint = checkpoints.start(self, key, total)
+
+		while True:
+			fetched = []
+			for domain in domains:
+				fetched.append(domain)
+				yield domain
+			if checkpoint:
+				checkpoint.record(page, fetched)
+
+			if page >= last_page:
+				break
+			page += 1
+			domains, page_total, last_page = fetch_page(page)
+			if checkpoint and page_total != total:
+				checkpoints.discard(self, key)
+				checkpoint = None
+
+		if checkpoints:
+			checkpoints.discard(self, key)
+
+	def _check_batch(self, names):
+		try:
+			answers = self._check_availability(names)
+		except (RequestFailed, MaxTriesReached):
+			answers = {}
+		return { name: answers.get(name, None) for name in names }
+
+	def check_availability(self, names):
+		'''Check whether domain names are available to register, in batches
+		of `AVAILABILITY_BATCH_SIZE`, up to `detail_concurrency` in flight.
+
+		Returns a `dict` of lowercased name to `True` or `False`, or `None`
+		if unknown, e.g. because its batch failed or the registrar does not
+		support checking.
+		'''
+
+		names = [name.lower() for name in names]
+		if not self.AVAILABILITY_BATCH_SIZE:
+			return { name: None for name in names }
+		size = self.AVAILABILITY_BATCH_SIZE
+		results = {}
+		for answers in self._map_details(self._check_batch, [names[i:i + size] for i in range(0, len(names), size)]):
+			results.update(answers)
+		return results
+
 	def update_contacts(self, names, contacts): pass
 
 	def update_name_servers(self, names, servers): pass
 	
-	def iter_domains(self, **criteria): pass
+	def iter_domains(self, **criteria):
+		'''Iterate through domain names of this account.
+
+		* `search`: a search term the registrar may narrow down the listing with.
+		* `checkpoints`: an `ohmydomains.checkpoint.CheckpointStore`
+		to resume paginated listings with, see `_iter_pages()`.
+		'''
+
+	def get_domain(self, name):
+		'''Get a single domain name of this account,
+		or `None` if this account does not hold it.
+		'''
+
+		for domain in self.iter_domains(search=name):
+			if domain and domain.name.lower() == name.lower():
+				return domain
+		return None
 
 	def get_domains(self, *args, **kwargs):
 		return [i for i in self.iter_domains(*args, **kwargs)]
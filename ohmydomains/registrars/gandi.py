@@ -1,18 +1,46 @@
+import re
 from math import ceil
-import requests
-import pendulum
+from ohmydomains.planning import Cost
 from ohmydomains.registrars.account import RegistrarAccount
-from ohmydomains.domain import Domain
-from ohmydomains.contact import Contact, ContactList
 from ohmydomains.util import RequestFailed
 
 
+def _listed_name_servers(raw):
+	return [raw['nameserver']['current']] + raw['nameserver'].get('hosts', [])
+
+
+def _locked(statuses):
+	# listed and detailed domain names alike have their EPP statuses.
+	return 'clientTransferProhibited' in statuses
+
+
 class GandiAccount(RegistrarAccount):
+	REGISTRAR = 'gandi'
 	REGISTRAR_NAME = 'Gandi'
 	API_BASE = 'https://api.gandi.net/v5'
 	API_BASE_TESTING = ''
 	NEEDED_CREDENTIALS = ('api_key',)
 	LIST_PER_PAGE = 100
+	DETAIL_CONCURRENCY = 16
+	# the domain itself, and its contacts.
+	DOMAIN_LOOKUP_COST = 2
+	# https://api.gandi.net/docs/reference/#Rate-Limiting
+	RATE_LIMIT = (1000, 60)
+	AVAILABILITY_BATCH_SIZE = 1
+	JOURNAL_HEADERS = ('Total-Count',)
+	REQUEST_COSTS = {
+		# pages of domain names, then contacts of each.
+		'list': Cost(per_batch=1, batch_size=LIST_PER_PAGE, per_item=1, minimum=1, concurrent=True),
+		'update_name_servers': Cost(per_item=1),
+	}
+
+	CACHE_TTLS = {
+		'/domain/domains/{}': 300,
+		'/domain/domains/{}/contacts': 300,
+	}
+	INVALIDATES = {
+		'/domain/domains/{}/nameservers': ('/domain/domains/{}',),
+	}
 
 	CONTACT_KIND_MAP = {
 		'registrant': 'owner',
@@ -34,35 +62,71 @@ class GandiAccount(RegistrarAccount):
 		'email': 'email'
 	}
 
+	DOMAIN_MAPPINGS = {
+		'list': {
+			'name': 'fqdn',
+			'creation': ('dates.created_at|dates.registry_created_at', 'date'),
+			'expiry': ('dates.deletes_at|dates.registry_ends_at', 'date'),
+			'lock': ('status', _locked),
+			'auto_renew': 'autorenew',
+			'name_servers': _listed_name_servers,
+		},
+		'details': {
+			'name': 'fqdn',
+			'creation': ('dates.created_at|dates.registry_created_at', 'date'),
+			'expiry': ('dates.deletes_at|dates.registry_ends_at', 'date'),
+			'lock': ('status', _locked),
+			'auto_renew': 'autorenew.enabled',
+			'name_servers': 'nameservers',
+		},
+	}
+
 	def __init__(self, **kwargs):
 		super().__init__(**kwargs)
 
 		self._auth_header = {
-			'Authorization': 'Apikey '.format(self._credentials['api_key'])
+			'Authorization': 'Apikey {}'.format(self._credentials['api_key'])
 		}
 
+	@property
+	def identifier(self):
+		# the API key is all there is without a request,
+		# so we just use part of it.
+		return self._credentials['api_key'][:6]
+
 	def _request(self, endpoint, method='get', params=None, data=None):
-		response = getattr(requests, method)(self._api_base + endpoint, headers=self._auth_header, params=params, json=data)
+		response = self._transport.request(method, self._api_base + endpoint, headers=self._auth_header, params=params, json=data,
+			timeout=self._request_timeout())
 		json = response.json()
 		if response.status_code != 200:
 			raise RequestFailed(json, endpoint, method, params, data, self)
 		return (json, response.headers)
 	
+	def _cache_scope(self, endpoint, method='get', params=None, data=None):
+		match = re.match(r'/domain/domains/([^/]+)(.*)$', endpoint)
+		if match:
+			return '/domain/domains/{}' + match.group(2), (match.group(1).lower(),)
+		return endpoint, ()
+
 	def test_credentials(self):
 		try:
 			self._try_request('/domain/check', params={ 'name': 'example.com' })
 			return True
-		except:
+		except RequestFailed:
 			return False
 	
 	def _get_contacts(self, name):
-		data = self._try_request('/domain/domains/{}/contacts'.format(name))
-		return ContactList({
-			kind: Contact({
-				attr: data[kind_key].get(attr_key, None) for attr, attr_key in self.CONTACT_ATTR_MAP.items()
-			}) for kind,  kind_key in self.CONTACT_KIND_MAP.items()
-		})
+		data, headers = self._try_request('/domain/domains/{}/contacts'.format(name))
+		return self._convert_contacts(data)
 	
+	def get_domain(self, name):
+		try:
+			raw, headers = self._try_request('/domain/domains/{}'.format(name))
+		except RequestFailed:
+			return None
+
+		return self._domain_from_raw(raw, 'details', contacts=self._get_contacts(raw['fqdn']))
+
 	def update_contacts(self, names, contacts):
 		pass
 
@@ -78,31 +142,22 @@ class GandiAccount(RegistrarAccount):
 				pass
 		return finished
 	
-	def iter_domains(self, **criteria):
-		page_id = 1
-		total_pages = 2
+	def _check_availability(self, names):
+		data, headers = self._try_request('/domain/check', params={ 'name': names[0] })
+		return { names[0]: any(product['status'] == 'available' for product in data.get('products', [])) }
 
-		params = {
-			'page': page_id,
-			'per_page': self.LIST_PER_PAGE
-		}
+	def iter_domains(self, checkpoints=None, **criteria):
+		params = { 'per_page': self.LIST_PER_PAGE }
 		if criteria.get('search', None):
 			params['fqdn'] = criteria['search']
 
-		while page_id < total_pages:
-			data, headers = self._try_request('/domain/domains', params=params)
-			total_pages = ceil(headers['Total-Count'] / self.LIST_PER_PAGE)
-			page_id += 1
-
-			for raw in data:
-				yield Domain(
-					account=self,
-					contacts=self._get_contacts(raw['fqdn']),
+		def fetch_page(page):
+			data, headers = self._try_request('/domain/domains', params=dict(params, page=page))
+			total = int(headers['Total-Count'])
+			return self._iter_page(data), total, ceil(total / self.LIST_PER_PAGE)
 
-					name=raw['fqdn'],
-					creation=pendulum.parse(raw['dates'].get('created_at', ['registry_created_at'])),
-					expiry=pendulum.parse(raw['dates'].get('deletes_at', raw['dates'].get('registry_ends_at', None))),
-					registrar_name=self.REGISTRAR_NAME,
+		yield from self._iter_pages(fetch_page, checkpoints, key=params.get('fqdn', None))
 
-					auto_renew=raw['autorenew'],
-					name_servers=[raw['nameserver']['current']] + raw['nameserver'].get('hosts', []))
+	def _iter_page(self, data):
+		for raw, contacts in zip(data, self._map_details(self._get_contacts, (raw['fqdn'] for raw in data))):
+			yield self._domain_from_raw(raw, 'list', contacts=contacts)
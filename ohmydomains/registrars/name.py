@@ -1,7 +1,5 @@
-import requests
-import pendulum
-from ohmydomains.domain import Domain
-from ohmydomains.contact import Contact, ContactList
+import re
+from ohmydomains.planning import Cost
 from ohmydomains.registrars.account import RegistrarAccount
 from ohmydomains.util import RequestFailed
 
@@ -12,6 +10,26 @@ class NameAccount(RegistrarAccount):
 	API_BASE = 'https://api.name.com/v4'
 	API_BASE_TESTING = 'https://api.dev.name.com/v4'
 	NEEDED_CREDENTIALS = ('username', 'token')
+	DETAIL_CONCURRENCY = 16
+	DOMAIN_LOOKUP_COST = 1
+	LIST_PER_PAGE = 1000
+	# https://www.name.com/api-docs#rate-limits
+	RATE_LIMIT = (20, 1)
+	AVAILABILITY_BATCH_SIZE = 50
+	REQUEST_COSTS = {
+		# pages of names, then each domain name.
+		'list': Cost(per_batch=1, batch_size=LIST_PER_PAGE, per_item=1, minimum=1, concurrent=True),
+		'update_name_servers': Cost(per_item=1),
+		'update_contacts': Cost(per_item=1),
+	}
+
+	CACHE_TTLS = {
+		'/domains/{}': 300,
+	}
+	INVALIDATES = {
+		'/domains/{}:setContacts': ('/domains/{}',),
+		'/domains/{}:setNameservers': ('/domains/{}',),
+	}
 
 	CONTACT_KIND_MAP = {
 		'registrant': 'registrant',
@@ -35,6 +53,18 @@ class NameAccount(RegistrarAccount):
 		'email': 'email'
 	}
 
+	DOMAIN_MAPPINGS = {
+		'details': {
+			'creation': ('createDate', 'date'),
+			'expiry': ('expireDate', 'date'),
+			# false values are left out.
+			'lock': ('locked', 'bool', False),
+			'auto_renew': ('autorenewEnabled', 'bool', False),
+			'whois_privacy': ('privacyEnabled', 'bool', False),
+			'name_servers': 'nameservers',
+		},
+	}
+
 	def __init__(self, *args, **kwargs):
 		super().__init__(*args, **kwargs)
 		self._auth = (self._credentials['username'], self._credentials['token'])
@@ -47,46 +77,50 @@ class NameAccount(RegistrarAccount):
 		try:
 			self._try_request('/hello')
 			return True
-		except:
+		except RequestFailed:
 			return False
 
 	def _request(self, endpoint, method='get', params=None, data=None):
-		response = getattr(requests, method)(self._api_base + endpoint,
+		response = self._transport.request(method, self._api_base + endpoint,
 			auth=self._auth,
 			params=params,
-			json=data)
+			json=data,
+			timeout=self._request_timeout())
 		json = response.json()
 		if response.status_code != 200:
 			raise RequestFailed(json, method, endpoint, params, data, self)
 		return json
 
 
+	def _cache_scope(self, endpoint, method='get', params=None, data=None):
+		match = re.match(r'/domains/([^/:]+)(.*)$', endpoint)
+		if match:
+			return '/domains/{}' + match.group(2), (match.group(1).lower(),)
+		return endpoint, ()
+
+	def _check_availability(self, names):
+		response = self._try_request('/domains:checkAvailability', method='post', data={ 'domainNames': names })
+		# names which can not be registered may be left out.
+		answers = { name: False for name in names }
+		for result in response.get('results', []):
+			answers[result['domainName'].lower()] = result.get('purchasable', False)
+		return answers
+
 	def _get_domain(self, name):
 		response = self._try_request('/domains/' + name)
-
-		return Domain(
-			contacts=ContactList({
-				kind: Contact({
-					attr: response['contacts'][kind_key].get(attr_key, None) for attr, attr_key in self.CONTACT_ATTR_MAP.items()
-				}) for kind, kind_key in self.CONTACT_KIND_MAP.items()
-			}),
-			account=self,
-
-			name=name,
-			creation=pendulum.parse(response['createDate']),
-			expiry=pendulum.parse(response['expireDate']),
-			registrar_name=self.REGISTRAR_NAME,
-
-			lock=response['locked'],
-			auto_renew=response['autorenewEnabled'],
-			whois_privacy=response.get('privacyEnabled', False),
-			name_servers=response['nameservers'])
+		return self._domain_from_raw(response, 'details', name=name, contacts=self._convert_contacts(response.get('contacts', None)))
 	
+	def get_domain(self, name):
+		try:
+			return self._get_domain(name)
+		except RequestFailed:
+			return None
+
 	def update_contacts(self, names, contacts):
 		finished = []
 		data = {
 			kind_key: {
-				attr_key: contacts[kind][attr] for attr, attr_key in self.CONTACT_ATTR_MAP.items()
+				attr_key: contacts[kind].get(attr, None) for attr, attr_key in self.CONTACT_ATTR_MAP.items()
 			} for kind, kind_key in self.CONTACT_KIND_MAP.items()
 		}
 		for name in names:
@@ -101,7 +135,7 @@ class NameAccount(RegistrarAccount):
 		finished = []
 		for name in names:
 			try:
-				self._try_request('/domains/{}:setNameservers', method='post', data={
+				self._try_request('/domains/{}:setNameservers'.format(name), method='post', data={
 					'nameservers': servers
 				})
 				finished.append(name)
@@ -109,15 +143,13 @@ class NameAccount(RegistrarAccount):
 				pass
 		return finished
 
-	def iter_domains(self, **criteria):
-		page_id = 1
-		total_pages = 2
-
-		while page_id < total_pages:
-			response = self._try_request('/domains', params={ 'page': page_id, 'perPage': 1000 })
-			if 'lastPage' in response:
-				total_pages = response['lastPage']
-			page_id += 1
+	def iter_domains(self, checkpoints=None, **criteria):
+		def fetch_page(page):
+			response = self._try_request('/domains', params={ 'page': page, 'perPage': self.LIST_PER_PAGE })
+			# `lastPage` is left out of the last page; as no total count is
+			# provided, the number of pages stands for it.
+			last_page = response.get('lastPage', page)
+			names = [raw['domainName'] for raw in response.get('domains', [])]
+			return self._map_details(self._get_domain, names), last_page, last_page
 
-			for raw in response.get('domains', []):
-				yield self._get_domain(raw['domainName'])
+		yield from self._iter_pages(fetch_page, checkpoints)
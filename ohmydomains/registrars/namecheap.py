@@ -1,21 +1,52 @@
 import requests
 import xmltodict
 import pendulum
+from datetime import datetime
 from math import ceil
-from ohmydomains.domain import Domain
-from ohmydomains.contact import Contact, ContactList
+from functools import lru_cache
+from ohmydomains.parsing import domain_record, domain_from_record
+from ohmydomains.planning import Cost
 from ohmydomains.registrars.account import RegistrarAccount
 from ohmydomains.util import RequestFailed
 
 
+@lru_cache(maxsize=None)
 def get_ip_address():
 	# Thank you fellas
-	return requests.get('https://api.ipify.org/?format=raw').text
+	return requests.get('https://api.ipify.org/?format=raw', timeout=RegistrarAccount.TIMEOUT).text
 
 
 def get_date(date_str):
 	# Hello, American
-	return pendulum.from_format(date_str, 'MM/DD/YYYY')
+	return pendulum.instance(datetime.strptime(date_str, '%m/%d/%Y'))
+
+
+def parse_reply(content):
+	'''`ApiResponse` of a raw response.'''
+
+	return xmltodict.parse(content)['ApiResponse']
+
+
+def parse_list_reply(content):
+	'''`ApiResponse` of a raw response of `namecheap.domains.getList`,
+	with its domain names as records, see `ohmydomains.parsing`.'''
+
+	data = parse_reply(content)
+	result = data['@Status'] == 'OK' and data['CommandResponse']['DomainGetListResult']
+	if result:
+		raw_domains = result.get('Domain', None) or []
+		# in case there is exactly one result and it's not parsed as list
+		if '@Name' in raw_domains:
+			raw_domains = [raw_domains]
+		convert = NameCheapAccount._domain_converters['list']
+		result['Domain'] = [domain_record(convert(raw_domain, None)) for raw_domain in raw_domains]
+	return data
+
+
+REPLY_PARSERS = {
+	'namecheap.domains.getList': parse_list_reply,
+}
+'''Parse functions of raw responses by command, other than `parse_reply()`.'''
 
 class NameCheapAccount(RegistrarAccount):
 	'''Registrar API for https://www.namecheap.com:[NameCheap].
@@ -37,8 +68,10 @@ class NameCheapAccount(RegistrarAccount):
 	API_BASE_TESTING = 'https://api.sandbox.namecheap.com/xml.response'
 	NEEDED_CREDENTIALS = ('api_user', 'api_key')
 	OPTIONAL_CREDENTIALS = ('username', 'client_ip')
+	# `getList` searching for it, `getContacts`, and `dns.getList`.
+	DOMAIN_LOOKUP_COST = 3
 
-	CONTACT_TYPE_MAP = {
+	CONTACT_KIND_MAP = {
 		'registrant': 'Registrant',
 		'technical': 'Tech',
 		'administrative': 'Admin',
@@ -63,6 +96,38 @@ class NameCheapAccount(RegistrarAccount):
 	}
 
 
+	DOMAIN_MAPPINGS = {
+		'list': {
+			'name': '@Name',
+			'creation': ('@Created', get_date),
+			'expiry': ('@Expires', get_date),
+			'lock': ('@IsLocked', 'true'),
+			'auto_renew': ('@AutoRenew', 'true'),
+			'whois_privacy': ('@WhoisGuard', 'enabled'),
+		},
+	}
+
+	# https://www.namecheap.com/support/api/intro/
+	RATE_LIMIT = (20, 60)
+	QUOTAS = ((700, 3600), (8000, 86400))
+	AVAILABILITY_BATCH_SIZE = 50
+	VOLATILE_PARAMS = ('ClientIp',)
+	REQUEST_COSTS = {
+		# pages of domain names, then contacts and name servers of each, one after another.
+		'list': Cost(per_batch=1, batch_size=100, per_item=2, minimum=1),
+		'update_name_servers': Cost(per_item=1),
+		'update_contacts': Cost(per_item=1),
+	}
+
+	CACHE_TTLS = {
+		'namecheap.domains.getContacts': 300,
+		'namecheap.domains.dns.getList': 300,
+	}
+	INVALIDATES = {
+		'namecheap.domains.dns.setCustom': ('namecheap.domains.dns.getList',),
+		'namecheap.domains.setContacts': ('namecheap.domains.getContacts',),
+	}
+
 	def __init__(self, client_ip=None, net_init=True, **credentials):
 		super().__init__(**credentials)
 		# NameCheap requires your IP address to be whitelisted.
@@ -97,8 +162,8 @@ class NameCheapAccount(RegistrarAccount):
 		params.update(self._global_params)
 		params.update(data)
 
-		response = requests.get(self._api_base, params=params)
-		data = xmltodict.parse(response.text)['ApiResponse']
+		response = self._transport.request('get', self._api_base, params=params, timeout=self._request_timeout())
+		data = self._parse(REPLY_PARSERS.get(command, parse_reply), response.content)
 		if data['@Status'] != 'OK':
 			errors = data['Errors']['Error']
 			if '#text' in errors:
@@ -106,25 +171,33 @@ class NameCheapAccount(RegistrarAccount):
 			raise RequestFailed(map(lambda i: i['#text'], errors), command, data, self)
 		return data['CommandResponse']
 	
+	def _cache_scope(self, command, data={}):
+		if 'DomainName' in data:
+			return command, (data['DomainName'].lower(),)
+		if 'SLD' in data:
+			return command, ('{}.{}'.format(data['SLD'], data['TLD']).lower(),)
+		return command, ()
+
 	def test_credentials(self):
 		try:
 			self._try_request('namecheap.domains.check', { 'DomainList': 'example.com' })
 			return True
-		except:
+		except RequestFailed:
 			return False
 
+	def _check_availability(self, names):
+		data = self._try_request('namecheap.domains.check', { 'DomainList': ','.join(names) })
+		results = data['DomainCheckResult']
+		# in case there is exactly one result and it's not parsed as list
+		if '@Domain' in results:
+			results = [results]
+		return { result['@Domain'].lower(): result['@Available'] == 'true' for result in results }
+
 	def _get_contacts(self, name):
 		data = self._try_request('namecheap.domains.getContacts', {
 			'DomainName': name
 		})['DomainContactsResult']
-
-		contacts = ContactList()
-		for kind, kind_key in self.CONTACT_TYPE_MAP.items():
-			contacts[kind] = Contact(kind, {
-				attr: data[kind_key][attr_key] for attr, attr_key in self.CONTACT_ATTR_MAP.items()
-			})
-
-		return contacts
+		return self._convert_contacts(data)
 
 	def _get_name_servers(self, name):
 		dot_pos = name.index('.')
@@ -134,17 +207,32 @@ class NameCheapAccount(RegistrarAccount):
 			'TLD': name[dot_pos + 1:]
 			})['DomainDNSGetListResult']['Nameserver']
 
+	def get_domain(self, name):
+		# `getInfo` tells neither lock nor auto renewal, so the domain name
+		# is searched for as listed, then completed as when listing.
+		key = name.lower()
+		page = 1
+		while True:
+			data = self._try_request('namecheap.domains.getList', { 'PageSize': 100, 'SearchTerm': key, 'Page': page })
+			records = data['DomainGetListResult'] and data['DomainGetListResult']['Domain'] or []
+			for record in records:
+				if record[0].lower() == key:
+					return next(self._iter_page([record]))
+			# other domain names may contain it.
+			if page * int(data['Paging']['PageSize']) >= int(data['Paging']['TotalItems']):
+				return None
+			page += 1
+
 	def update_name_servers(self, names, name_servers):
 		'''Update name servers for given domain names.
 
 		Returns domain names finished updating.
 		'''
 
-		dot_pos = name.index('.')
-
 		finished = []
 
 		for name in names:
+			dot_pos = name.index('.')
 			try:
 				self._try_request('namecheap.domains.dns.setCustom', {
 					'SLD': name[:dot_pos],
@@ -171,9 +259,9 @@ class NameCheapAccount(RegistrarAccount):
 
 		for name in names:
 			params = { 'DomainName': name }
-			for kind, kind_key in self.CONTACT_TYPE_MAP.items():
-				for attr, attr_key in self.CONTACT_KEY_MAP.items():
-					params[kind_key + attr_key] = contacts[kind][attr]
+			for kind, kind_key in self.CONTACT_KIND_MAP.items():
+				for attr, attr_key in self.CONTACT_ATTR_MAP.items():
+					params[kind_key + attr_key] = contacts[kind].get(attr, None)
 
 			try:
 				self._try_request('namecheap.domains.setContacts', params)
@@ -183,11 +271,7 @@ class NameCheapAccount(RegistrarAccount):
 
 		return finished
 
-	def iter_domains(self, search=None, **criteria):
-
-		page_id = 1
-		total_pages = 2
-
+	def iter_domains(self, search=None, checkpoints=None, **criteria):
 		params = {
 			# https://www.namecheap.com/support/api/methods/domains/get-list/
 			# Maximum is 100, so we use that to reduce request count.
@@ -197,28 +281,18 @@ class NameCheapAccount(RegistrarAccount):
 		if search:
 			params['SearchTerm'] = search
 
-		while page_id < total_pages:
-			params['Page'] = page_id
-			data = self._try_request('namecheap.domains.getList', params)
-			total_pages = ceil(int(data['Paging']['TotalItems']) / int(data['Paging']['PageSize']))
-			page_id += 1
-			raw_domains = data['DomainGetListResult']['Domain']
-			# in case there is exactly one result and it's not parsed as list
-			if '@Name' in raw_domains:
-				raw_domains = [raw_domains]
-
-			for raw_domain in data['DomainGetListResult']['Domain']:
-				yield Domain(
-					contacts=self._get_contacts(raw_domain['@Name']),
-					account=self,
-
-					name=raw_domain['@Name'],
-					creation=get_date(raw_domain['@Created']),
-					expiry=get_date(raw_domain['@Expires']),
-					registrar_name=self.REGISTRAR_NAME,
-
-					lock=raw_domain['@IsLocked'] == 'true',
-					auto_renew=raw_domain['@AutoRenew'] == 'true',
-					whois_privacy=raw_domain['@WhoisGuard'] == 'ENABLED',
-					name_servers=self._get_name_servers(raw_domain['@Name']))
+		def fetch_page(page):
+			data = self._try_request('namecheap.domains.getList', dict(params, Page=page))
+			total = int(data['Paging']['TotalItems'])
+			records = data['DomainGetListResult'] and data['DomainGetListResult']['Domain'] or []
+			return self._iter_page(records), total, ceil(total / int(data['Paging']['PageSize']))
+
+		yield from self._iter_pages(fetch_page, checkpoints, key=search)
+
+	def _iter_page(self, records):
+		for record in records:
+			name = record[0]
+			yield domain_from_record(record, self,
+				contacts=self._get_contacts(name),
+				name_servers=self._get_name_servers(name))
 
@@ -1,9 +1,33 @@
-import requests
 import xmltodict
-import pendulum
 from ohmydomains.registrars.account import RegistrarAccount
-from ohmydomains.domain import Domain
-from ohmydomains.contact import Contact, ContactList
+from ohmydomains.contact import ContactList
+from ohmydomains.parsing import domain_record, domain_from_record
+from ohmydomains.planning import Cost
+from ohmydomains.util import RequestFailed
+
+
+def parse_reply(content, data=None):
+	'''`reply` of a raw response to a request with `data`.'''
+
+	return xmltodict.parse(content)['namesilo']['reply']
+
+
+def parse_domain_info_reply(content, data):
+	'''`reply` of a raw response of `getDomainInfo`, with the domain name
+	as a record, `record`, see `ohmydomains.parsing`.'''
+
+	reply = parse_reply(content)
+	if reply['code'] == '300':
+		domain = NameSiloAccount._domain_converters['details'](reply, None, name=data['domain'])
+		reply = { key: value for key, value in reply.items() if key in ('code', 'detail', 'contact_ids') }
+		reply['record'] = domain_record(domain)
+	return reply
+
+
+REPLY_PARSERS = {
+	'getDomainInfo': parse_domain_info_reply,
+}
+'''Parse functions of raw responses by operation, other than `parse_reply()`.'''
 
 
 class NameSiloAccount(RegistrarAccount):
@@ -11,13 +35,49 @@ class NameSiloAccount(RegistrarAccount):
 	REGISTRAR = 'namesilo'
 	REGISTRAR_NAME = 'NameSilo'
 	NEEDED_CREDENTIALS = ('api_key',)
+	DETAIL_CONCURRENCY = 16
+	# contacts are cached, so mostly it's only `getDomainInfo`.
+	DOMAIN_LOOKUP_COST = 1
+	AVAILABILITY_BATCH_SIZE = 200
+	REQUEST_COSTS = {
+		# all names at once, then each domain name; contacts are mostly cached.
+		'list': Cost(fixed=1, per_item=1, concurrent=True),
+		'update_name_servers': Cost(per_batch=1, batch_size=200),
+	}
+
+	CACHE_TTLS = {
+		'getDomainInfo': 300,
+		# contacts are shared by many domain names, and only change through
+		# `contactUpdate`, which is not supported yet.
+		'contactList': 3600,
+	}
+	INVALIDATES = {
+		'changeNameServers': ('getDomainInfo',),
+	}
 
 	CONTACT_ATTR_MAP = {
+		'first_name': 'first_name',
+		'last_name': 'last_name',
+		'address': 'address',
 		'address_2': 'address2',
+		'city': 'city',
+		'province': 'state',
+		'country': 'country',
 		'postal_code': 'zip',
+		'phone': 'phone',
+		'email': 'email',
 	}
 
-	_contact_cache = {}
+	DOMAIN_MAPPINGS = {
+		'details': {
+			'creation': ('created', 'date'),
+			'expiry': ('expires', 'date'),
+			'lock': ('locked', 'yes'),
+			'auto_renew': ('auto_renew', 'yes'),
+			'whois_privacy': ('private', 'yes'),
+			'name_servers': ('nameservers.nameserver', 'texts'),
+		},
+	}
 
 	@property
 	def identifier(self):
@@ -33,48 +93,52 @@ class NameSiloAccount(RegistrarAccount):
 		}
 		params.update(data)
 
-		response = xmltodict.parse(requests.get(self._api_base + operation, params).text)['namesilo']['reply']
+		response = self._transport.request('get', self._api_base + operation, params=params,
+			timeout=self._request_timeout())
+		response = self._parse(REPLY_PARSERS.get(operation, parse_reply), response.content, data)
 		# https://www.namesilo.com/api-reference
 		# code=300 means success
 		if response['code'] != '300':
-			raise RequestFailed(response['detail'], option, data, self)
+			raise RequestFailed(response['detail'], operation, data, self)
 		return response
 	
+	def _cache_scope(self, operation, data={}):
+		return operation, tuple(name.lower() for name in data.get('domain', '').split(',') if name)
+
+	def _check_availability(self, names):
+		response = self._try_request('checkRegisterAvailability', { 'domains': ','.join(names) })
+		answers = {}
+		for key, available in (('available', True), ('unavailable', False)):
+			domains = (response.get(key, None) or {}).get('domain', [])
+			# one domain is not parsed as a list, and may have attributes, e.g. its price.
+			if not isinstance(domains, list):
+				domains = [domains]
+			for domain in domains:
+				name = isinstance(domain, dict) and domain['#text'] or domain
+				answers[name.lower()] = available
+		return answers
+
 	def _get_contact_from_id(self, id):
-		if id not in self._contact_cache:
-			response = self._try_request('contactList', {
-				'contact_id': id
-			})['contact']
-			for attr, attr_key in self.CONTACT_ATTR_MAP.items():
-				response[attr] = response[attr_key]
-			self._contact_cache[id] = Contact(**response)
-		return self._contact_cache[id]
+		response = self._try_request('contactList', {
+			'contact_id': id
+		})['contact']
+		# the same contact may be of several kinds.
+		return self._convert_contact(response, None)
 	
 	def _get_domain(self, name):
 		response = self._try_request('getDomainInfo', {
 			'domain': name
 		})
 
-		name_servers = response['nameservers']['nameserver']
-		if '#text' in name_servers:
-			name_servers = [nameservers]
-		name_servers = map(lambda i: i['#text'], name_servers)
-
-		return Domain(
-			contacts=ContactList({
-				kind: self._get_contact_from_id(response['contact_ids'][kind]) for kind in response['contact_ids']
-			}),
-			account=self,
-
-			name=name,
-			creation=pendulum.parse(response['created']),
-			expiry=pendulum.parse(response['expires']),
-			registrar_name=self.REGISTRAR_NAME,
+		return domain_from_record(response['record'], self, contacts=ContactList.interned({
+			kind: self._get_contact_from_id(response['contact_ids'][kind]) for kind in response['contact_ids']
+		}))
 
-			lock=response['locked'] == 'Yes',
-			auto_renew=response['auto_renew'] == 'Yes',
-			whois_privacy=response['private'] == 'Yes',
-			name_servers=name_servers)
+	def get_domain(self, name):
+		try:
+			return self._get_domain(name)
+		except RequestFailed:
+			return None
 
 	def update_contacts(self, names, contacts):
 		pass
@@ -82,14 +146,14 @@ class NameSiloAccount(RegistrarAccount):
 	def update_name_servers(self, names, name_servers):
 		if len(names) > 200:
 			raise Exception('Must provide no more than 200 domain names.')
-		if 2 < len(name_servers) < 13:
+		if not 2 <= len(name_servers) <= 13:
 			raise Exception('Must provide at least 2 and at most 13 name servers.')
 
 		params = { 'domain': ','.join(names) }
 		for i in range(len(name_servers)):
 			params['ns' + str(i + 1)] = name_servers[i]
 
-		self._try_request('changeNameServers', params=params)
+		self._try_request('changeNameServers', params)
 		return names
 
 	def iter_domains(self, **criteria):
@@ -100,8 +164,7 @@ class NameSiloAccount(RegistrarAccount):
 			if isinstance(names, str):
 				names = [names]
 
-			for name in names:
-				yield self._get_domain(name)
+			yield from self._map_details(self._get_domain, names)
 		else:
 			yield
 
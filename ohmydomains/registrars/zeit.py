@@ -1,9 +1,7 @@
 import json
-import requests
-import requests.auth
-import pendulum
 from ohmydomains.registrars.account import RegistrarAccount
-from ohmydomains.domain import Domain
+from ohmydomains.mapping import constant
+from ohmydomains.planning import Cost
 from ohmydomains.contact import ContactList
 from ohmydomains.util import RequestFailed
 
@@ -16,15 +14,30 @@ class ZeitAccount(RegistrarAccount):
 	REGISTRAR_NAME = 'ZEIT'
 	API_BASE = 'https://api.zeit.co'
 	NEEDED_CREDENTIALS = ('token',)
+	DOMAIN_LOOKUP_COST = 1
+	REQUEST_COSTS = {
+		'list': Cost(fixed=1),
+	}
+
+	DOMAIN_MAPPINGS = {
+		'default': {
+			'name': 'name',
+			'creation': ('createdAt', 'timestamp_ms'),
+			'expiry': ('expiresAt', 'timestamp_ms'),
+			'name_servers': 'nameservers',
+			# ZEIT will not even ask for your contact info on registration.
+			'whois_privacy': constant(True),
+		},
+	}
 
 	@property
 	def identifier(self):
 		return self._credentials['email']
 
 	def _request(self, endpoint, method='get', params={}, data={}):
-		data = getattr(requests, method)(self.API_BASE + endpoint, headers={
+		data = self._transport.request(method, self.API_BASE + endpoint, headers={
 			'Authorization': 'Bearer ' + self._credentials['token']
-		}, params=params, json=data).json()
+		}, params=params, json=data, timeout=self._request_timeout()).json()
 
 		if 'error' in data:
 			raise RequestFailed(data['error'], method, endpoint, data, self)
@@ -35,9 +48,18 @@ class ZeitAccount(RegistrarAccount):
 		try:
 			self._try_request('/www/user')
 			return True
-		except:
+		except RequestFailed:
 			return False
 
+	def get_domain(self, name):
+		try:
+			raw_domain = self._try_request('/v4/domains/' + name)['domain']
+		except RequestFailed:
+			return None
+		if raw_domain['expiresAt'] == 'null':
+			return None
+		return self._domain_from_raw(raw_domain, 'default', contacts=ContactList.interned())
+
 	def iter_domains(self, **criteria):
 		for raw_domain in self._try_request('/v4/domains')['domains']:
 			# https://zeit.co/docs/api/#endpoints/domains
@@ -45,16 +67,4 @@ class ZeitAccount(RegistrarAccount):
 			if raw_domain['expiresAt'] == 'null':
 				continue
 
-			yield Domain(
-				contacts=ContactList(),
-				account=self,
-
-				name=raw_domain['name'],
-				registrar_name=self.REGISTRAR_NAME,
-				creation=pendulum.from_timestamp(raw_domain['createdAt'] / 1000),
-				expiry=pendulum.from_timestamp(raw_domain['expiresAt'] / 1000),
-				name_servers=raw_domain['nameservers'],
-				# ZEIT will not even ask for your contact info on registration.
-				whois_privacy=True
-			)
-
+			yield self._domain_from_raw(raw_domain, 'default', contacts=ContactList.interned())
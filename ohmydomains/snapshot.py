@@ -0,0 +1,276 @@
+import os
+import json
+import mmap
+import struct
+import pendulum
+from ohmydomains.domain import Domain
+from ohmydomains.contact import ContactList
+
+
+MAGIC = b'OMDS'
+VERSION = 1
+
+HEADER = struct.Struct('<4sHxxIIIQQ')
+'''Magic, version, row count, name server entry count, string count,
+offset of name server entries, offset of the string table.'''
+
+ROW = struct.Struct('<qqIIIIIIHBx')
+'''Creation and expiry as epoch seconds, string indexes of name, account,
+registrar name, status and contacts, first name server entry and count,
+and flags: two bits each for lock, auto renew and WHOIS privacy.'''
+
+ROWS_PER_READ = 4096
+'''Rows copied out of the file at a time by `Snapshot.iter_rows()`.'''
+
+NS_ENTRY = struct.Struct('<I')
+STRING_OFFSET = struct.Struct('<Q')
+
+NO_DATE = -(1 << 63)
+NO_STRING = 0xffffffff
+
+FLAG_FIELDS = ('lock', 'auto_renew', 'whois_privacy')
+TRINARY_BITS = { None: 0, False: 1, True: 2 }
+BITS_TRINARY = { 0: None, 1: False, 2: True, 3: None }
+
+
+def _encode_flags(domain):
+	flags = 0
+	for i, field in enumerate(FLAG_FIELDS):
+		flags |= TRINARY_BITS[domain[field]] << (i * 2)
+	return flags
+
+
+def _decode_flag(flags, field):
+	return BITS_TRINARY[(flags >> (FLAG_FIELDS.index(field) * 2)) & 3]
+
+
+def _epoch(date):
+	return NO_DATE if date is None else int(date.timestamp())
+
+
+def write_snapshot(path, domains):
+	'''Write domains into a snapshot file at `path`, atomically.
+
+	Dates are stored as whole seconds in UTC, and strings, including
+	contacts serialized as JSON, are interned.
+	'''
+
+	strings = {}
+	def intern(value):
+		if value is None:
+			return NO_STRING
+		if value not in strings:
+			strings[value] = len(strings)
+		return strings[value]
+
+	# domains often share the same contact list object.
+	contacts_json = {}
+	def serialize_contacts(contacts):
+		if contacts is None:
+			return None
+		if id(contacts) not in contacts_json:
+			contacts_json[id(contacts)] = (contacts, json.dumps(contacts.export(), sort_keys=True))
+		return contacts_json[id(contacts)][1]
+
+	rows = bytearray()
+	ns_entries = bytearray()
+	count = ns_count = 0
+
+	for domain in domains:
+		name_servers = list(domain.name_servers or [])
+		rows += ROW.pack(
+			_epoch(domain.creation),
+			_epoch(domain.expiry),
+			intern(domain.name),
+			intern(domain.account and domain.account.unique_identifier),
+			intern(domain.registrar_name),
+			intern(domain.status),
+			intern(serialize_contacts(domain.contacts)),
+			ns_count,
+			len(name_servers),
+			_encode_flags(domain))
+		for server in name_servers:
+			ns_entries += NS_ENTRY.pack(intern(server))
+		ns_count += len(name_servers)
+		count += 1
+
+	blob = bytearray()
+	offsets = bytearray()
+	for value in strings:
+		offsets += STRING_OFFSET.pack(len(blob))
+		blob += value.encode('utf-8')
+	offsets += STRING_OFFSET.pack(len(blob))
+
+	ns_offset = HEADER.size + len(rows)
+	strings_offset = ns_offset + len(ns_entries)
+
+	temp_path = '{}.{}.tmp'.format(path, os.getpid())
+	with open(temp_path, 'wb') as f:
+		f.write(HEADER.pack(MAGIC, VERSION, count, ns_count, len(strings), ns_offset, strings_offset))
+		f.write(rows)
+		f.write(ns_entries)
+		f.write(offsets)
+		f.write(blob)
+	os.replace(temp_path, path)
+
+
+class SnapshotRow:
+	'''A row of a snapshot, decoding its fields on access.'''
+
+	__slots__ = ('_snapshot', '_values')
+
+	def __init__(self, snapshot, values):
+		self._snapshot, self._values = snapshot, values
+
+	@property
+	def creation(self):
+		return self._snapshot._date(self._values[0])
+
+	@property
+	def expiry(self):
+		return self._snapshot._date(self._values[1])
+
+	@property
+	def name(self):
+		return self._snapshot.string(self._values[2])
+
+	@property
+	def account(self):
+		'''Unique identifier of the account.'''
+		return self._snapshot.string(self._values[3])
+
+	@property
+	def registrar_name(self):
+		return self._snapshot.string(self._values[4])
+
+	@property
+	def status(self):
+		return self._snapshot.string(self._values[5])
+
+	@property
+	def contacts(self):
+		return self._snapshot._contacts(self._values[6])
+
+	@property
+	def name_servers(self):
+		start, count = self._values[7], self._values[8]
+		return [self._snapshot._name_server(i) for i in range(start, start + count)]
+
+	@property
+	def lock(self):
+		return _decode_flag(self._values[9], 'lock')
+
+	@property
+	def auto_renew(self):
+		return _decode_flag(self._values[9], 'auto_renew')
+
+	@property
+	def whois_privacy(self):
+		return _decode_flag(self._values[9], 'whois_privacy')
+
+	@property
+	def tld(self):
+		name = self.name
+		return name[name.index('.'):]
+
+	def __getitem__(self, key):
+		return getattr(self, key)
+
+	def to_domain(self, account=None):
+		return Domain(
+			contacts=self.contacts,
+			account=account,
+
+			name=self.name,
+			registrar_name=self.registrar_name,
+			creation=self.creation,
+			expiry=self.expiry,
+			name_servers=self.name_servers,
+			status=self.status,
+			lock=self.lock,
+			auto_renew=self.auto_renew,
+			whois_privacy=self.whois_privacy)
+
+
+class Snapshot:
+	'''Memory mapped, read only view of a snapshot file.
+
+	Rows are only decoded as far as they are accessed;
+	`iter_rows()` unpacks fixed width columns only.
+	'''
+
+	def __init__(self, path):
+		with open(path, 'rb') as f:
+			self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+		(magic, version, self._count, self._ns_count, self._string_count,
+			self._ns_offset, self._strings_offset) = HEADER.unpack_from(self._mmap)
+		if magic != MAGIC or version != VERSION:
+			self.close()
+			raise ValueError('Not a supported snapshot file: {}'.format(path))
+		self._blob_offset = self._strings_offset + STRING_OFFSET.size * (self._string_count + 1)
+		self._strings = {}
+		self._parsed_contacts = {}
+
+	def close(self):
+		self._mmap.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def __len__(self):
+		return self._count
+
+	def string(self, index):
+		if index == NO_STRING:
+			return None
+		if index not in self._strings:
+			start, end = struct.unpack_from('<QQ', self._mmap, self._strings_offset + STRING_OFFSET.size * index)
+			self._strings[index] = self._mmap[self._blob_offset + start:self._blob_offset + end].decode('utf-8')
+		return self._strings[index]
+
+	def _contacts(self, index):
+		# contact lists are interned, thus can be shared by rows.
+		if index not in self._parsed_contacts:
+			contacts = self.string(index)
+			self._parsed_contacts[index] = ContactList.from_export(json.loads(contacts) if contacts else {})
+		return self._parsed_contacts[index]
+
+	def _name_server(self, index):
+		return self.string(NS_ENTRY.unpack_from(self._mmap, self._ns_offset + NS_ENTRY.size * index)[0])
+
+	def _date(self, epoch):
+		return None if epoch == NO_DATE else pendulum.from_timestamp(epoch)
+
+	def __getitem__(self, index):
+		if not 0 <= index < self._count:
+			raise IndexError(index)
+		return SnapshotRow(self, ROW.unpack_from(self._mmap, HEADER.size + ROW.size * index))
+
+	def iter_rows(self, expiry_before=None, expiry_after=None, creation_before=None, creation_after=None):
+		'''Iterate through rows, optionally only those with dates in range,
+		which are compared without being decoded. Rows without a date
+		are skipped if it is bounded.
+		'''
+
+		bounds = [(i, _epoch(low), _epoch(high)) for i, low, high in (
+			(0, creation_after, creation_before),
+			(1, expiry_after, expiry_before),
+		) if low is not None or high is not None]
+
+		# rows are copied out a chunk at a time, rather than read through
+		# a view of the map, which would keep it from being closed.
+		step = ROW.size * ROWS_PER_READ
+		for start in range(HEADER.size, self._ns_offset, step):
+			for values in ROW.iter_unpack(self._mmap[start:min(start + step, self._ns_offset)]):
+				for i, low, high in bounds:
+					if values[i] == NO_DATE or values[i] < low or (high != NO_DATE and values[i] > high):
+						break
+				else:
+					yield SnapshotRow(self, values)
+
+	def __iter__(self):
+		return self.iter_rows()
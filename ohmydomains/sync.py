@@ -0,0 +1,234 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+from multiprocessing import Process
+from ohmydomains.registrars import account_from_export
+from ohmydomains.checkpoint import CheckpointStore
+
+
+class SyncQueue:
+	'''Durable queue of account syncs, backed by an SQLite database.
+
+	Each work item is one exported account. Workers claim an item with
+	a lease, which they renew while syncing; an item whose lease
+	expires, e.g. because its worker crashed, can be claimed again,
+	until it has been tried `max_tries` times.
+
+	Workers on other hosts may share the queue if it lives on a file
+	system with working file locks.
+
+	* `path`: path to the database file, created if not existing.
+	* `lease`: lease length in seconds.
+	* `max_tries`: maximum number of claims of a work item.
+	'''
+
+	SCHEMA = '''
+		CREATE TABLE IF NOT EXISTS work (
+			id INTEGER PRIMARY KEY,
+			sync_id TEXT NOT NULL,
+			account TEXT NOT NULL,
+			record TEXT NOT NULL,
+			state TEXT NOT NULL DEFAULT 'pending',
+			worker TEXT,
+			lease_until REAL,
+			tries INTEGER NOT NULL DEFAULT 0,
+			result TEXT,
+			error TEXT
+		);
+		CREATE INDEX IF NOT EXISTS work_state ON work (state, sync_id);
+	'''
+
+	def __init__(self, path, lease=300, max_tries=3):
+		self.path, self.lease, self.max_tries = str(path), lease, max_tries
+		self._db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+		self._db.executescript(self.SCHEMA)
+
+	def close(self):
+		self._db.close()
+
+	def enqueue(self, accounts):
+		'''Add one work item per account, returning the ID of this sync.'''
+
+		sync_id = uuid.uuid4().hex
+		with self._db:
+			self._db.executemany('INSERT INTO work (sync_id, account, record) VALUES (?, ?, ?)', (
+				(sync_id, account.unique_identifier, json.dumps(account.export())) for account in accounts
+			))
+		return sync_id
+
+	def latest(self):
+		'''ID of the sync enqueued last, or `None` if there is none.'''
+
+		row = self._db.execute('SELECT sync_id FROM work ORDER BY id DESC LIMIT 1').fetchone()
+		return row and row[0]
+
+	def delete(self, sync_id):
+		'''Delete work items of a sync, e.g. once its results are loaded.'''
+
+		with self._db:
+			self._db.execute('DELETE FROM work WHERE sync_id = ?', (sync_id,))
+
+	def claim(self, worker, sync_id=None):
+		'''Claim a pending or abandoned work item for `worker`,
+		of sync `sync_id` if provided.
+
+		Returns a tuple of item ID and exported account, or `None`
+		if there is nothing to claim for now.
+		'''
+
+		now = time.time()
+		self._db.execute('BEGIN IMMEDIATE')
+		try:
+			row = self._db.execute('''
+				SELECT id, record FROM work
+				WHERE (state = 'pending' OR (state = 'claimed' AND lease_until < ?)) AND tries < ?
+					AND (? IS NULL OR sync_id = ?)
+				ORDER BY id LIMIT 1
+			''', (now, self.max_tries, sync_id, sync_id)).fetchone()
+			if row:
+				self._db.execute('''
+					UPDATE work SET state = 'claimed', worker = ?, lease_until = ?, tries = tries + 1
+					WHERE id = ?
+				''', (worker, now + self.lease, row[0]))
+			self._db.execute('COMMIT')
+		except:
+			self._db.execute('ROLLBACK')
+			raise
+
+		return row and (row[0], json.loads(row[1]))
+
+	def renew(self, item_id, worker):
+		'''Extend the lease of a claimed item.
+
+		Returns `False` if `worker` no longer holds it.
+		'''
+
+		with self._db:
+			return self._db.execute('''
+				UPDATE work SET lease_until = ?
+				WHERE id = ? AND worker = ? AND state = 'claimed'
+			''', (time.time() + self.lease, item_id, worker)).rowcount == 1
+
+	def complete(self, item_id, worker, records):
+		'''Store exported domains of a claimed item as its result.
+
+		Returns `False` if `worker` no longer holds it,
+		in which case the result is discarded.
+		'''
+
+		with self._db:
+			return self._db.execute('''
+				UPDATE work SET state = 'done', result = ?, error = NULL
+				WHERE id = ? AND worker = ? AND state = 'claimed'
+			''', (json.dumps(records), item_id, worker)).rowcount == 1
+
+	def fail(self, item_id, worker, error):
+		'''Release a claimed item after a failure, to be retried
+		unless it has been tried `max_tries` times.
+		'''
+
+		with self._db:
+			self._db.execute('''
+				UPDATE work SET state = CASE WHEN tries < ? THEN 'pending' ELSE 'failed' END,
+					worker = NULL, lease_until = NULL, error = ?
+				WHERE id = ? AND worker = ? AND state = 'claimed'
+			''', (self.max_tries, str(error), item_id, worker))
+
+	def status(self, sync_id=None):
+		'''Get states of work items, as a `dict` of account unique identifier to
+		one of `pending`, `claimed`, `done` and `failed`.
+
+		Items whose lease expired after their last try count as `failed`.
+		'''
+
+		query = 'SELECT account, state, lease_until, tries FROM work'
+		params = ()
+		if sync_id:
+			query += ' WHERE sync_id = ?'
+			params = (sync_id,)
+
+		now = time.time()
+		status = {}
+		for account, state, lease_until, tries in self._db.execute(query, params):
+			if state == 'claimed' and lease_until < now and tries >= self.max_tries:
+				state = 'failed'
+			status[account] = state
+		return status
+
+	def is_finished(self, sync_id=None):
+		return all(state in ('done', 'failed') for state in self.status(sync_id).values())
+
+	def iter_results(self, sync_id=None):
+		'''Iterate through exported domains of finished work items.'''
+
+		query = "SELECT result FROM work WHERE state = 'done'"
+		params = ()
+		if sync_id:
+			query += ' AND sync_id = ?'
+			params = (sync_id,)
+
+		for (result,) in self._db.execute(query, params):
+			yield from json.loads(result)
+
+
+def work(path, worker=None, lease=300, max_tries=3, poll_interval=5, wait=False, checkpoints=None, sync_id=None):
+	'''Run a sync worker on the queue at `path`.
+
+	Claims and syncs accounts of sync `sync_id`, or else of the one
+	enqueued last, until there is nothing left to claim, or, if `wait`
+	is true, until every item of it is done or failed, polling for
+	abandoned ones.
+
+	* `checkpoints`: directory of checkpoints, see `ohmydomains.checkpoint`,
+	so that an item tried again resumes from where the last try stopped.
+	'''
+
+	worker = worker or '{}:{}'.format(socket.gethostname(), os.getpid())
+	queue = SyncQueue(path, lease=lease, max_tries=max_tries)
+	checkpoints = checkpoints and CheckpointStore(checkpoints)
+
+	try:
+		sync_id = sync_id or queue.latest()
+		while sync_id:
+			claimed = queue.claim(worker, sync_id)
+			if not claimed:
+				if not wait or queue.is_finished(sync_id):
+					break
+				time.sleep(poll_interval)
+				continue
+
+			item_id, record = claimed
+			try:
+				account = account_from_export(record)
+				records = []
+				renewed_at = time.monotonic()
+				for domain in account.iter_domains(checkpoints=checkpoints):
+					if domain is None:
+						continue
+					records.append(domain.export())
+					if time.monotonic() - renewed_at > lease / 3:
+						if not queue.renew(item_id, worker):
+							# lease lost to another worker.
+							break
+						renewed_at = time.monotonic()
+				else:
+					queue.complete(item_id, worker, records)
+			except Exception as e:
+				queue.fail(item_id, worker, e)
+	finally:
+		queue.close()
+
+
+def run_workers(path, processes=4, **kwargs):
+	'''Run `processes` local worker processes on the queue at `path`,
+	blocking until they finish. Keyword arguments are passed to `work()`.
+	'''
+
+	workers = [Process(target=work, args=(path,), kwargs=dict(kwargs, wait=True)) for i in range(processes)]
+	for process in workers:
+		process.start()
+	for process in workers:
+		process.join()
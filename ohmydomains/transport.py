@@ -0,0 +1,94 @@
+'''Transports send HTTP requests for registrar accounts.
+
+Each returns response objects with at least `status_code`, `headers`,
+`text`, `content` and `json()`, as `requests` and `httpx` both do,
+and raises `ohmydomains.util.ServerBusy` on responses with one of
+`BUSY_STATUSES`, which tell the endpoint is overloaded rather than
+anything of the request, for registrar accounts to slow down and retry.
+'''
+
+from ohmydomains.util import ServerBusy
+
+
+BUSY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def check_status(response, method, url):
+	if response.status_code in BUSY_STATUSES:
+		raise ServerBusy(response.status_code, response.headers.get('Retry-After', None), method, url)
+	return response
+
+
+class Transport:
+	def request(self, method, url, params=None, json=None, headers=None, auth=None, timeout=None):
+		raise NotImplementedError
+
+	def close(self): pass
+
+
+class RequestsTransport(Transport):
+	'''HTTP/1.1 through a `requests` session, reusing connections.
+
+	* `pool_size`: maximum number of connections kept per host.
+	'''
+
+	def __init__(self, pool_size=10):
+		import requests
+		import requests.adapters
+
+		self._session = requests.Session()
+		adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+		self._session.mount('https://', adapter)
+		self._session.mount('http://', adapter)
+
+	def request(self, method, url, params=None, json=None, headers=None, auth=None, timeout=None):
+		return check_status(self._session.request(method, url,
+			params=params, json=json, headers=headers, auth=auth, timeout=timeout), method, url)
+
+	def close(self):
+		self._session.close()
+
+
+class HTTP2Transport(Transport):
+	'''HTTP/2 through `httpx`, multiplexing concurrent requests, e.g. from
+	several threads, over a single connection per host, with gzip and
+	brotli responses.
+
+	Requires the `http2` extra: `pip install ohmydomains[http2]`.
+
+	* `prior_knowledge`: speak HTTP/2 without negotiation, for cleartext
+	servers known to support it.
+	'''
+
+	def __init__(self, prior_knowledge=False):
+		try:
+			import httpx
+		except ImportError:
+			raise ImportError('HTTP/2 transport requires httpx[http2]; try `pip install ohmydomains[http2]`.')
+
+		self._httpx = httpx
+		self._client = httpx.Client(http1=not prior_knowledge, http2=True)
+
+	def request(self, method, url, params=None, json=None, headers=None, auth=None, timeout=None):
+		if isinstance(timeout, tuple):
+			timeout = self._httpx.Timeout(timeout[1], connect=timeout[0])
+		return check_status(self._client.request(method.upper(), url,
+			params=params, json=json, headers=headers, auth=auth, timeout=timeout), method, url)
+
+	def close(self):
+		self._client.close()
+
+
+TRANSPORTS = {
+	'requests': RequestsTransport,
+	'http2': HTTP2Transport,
+}
+'''Available transports, by name.'''
+
+
+def get_transport(transport):
+	'''Get a transport instance, from itself or its name in `TRANSPORTS`.'''
+
+	if isinstance(transport, Transport):
+		return transport
+	return TRANSPORTS[transport]()
@@ -5,11 +5,22 @@ from appdirs import user_config_dir
 
 CONFIG_BASE_PATH = Path(user_config_dir('ohmydomains-cli'))
 CONFIG_PATH = CONFIG_BASE_PATH.joinpath('config.toml')
+CONFIG_DB_PATH = CONFIG_BASE_PATH.joinpath('config.db')
 CACHE_PATH = CONFIG_BASE_PATH.joinpath('cache.toml')
+INVENTORY_PATH = CONFIG_BASE_PATH.joinpath('inventory.omds')
+DOMAIN_ACCOUNTS_PATH = CONFIG_BASE_PATH.joinpath('domain_accounts.json')
+FINGERPRINTS_PATH = CONFIG_BASE_PATH.joinpath('fingerprints.json')
+CHANGES_PATH = CONFIG_BASE_PATH.joinpath('changes.jsonl')
+SYNC_QUEUE_PATH = CONFIG_BASE_PATH.joinpath('sync.db')
+CHECKPOINTS_PATH = CONFIG_BASE_PATH.joinpath('checkpoints')
+AVAILABILITY_PATH = CONFIG_BASE_PATH.joinpath('availability.json')
+JOURNAL_PATH = CONFIG_BASE_PATH.joinpath('journal')
 
 
 class RequestFailed(Exception): pass
 class MaxTriesReached(Exception): pass
+class DeadlineExceeded(Exception): pass
+class ServerBusy(Exception): pass
 
 
 class ObjectDict(dict):
@@ -22,7 +33,10 @@ class ObjectDict(dict):
 		self.__dict__.update(initial)
 
 	def __getattr__(self, key):
-		return self[key]
+		try:
+			return self[key]
+		except KeyError:
+			raise AttributeError(key)
 
 	def __setattr__(self, key, value):
 		self.__dict__[key] = self[key] = value
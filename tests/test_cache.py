@@ -0,0 +1,158 @@
+'''Tests of `ResponseCache`: identical requests in flight coalesced into one,
+errors shared but not kept, expiry, eviction and scoped invalidation,
+also through requests of registrar accounts.'''
+
+import time
+import threading
+import pytest
+from ohmydomains.cache import ResponseCache
+from ohmydomains.registrars.account import RegistrarAccount
+
+
+def run_threads(count, target):
+	results = [None] * count
+	def run(i):
+		try:
+			results[i] = target()
+		except Exception as e:
+			results[i] = e
+	threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+	for thread in threads:
+		thread.start()
+	return threads, results
+
+
+def test_identical_requests_in_flight_are_coalesced():
+	cache = ResponseCache()
+	release = threading.Event()
+	calls = []
+	def fetch():
+		calls.append(1)
+		release.wait(5)
+		return { 'answer': len(calls) }
+
+	threads, results = run_threads(8, lambda: cache.get('key', 60, fetch, ('a', '/x', ())))
+	while cache.stats()['coalesced'] < 7:
+		time.sleep(0.01)
+	release.set()
+	for thread in threads:
+		thread.join()
+	assert calls == [1]
+	assert all(result is results[0] for result in results) and results[0] == { 'answer': 1 }
+	assert cache.stats() == { 'entries': 1, 'in_flight': 0, 'hits': 0, 'misses': 1, 'coalesced': 7 }
+	assert cache.get('key', 60, fetch, ('a', '/x', ())) is results[0] and cache.hits == 1
+
+
+def test_errors_are_shared_but_not_kept():
+	cache = ResponseCache()
+	release = threading.Event()
+	def fail():
+		release.wait(5)
+		raise ValueError('boom')
+
+	threads, results = run_threads(4, lambda: cache.get('key', 60, fail, ('a', '/x', ())))
+	while cache.stats()['coalesced'] < 3:
+		time.sleep(0.01)
+	release.set()
+	for thread in threads:
+		thread.join()
+	assert all(isinstance(result, ValueError) for result in results)
+	assert len(cache) == 0
+	assert cache.get('key', 60, lambda: 'fine', ('a', '/x', ())) == 'fine'
+
+
+def test_expiry_and_eviction():
+	cache = ResponseCache(max_entries=2)
+	cache.get('short', 0.05, lambda: 1, ('a', '/x', ()))
+	time.sleep(0.06)
+	assert cache.get('short', 60, lambda: 2, ('a', '/x', ())) == 2
+
+	cache.get('other', 60, lambda: 3, ('a', '/x', ()))
+	# used lately, so kept over `other`.
+	cache.get('short', 60, lambda: None, ('a', '/x', ()))
+	cache.get('third', 60, lambda: 4, ('a', '/x', ()))
+	assert len(cache) == 2
+	assert cache.get('other', 60, lambda: 5, ('a', '/x', ())) == 5
+	assert cache.get('third', 60, lambda: None, ('a', '/x', ())) == 4
+
+
+def test_scoped_invalidation():
+	cache = ResponseCache()
+	scopes = {
+		'a-domain': ('a', '/domain/{}', ('one.com',)),
+		'a-other': ('a', '/domain/{}', ('two.com',)),
+		'a-contacts': ('a', '/contacts/{}', ('one.com',)),
+		'a-list': ('a', '/domains', ()),
+		'b-domain': ('b', '/domain/{}', ('one.com',)),
+	}
+	def fill():
+		for key, scope in scopes.items():
+			cache.get(key, 60, lambda: key, scope)
+	def kept():
+		return { key for key in scopes if cache.get(key, 60, lambda: None, scopes[key]) == key }
+
+	fill()
+	cache.invalidate('a', ['/domain/{}'], ['ONE.com'])
+	assert kept() == { 'a-other', 'a-contacts', 'a-list', 'b-domain' }
+	fill()
+	# those not about a particular domain name may be about any.
+	cache.invalidate('a', names=['one.com'])
+	assert kept() == { 'a-other', 'b-domain' }
+	fill()
+	cache.invalidate('a')
+	assert kept() == { 'b-domain' }
+
+
+def test_invalidated_in_flight_is_not_kept():
+	cache = ResponseCache()
+	started, release = threading.Event(), threading.Event()
+	def fetch():
+		started.set()
+		release.wait(5)
+		return 'stale'
+
+	threads, results = run_threads(1, lambda: cache.get('key', 60, fetch, ('a', '/domain/{}', ('one.com',))))
+	started.wait(5)
+	cache.invalidate('a', names=['one.com'])
+	release.set()
+	threads[0].join()
+	assert results == ['stale'] and len(cache) == 0
+
+
+class StubAccount(RegistrarAccount):
+	REGISTRAR_NAME = 'Stub'
+	CACHE_TTLS = { '/domain/{}': 60 }
+	INVALIDATES = { '/domain/{}/nameservers': ('/domain/{}',) }
+
+	def __init__(self):
+		super().__init__()
+		self.response_cache = ResponseCache()
+		self.requests = []
+
+	@property
+	def identifier(self):
+		return 'stub'
+
+	def _cache_scope(self, endpoint, name):
+		return endpoint, (name,)
+
+	def _request(self, endpoint, name):
+		self.requests.append((endpoint, name))
+		if endpoint.endswith('nameservers'):
+			raise ValueError('failed after changing something')
+		return { 'name': name, 'version': len(self.requests) }
+
+
+def test_account_requests():
+	account = StubAccount()
+	first = account._try_request('/domain/{}', 'one.com')
+	assert account._try_request('/domain/{}', 'one.com') is first
+	account._try_request('/domain/{}', 'two.com')
+
+	# even failed requests invalidate what they may have changed.
+	with pytest.raises(Exception):
+		account._try_request('/domain/{}/nameservers', 'one.com', max_tries=1)
+	assert account._try_request('/domain/{}', 'one.com') is not first
+	assert account._try_request('/domain/{}', 'two.com')['version'] == 2
+	account.invalidate_cache()
+	assert account._try_request('/domain/{}', 'two.com')['version'] == 5
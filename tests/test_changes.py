@@ -0,0 +1,84 @@
+'''Tests of change feeds of `ChangeTracker` between syncs: domain names
+added, modified and removed, and state carried over through a file.'''
+
+import pendulum
+from ohmydomains.changes import ChangeTracker, fingerprint, tracked_values
+from ohmydomains.contact import Contact, ContactList
+from ohmydomains.domain import Domain
+from ohmydomains.registrars.account import RegistrarAccount
+
+
+class StubAccount(RegistrarAccount):
+	REGISTRAR_NAME = 'Stub'
+
+	def __init__(self, user):
+		super().__init__(user=user)
+
+	@property
+	def identifier(self):
+		return self._credentials['user']
+
+
+BASE = pendulum.datetime(2020, 1, 1)
+
+
+def make_domain(name, account, **fields):
+	values = dict(registrar_name='Stub', creation=BASE, expiry=BASE.add(years=1),
+		name_servers=['ns1.example.net', 'ns2.example.net'], lock=True, auto_renew=False)
+	values.update(fields)
+	contacts = values.pop('contacts', ContactList.interned({ 'registrant': Contact.interned(kind='registrant', first_name='A') }))
+	return Domain(contacts=contacts, account=account, name=name, **values)
+
+
+def sync(tracker, domains, accounts=None):
+	list(tracker.track(domains))
+	return tracker.commit(accounts)
+
+
+def test_fingerprint():
+	account = StubAccount('a')
+	domain = make_domain('a.com', account)
+	assert fingerprint(domain) == fingerprint(make_domain('A.com', account))
+	assert fingerprint(domain) == fingerprint(domain, tracked_values(domain))
+	# the case and order of name servers, and a trailing dot, tell nothing.
+	assert fingerprint(domain) == fingerprint(make_domain('a.com', account, name_servers=['NS2.example.net.', 'ns1.example.net']))
+	for changed in ({ 'expiry': BASE.add(years=2) }, { 'lock': None }, { 'auto_renew': True },
+		{ 'contacts': ContactList.interned({ 'registrant': Contact.interned(kind='registrant', first_name='B') }) }):
+		assert fingerprint(domain) != fingerprint(make_domain('a.com', account, **changed)), changed
+	assert fingerprint(domain) != fingerprint(make_domain('a.com', StubAccount('b')))
+	# not tracked.
+	assert fingerprint(domain) == fingerprint(make_domain('a.com', account, creation=BASE.add(days=1)))
+
+
+def test_feeds(tmp_path):
+	a, b = StubAccount('a'), StubAccount('b')
+	tracker = ChangeTracker()
+	first = sync(tracker, [make_domain('one.com', a), make_domain('two.com', a), make_domain('three.com', b)])
+	assert first['since'] is None
+	assert sorted(item['name'] for item in first['added']) == ['one.com', 'three.com', 'two.com']
+	assert first['removed'] == first['modified'] == []
+
+	path = tmp_path / 'changes.json'
+	tracker.save(path)
+	tracker = ChangeTracker.load(path)
+	assert tracker.synced_at == first['at']
+
+	renewed = BASE.add(years=2)
+	second = sync(tracker, [
+		make_domain('ONE.com', a, expiry=renewed, name_servers=['ns1.example.net', 'ns2.example.net.']),
+		make_domain('four.com', a),
+	], accounts=[a])
+	assert second['since'] == first['at']
+	assert [item['name'] for item in second['added']] == ['four.com']
+	assert second['modified'] == [{ 'name': 'one.com', 'changes': {
+		'expiry': [BASE.add(years=1).to_iso8601_string(), renewed.to_iso8601_string()],
+	} }]
+	# those of accounts not listed in full are not removed.
+	assert [item['name'] for item in second['removed']] == ['two.com']
+	assert second['removed'][0]['values']['account'] == 'Stub:a'
+	assert sorted(tracker.domains) == ['four.com', 'one.com', 'three.com']
+
+	assert sync(tracker, [make_domain('one.com', b, expiry=renewed)])['modified'] == [{ 'name': 'one.com', 'changes': {
+		'account': ['Stub:a', 'Stub:b'],
+	} }]
+	assert ChangeTracker.load(tmp_path / 'missing.json').domains == {}
@@ -0,0 +1,112 @@
+'''Tests of `AdaptiveLimiter`: slow start, additive increase and
+multiplicative decrease, cuts at most once per round trip, bounds,
+and blocking requests over the limit.'''
+
+import time
+import threading
+from ohmydomains.concurrency import AdaptiveLimiter
+
+
+def answer(limiter, latency=0.01, outcome='ok'):
+	assert limiter.acquire(time.monotonic() + 1)
+	limiter.release(latency, outcome)
+
+
+def test_slow_start_then_additive_increase():
+	limiter = AdaptiveLimiter(initial=1, maximum=64)
+	for _ in range(7):
+		answer(limiter)
+	# one more per answer while starting.
+	assert limiter.stats()['limit'] == 8 and limiter.slow_start
+
+	answer(limiter, outcome='throttled')
+	assert limiter.stats()['limit'] == 4 and not limiter.slow_start
+	# then about one more per round trip, i.e. as many answers as the limit.
+	for _ in range(4):
+		answer(limiter)
+	assert limiter.stats()['limit'] == 4
+	for _ in range(2):
+		answer(limiter)
+	assert limiter.stats()['limit'] == 5
+	assert limiter.stats()['ok'] == 13 and limiter.stats()['throttled'] == 1
+
+
+def test_cut_once_per_round_trip():
+	limiter = AdaptiveLimiter(initial=16, maximum=16)
+	answer(limiter, latency=0.2)
+	answer(limiter, outcome='error')
+	# requests in flight then were sent under the limit just cut.
+	answer(limiter, outcome='throttled')
+	answer(limiter, outcome='error')
+	assert limiter.stats()['limit'] == 8 and limiter.cuts == 1
+	time.sleep(0.25)
+	answer(limiter, outcome='error')
+	assert limiter.stats()['limit'] == 4 and limiter.cuts == 2
+
+	# abandoned requests tell nothing.
+	answer(limiter, outcome=None)
+	assert limiter.cuts == 2 and limiter.stats()['error'] == 3
+
+
+def test_cut_on_rising_latency():
+	limiter = AdaptiveLimiter(initial=8, maximum=8, tolerance=2, smoothing=1)
+	answer(limiter, latency=0.01)
+	answer(limiter, latency=0.015)
+	assert limiter.cuts == 0
+	answer(limiter, latency=0.1)
+	assert limiter.cuts == 1 and limiter.stats()['limit'] == 4
+
+
+def test_bounds():
+	limiter = AdaptiveLimiter(initial=100, minimum=2, maximum=10)
+	assert limiter.stats()['limit'] == 10
+	for _ in range(10):
+		answer(limiter, outcome='error')
+		limiter._cut_at = 0
+	assert limiter.stats()['limit'] == 2
+	for _ in range(200):
+		answer(limiter)
+	assert limiter.stats()['limit'] == 10
+
+
+def test_blocks_over_the_limit():
+	limiter = AdaptiveLimiter(initial=2, maximum=2)
+	assert limiter.acquire() and limiter.acquire()
+	start = time.monotonic()
+	assert not limiter.acquire(time.monotonic() + 0.1)
+	assert time.monotonic() - start >= 0.1
+
+	acquired = threading.Event()
+	def wait():
+		limiter.acquire()
+		acquired.set()
+	threading.Thread(target=wait, daemon=True).start()
+	assert not acquired.wait(0.1)
+	limiter.release(0.01)
+	assert acquired.wait(1)
+	assert limiter.stats()['in_flight'] == 2
+
+
+def test_threads_keep_to_the_limit():
+	limiter = AdaptiveLimiter(initial=1, maximum=4)
+	lock = threading.Lock()
+	in_flight, peak = [0], [0]
+
+	def request():
+		for _ in range(50):
+			limiter.acquire()
+			with lock:
+				in_flight[0] += 1
+				peak[0] = max(peak[0], in_flight[0])
+			time.sleep(0.001)
+			with lock:
+				in_flight[0] -= 1
+			limiter.release(0.001)
+
+	threads = [threading.Thread(target=request) for _ in range(8)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	assert peak[0] <= 4
+	assert limiter.stats()['in_flight'] == 0 and limiter.stats()['ok'] == 400
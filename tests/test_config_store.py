@@ -0,0 +1,90 @@
+'''Tests of `ConfigStore`: migration of a TOML config, import and export,
+and several processes changing the config at once.'''
+
+import toml
+from multiprocessing import Process
+from ohmydomains.config_store import ConfigStore
+from ohmydomains.registrars import account_from_export
+
+
+def record(username, tags=()):
+	return { 'registrar': 'name', 'credentials': { 'username': username, 'token': 'token-' + username },
+		'testing': False, 'tags': list(tags) }
+
+
+def test_legacy_config_is_imported_once(tmp_path):
+	legacy = tmp_path / 'config.toml'
+	legacy.write_text(toml.dumps({ 'accounts': [record('a', ['x']), record('b')], 'raw_domains': ['raw.com'], 'timeouts': { 'name': 5 } }))
+
+	with ConfigStore(tmp_path / 'config.db', legacy=legacy) as store:
+		assert store.load() == { 'accounts': [record('a', ['x']), record('b')], 'raw_domains': ['raw.com'], 'timeouts': { 'name': 5 } }
+	assert not legacy.exists() and (tmp_path / 'config.toml.imported').exists()
+
+	# not mistaken for the config once imported.
+	legacy.write_text(toml.dumps({ 'accounts': [record('c')] }))
+	with ConfigStore(tmp_path / 'config.db', legacy=legacy) as store:
+		assert [account['credentials']['username'] for account in store.accounts()] == ['a', 'b']
+	assert legacy.exists()
+
+
+def test_changes(tmp_path):
+	with ConfigStore(tmp_path / 'config.db') as store:
+		a, b = account_from_export(record('a'), net_init=False), account_from_export(record('b'), net_init=False)
+		store.put_accounts(a, b)
+		a.tags = ['tagged']
+		store.put_accounts(a)
+		assert store.accounts() == [record('a', ['tagged']), record('b')]
+		store.delete_accounts(b)
+		assert store.accounts() == [record('a', ['tagged'])]
+
+		store.add_raw_domains('one.com', 'two.com', 'one.com')
+		store.delete_raw_domains('two.com')
+		store.set_setting('transports', { 'name': 'http2' })
+		store.set_setting('timeouts', { 'name': 5 })
+		store.set_setting('timeouts', None)
+		assert store.load() == { 'accounts': [record('a', ['tagged'])], 'raw_domains': ['one.com'], 'transports': { 'name': 'http2' } }
+
+
+def test_import_and_export(tmp_path):
+	path = tmp_path / 'export.toml'
+	with ConfigStore(tmp_path / 'config.db') as store:
+		(tmp_path / 'in.toml').write_text(toml.dumps({ 'accounts': [record('a'), record('b')], 'raw_domains': ['one.com'] }))
+		store.import_toml(tmp_path / 'in.toml')
+		store.export_toml(path)
+		exported = toml.loads(path.read_text())
+		assert exported == store.load()
+
+		(tmp_path / 'more.toml').write_text(toml.dumps({ 'accounts': [record('b', ['new']), record('c')], 'raw_domains': ['two.com'], 'timeouts': { 'name': 5 } }))
+		store.import_toml(tmp_path / 'more.toml', replace=False)
+		assert store.load() == { 'accounts': [record('a'), record('b', ['new']), record('c')],
+			'raw_domains': ['one.com', 'two.com'], 'timeouts': { 'name': 5 } }
+
+		store.import_toml(path)
+		assert store.load() == exported
+		assert [path.name for path in tmp_path.iterdir() if path.name.endswith('.tmp')] == []
+
+
+def add_accounts(path, worker, count):
+	with ConfigStore(path) as store:
+		for i in range(count):
+			store.put_accounts(account_from_export(record('w{}-{}'.format(worker, i)), net_init=False))
+			store.add_raw_domains('w{}-{}.com'.format(worker, i))
+			store.set_setting('last', { 'worker': worker })
+
+
+def test_concurrent_writers(tmp_path):
+	path = tmp_path / 'config.db'
+	ConfigStore(path).close()
+	workers = [Process(target=add_accounts, args=(path, worker, 25)) for worker in range(4)]
+	for worker in workers:
+		worker.start()
+	for worker in workers:
+		worker.join()
+	assert [worker.exitcode for worker in workers] == [0] * 4
+
+	with ConfigStore(path) as store:
+		config = store.load()
+	expected = { 'w{}-{}'.format(worker, i) for worker in range(4) for i in range(25) }
+	assert { account['credentials']['username'] for account in config['accounts'] } == expected
+	assert set(config['raw_domains']) == { name + '.com' for name in expected }
+	assert config['last']['worker'] in range(4)
@@ -0,0 +1,129 @@
+'''Tests of `DelegationChecker` against local stand-in name servers:
+a resolver also serving the TLD, and authoritative servers on
+other loopback addresses, IPv6 included, all on one free port.'''
+
+import socket
+import threading
+import pytest
+
+dns = pytest.importorskip('dns')
+import dns.flags
+import dns.message
+import dns.rcode
+import dns.rdatatype
+import dns.rrset
+from ohmydomains.delegation import DelegationChecker
+from ohmydomains.domain import Domain
+
+
+RESOLVER = '127.0.0.1'
+
+ADDRESSES = {
+	'a.gtld.test': { 'A': ['127.0.0.1'] },
+	'ns1.good.test': { 'A': ['127.0.0.2'] },
+	'ns6.good.test': { 'AAAA': ['::1'] },
+	'ns.lame.test': { 'A': ['127.0.0.3'] },
+	# exists, without any address.
+	'ns.noaddr.test': {},
+}
+
+DELEGATIONS = {
+	'ok.com': ['ns1.good.test', 'ns6.good.test'],
+	'mismatch.com': ['ns1.good.test'],
+	'lame.com': ['ns.lame.test'],
+	'noaddr.com': ['ns.noaddr.test'],
+}
+
+LAME_ADDRESSES = ('127.0.0.3',)
+
+
+def answer_resolver(query, response):
+	'''The resolver, and name server of `com`.'''
+
+	question = query.question[0]
+	name, rdtype = str(question.name).rstrip('.'), dns.rdatatype.to_text(question.rdtype)
+	if name == 'com' and rdtype == 'NS':
+		response.answer.append(dns.rrset.from_text(question.name, 300, 'IN', 'NS', 'a.gtld.test.'))
+	elif name in ADDRESSES:
+		if ADDRESSES[name].get(rdtype, None):
+			response.answer.append(dns.rrset.from_text(question.name, 300, 'IN', rdtype, *ADDRESSES[name][rdtype]))
+	elif name in DELEGATIONS and rdtype == 'NS':
+		response.authority.append(dns.rrset.from_text(question.name, 300, 'IN', 'NS', *[host + '.' for host in DELEGATIONS[name]]))
+	else:
+		response.set_rcode(dns.rcode.NXDOMAIN)
+
+
+def answer_authoritatively(query, response, lame=False):
+	if lame:
+		response.set_rcode(dns.rcode.REFUSED)
+		return
+	response.flags |= dns.flags.AA
+	response.answer.append(dns.rrset.from_text(query.question[0].name, 300, 'IN', 'SOA', 'ns1.good.test. hostmaster.good.test. 1 2 3 4 5'))
+
+
+def serve(sock, answer):
+	def loop():
+		while True:
+			try:
+				data, peer = sock.recvfrom(4096)
+			except OSError:
+				return
+			query = dns.message.from_wire(data)
+			response = dns.message.make_response(query)
+			answer(query, response)
+			sock.sendto(response.to_wire(), peer)
+	threading.Thread(target=loop, daemon=True).start()
+
+
+@pytest.fixture(scope='module')
+def port():
+	resolver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+	resolver.bind((RESOLVER, 0))
+	port = resolver.getsockname()[1]
+	sockets = [resolver]
+	serve(resolver, answer_resolver)
+
+	for address in ('127.0.0.2', '127.0.0.3', '::1'):
+		sock = socket.socket(':' in address and socket.AF_INET6 or socket.AF_INET, socket.SOCK_DGRAM)
+		sock.bind((address, port))
+		sockets.append(sock)
+		serve(sock, lambda query, response, lame=address in LAME_ADDRESSES: answer_authoritatively(query, response, lame))
+
+	yield port
+	for sock in sockets:
+		sock.close()
+
+
+def verify(port, *domains, **options):
+	checker = DelegationChecker(nameservers=[RESOLVER], port=port, timeout=1, **options)
+	results = checker.verify([Domain(name=name, name_servers=servers) for name, servers in domains])
+	return { result['name']: result for result in results }
+
+
+def test_delegations(port):
+	results = verify(port,
+		('ok.com', ['NS1.good.test', 'ns6.good.test.']),
+		('mismatch.com', ['ns1.good.test', 'ns2.other.test']),
+		('lame.com', ['ns.lame.test']),
+		('gone.com', ['ns1.good.test']))
+
+	assert results['ok.com']['status'] == 'ok'
+	assert results['ok.com']['delegated'] == ['ns1.good.test', 'ns6.good.test']
+	assert results['mismatch.com']['status'] == 'mismatch'
+	assert results['mismatch.com']['missing'] == ['ns2.other.test']
+	assert results['lame.com']['status'] == 'lame'
+	assert results['lame.com']['lame'] == ['ns.lame.test']
+	assert results['gone.com']['status'] == 'mismatch'
+	assert results['gone.com']['delegated'] == []
+
+
+def test_name_server_without_addresses_is_lame(port):
+	result = verify(port, ('noaddr.com', ['ns.noaddr.test']))['noaddr.com']
+	assert result['status'] == 'lame'
+	assert result['error'] is None
+
+
+def test_no_tries_is_an_error(port):
+	result = verify(port, ('ok.com', ['ns1.good.test', 'ns6.good.test']), tries=0)['ok.com']
+	assert result['status'] == 'error'
+	assert 'Timeout' in result['error']
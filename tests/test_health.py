@@ -0,0 +1,87 @@
+'''Tests of checks of credentials, alone and of imported accounts, against
+a local server never answering, registrars rejecting credentials, and
+checks failing otherwise.'''
+
+import time
+import types
+import socket
+import pytest
+import requests
+from ohmydomains.health import check_credentials
+from ohmydomains.manager import Manager
+from ohmydomains.registrars import registrars
+from ohmydomains.registrars.account import RegistrarAccount
+from ohmydomains.util import RequestFailed
+
+
+class StubAccount(RegistrarAccount):
+	'''Tests credentials with a request to `url`, rejected if `outcome`
+	is `rejected`, failing if `error`.'''
+
+	REGISTRAR = 'checked'
+	REGISTRAR_NAME = 'Checked'
+
+	@property
+	def identifier(self):
+		return self._credentials['user']
+
+	def _request(self, url):
+		outcome = self._credentials.get('outcome', None)
+		if outcome == 'rejected':
+			raise RequestFailed('denied', self)
+		if outcome == 'error':
+			raise ValueError('boom')
+		if url:
+			return requests.get(url, timeout=self._request_timeout())
+
+	def test_credentials(self):
+		try:
+			self._try_request(self._credentials.get('url', None))
+			return True
+		except RequestFailed:
+			return False
+
+
+registrars['checked'] = types.SimpleNamespace(Account=StubAccount)
+
+
+@pytest.fixture
+def silent_url():
+	sock = socket.socket()
+	sock.bind(('127.0.0.1', 0))
+	sock.listen(8)
+	yield 'http://127.0.0.1:{}/'.format(sock.getsockname()[1])
+	sock.close()
+
+
+def test_timed_out(silent_url):
+	account = StubAccount(user='a', url=silent_url)
+	start = time.monotonic()
+	result = check_credentials(account, timeout=0.3)
+	# each try is cut short by the deadline, and none made past it.
+	assert time.monotonic() - start < 1
+	assert result['valid'] is None and result['error'] is None
+	# the account checked is left as it was.
+	assert account.timeout == account.TIMEOUT and account.deadline is None
+
+
+def test_errors_are_not_timeouts():
+	result = check_credentials(StubAccount(user='a', outcome='error'), timeout=1)
+	assert result['valid'] is None
+	assert result['error'] == "ValueError('boom')"
+	assert check_credentials(StubAccount(user='a', outcome='rejected'), timeout=1)['valid'] is False
+
+
+def test_import_statuses(silent_url):
+	manager = Manager()
+	results = manager.import_accounts([
+		{ 'registrar': 'checked', 'user': 'valid' },
+		{ 'registrar': 'checked', 'user': 'rejected', 'outcome': 'rejected' },
+		{ 'registrar': 'checked', 'user': 'error', 'outcome': 'error' },
+		{ 'registrar': 'checked', 'user': 'silent', 'url': silent_url },
+	], timeout=0.3)
+
+	assert [(result['status'], result['error']) for result in results] == [
+		('imported', None), ('rejected', None), ('failed', "ValueError('boom')"), ('timed out', None)]
+	assert [account.identifier for account in manager.accounts] == ['valid']
+	assert manager.accounts[0].timeout == StubAccount.TIMEOUT
@@ -0,0 +1,134 @@
+'''Tests of `DomainIndex` queries against going through every domain name:
+substrings and wildcards, TLDs, date ranges and order, after changes.'''
+
+import sys
+import random
+import pendulum
+from pathlib import Path
+from ohmydomains.domain import Domain
+from ohmydomains.index import DomainIndex, match_name, normalize_tld
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'benchmarks'))
+from fixtures import BenchmarkAccount, make_domains
+
+
+NOW = pendulum.datetime(2020, 1, 1)
+
+
+def brute_force(domains, search=(), tld=(), **bounds):
+	found = []
+	for domain in domains:
+		name = domain.name.lower()
+		if not all(match_name(name, term.lower()) for term in search):
+			continue
+		if tld and domain.tld not in { normalize_tld(item) for item in tld }:
+			continue
+		if any(domain[field] is None for field in { key.rsplit('_', 1)[0] for key in bounds }):
+			continue
+		if any(domain[key.rsplit('_', 1)[0]] < value for key, value in bounds.items() if key.endswith('_after')):
+			continue
+		if any(domain[key.rsplit('_', 1)[0]] > value for key, value in bounds.items() if key.endswith('_before')):
+			continue
+		found.append(domain)
+	return found
+
+
+def names(domains):
+	return sorted(domain.name for domain in domains)
+
+
+def test_queries_match_brute_force():
+	account = BenchmarkAccount()
+	domains = list(make_domains(account, 2000, now=NOW))
+	index = DomainIndex(domains)
+	rand = random.Random(1)
+
+	# removed, and re-added with other dates.
+	for domain in rand.sample(domains, 200):
+		index.remove(domain.name)
+		domains.remove(domain)
+	for domain in make_domains(account, 100, now=NOW.add(years=1), seed=1):
+		index.add(domain)
+		domains.append(domain)
+
+	queries = [
+		{ 'search': ['ab'] },
+		{ 'search': ['abc'] },
+		{ 'search': ['a*1?.com'] },
+		{ 'search': ['*.co.uk'] },
+		{ 'search': ['e', '1'] },
+		{ 'tld': ['IO', '.dev'] },
+		{ 'tld': ['.co.uk'], 'search': ['a'] },
+		{ 'expiry_before': NOW.add(days=30) },
+		{ 'expiry_after': NOW, 'expiry_before': NOW.add(days=90), 'tld': ['.com'] },
+		{ 'creation_after': NOW.subtract(years=3), 'expiry_after': NOW.add(years=1) },
+		{ 'expiry_after': NOW.add(years=5) },
+	]
+	for query in queries:
+		assert names(index.query(**query)) == names(brute_force(domains, **query)), query
+
+
+def test_ordered_queries():
+	domains = list(make_domains(BenchmarkAccount(), 500, now=NOW))
+	index = DomainIndex(domains)
+
+	ordered = index.query(order_by='expiry')
+	assert len(ordered) == len(domains)
+	dated = [domain.expiry for domain in ordered if domain.expiry]
+	assert dated == sorted(dated)
+	# those without it, last.
+	assert all(domain.expiry is None for domain in ordered[len(dated):])
+
+	latest = index.query(tld='.com', expiry_after=NOW, order_by='expiry', reverse=True)
+	assert [domain.expiry for domain in latest] == sorted((domain.expiry for domain in latest), reverse=True)
+	assert names(latest) == names(brute_force(domains, tld=['.com'], expiry_after=NOW))
+	assert index.range('creation', before=NOW.subtract(years=9)) == sorted(
+		brute_force(domains, creation_before=NOW.subtract(years=9)), key=lambda domain: (domain.creation, domain.name.lower()))
+
+
+def test_changes_and_lookups():
+	account, other = BenchmarkAccount(), BenchmarkAccount()
+	domains = list(make_domains(account, 50, now=NOW)) + list(make_domains(other, 50, now=NOW, seed=1))
+	index = DomainIndex(domains)
+
+	first = domains[0]
+	assert index.get(first.name.upper()) is first and first.name.upper() in index
+	moved = Domain.from_fields(dict(first, expiry=NOW.add(years=20)))
+	index.add(moved)
+	assert len(index) == 100
+	assert index.query(expiry_after=NOW.add(years=19)) == [moved]
+
+	index.retain(account, [domain.name for domain in domains[:10]])
+	assert names(index) == names(domains[:10] + domains[50:])
+	assert sum(index.tlds().values()) == len(index)
+	assert index.remove('missing.com') is None
+	index.clear()
+	assert index.query(search='a') == [] and index.query(order_by='creation') == []
+
+
+def test_changes_merged_between_ordered_queries():
+	account = BenchmarkAccount()
+	domains = { domain.name: domain for domain in make_domains(account, 300, now=NOW) }
+	index = DomainIndex(domains.values())
+	rand = random.Random(2)
+
+	for i in range(20):
+		# adds, removals and replacements, merged into names in order when next queried.
+		for name in rand.sample(sorted(domains), 10):
+			if rand.random() < 0.5:
+				index.remove(name)
+				del domains[name]
+			else:
+				domains[name] = Domain.from_fields(dict(domains[name], expiry=NOW.add(days=rand.randint(-60, 800))))
+				index.add(domains[name])
+		for domain in make_domains(account, 5, now=NOW, seed=100 + i):
+			domains[domain.name] = domain
+			index.add(domain)
+
+		for field in ('expiry', 'creation'):
+			expected = sorted((domain for domain in domains.values() if domain[field]),
+				key=lambda domain: (domain[field].timestamp(), domain.name.lower()))
+			assert index.range(field) == expected
+			assert index.range(field, reverse=True) == expected[::-1]
+		after, before = NOW.add(days=rand.randint(0, 300)), NOW.add(days=rand.randint(300, 600))
+		assert names(index.query(expiry_after=after, expiry_before=before)) == names(brute_force(domains.values(), expiry_after=after, expiry_before=before))
@@ -0,0 +1,137 @@
+'''Tests of journals of raw responses: what entries keep and leave out,
+segments, and listings rebuilt from them without requesting anything.'''
+
+import json
+import gzip
+import types
+import pendulum
+import pytest
+from ohmydomains.contact import ContactList
+from ohmydomains.domain import Domain
+from ohmydomains.journal import REDACTED, Journal, NotJournaled, ReplayTransport, request_key
+from ohmydomains.manager import Manager
+from ohmydomains.registrars.account import RegistrarAccount
+from ohmydomains.transport import Transport
+
+
+def response(body, status=200, **headers):
+	content = isinstance(body, bytes) and body or json.dumps(body).encode('utf-8')
+	return types.SimpleNamespace(status_code=status, headers=headers, content=content, json=lambda: json.loads(content))
+
+
+class PagesTransport(Transport):
+	'''Answers `/domains` with pages of `names`, and counts requests.'''
+
+	def __init__(self, names, per_page=2):
+		self.names, self.per_page = names, per_page
+		self.requests = 0
+
+	def request(self, method, url, params=None, json=None, headers=None, auth=None, timeout=None):
+		self.requests += 1
+		page = params['page']
+		return response(self.names[(page - 1) * self.per_page:page * self.per_page],
+			**{ 'Total-Count': str(len(self.names)), 'X-Request-Id': str(self.requests) })
+
+
+class StubAccount(RegistrarAccount):
+	REGISTRAR_NAME = 'Stub'
+	API_BASE = ''
+	JOURNAL_HEADERS = ('Total-Count',)
+	VOLATILE_PARAMS = ('client_ip',)
+
+	@property
+	def identifier(self):
+		return self._credentials['user']
+
+	def _request(self, page):
+		result = self._transport.request('get', 'https://stub.test/domains', timeout=self._request_timeout(), params={
+			'token': self._credentials['token'], 'client_ip': self._credentials.get('client_ip', '192.0.2.1'), 'page': page })
+		return result.json(), int(result.headers['Total-Count'])
+
+	def iter_domains(self, **criteria):
+		page, listed = 1, 0
+		while True:
+			names, total = self._try_request(page)
+			for name in names:
+				yield Domain(contacts=ContactList(), account=self, name=name, registrar_name=self.REGISTRAR_NAME,
+					creation=pendulum.datetime(2020, 1, 1), expiry=pendulum.datetime(2021, 1, 1))
+			listed += len(names)
+			if not names or listed >= total:
+				break
+			page += 1
+
+
+def test_entries(tmp_path):
+	with Journal(tmp_path) as journal:
+		journal.record('Stub:a', 'GET', 'https://stub.test/x', { 'token': 'secret', 'client_ip': '192.0.2.1', 'page': 1 },
+			{ 'key': 'secret', 'other': 'kept' }, response({ 'ok': True }, **{ 'Content-Type': 'application/json', 'Total-Count': '3', 'Set-Cookie': 'c' }),
+			secrets={ 'secret' }, headers=('Total-Count',), volatile=('client_ip',))
+		journal.record('Stub:b', 'get', 'https://stub.test/y', None, None, response(b'\xff\x00', status=500))
+
+	first, second = journal.iter_entries()
+	assert first['account'] == 'Stub:a' and first['method'] == 'get'
+	assert first['params'] == { 'token': REDACTED, 'page': 1 }
+	assert first['json'] == { 'key': REDACTED, 'other': 'kept' }
+	assert first['headers'] == { 'Content-Type': 'application/json', 'Total-Count': '3' }
+	assert json.loads(first['body']) == { 'ok': True }
+	assert second['status'] == 500 and second['body_base64'] == '/wA='
+	assert 'secret' not in gzip.open(journal.segments()[0]).read().decode('utf-8')
+	assert [entry['url'] for entry in journal.iter_entries(['Stub:b'])] == ['https://stub.test/y']
+
+
+def test_segments(tmp_path):
+	journal = Journal(tmp_path, segment_size=1, keep=3)
+	for i in range(5):
+		journal.record('Stub:a', 'get', 'https://stub.test/{}'.format(i), None, None, response(i))
+	journal.close()
+	# one per entry, as each outgrows the size; the oldest are deleted.
+	assert [path.name for path in journal.segments()] == ['00000003.jsonl.gz', '00000004.jsonl.gz', '00000005.jsonl.gz']
+
+	other = Journal(tmp_path)
+	other.record('Stub:a', 'get', 'https://stub.test/5', None, None, response(5))
+	other.close()
+	# a segment cut short by a crash, its entries flushed but not closed, is still read.
+	last = other.segments()[-1]
+	last.write_bytes(last.read_bytes()[:-8])
+	assert [entry['url'][-1] for entry in Journal(tmp_path).iter_entries()] == ['2', '3', '4', '5']
+
+
+def test_replay_transport(tmp_path):
+	journal = Journal(tmp_path)
+	url = 'https://stub.test/x'
+	journal.record('Stub:a', 'get', url, { 'page': 1, 'client_ip': '192.0.2.1' }, None, response('old'))
+	journal.record('Stub:a', 'get', url, { 'page': 1 }, None, response('new'))
+	journal.record('Stub:a', 'get', url, { 'page': 2, 'token': 'secret' }, None, response('two'), secrets={ 'secret' })
+	journal.close()
+
+	responses = journal.responses(['Stub:a'])['Stub:a']
+	assert len(responses) == 3 and request_key('GET', url, { 'page': 1 }) in responses
+	# entries with volatile params match requests without them, the latest first.
+	transport = ReplayTransport(responses, secrets={ 'secret' }, volatile=('client_ip',))
+	assert transport.request('get', url, params={ 'page': 1, 'client_ip': '198.51.100.1' }).json() == 'new'
+	assert transport.request('get', url, params={ 'page': 2, 'token': 'secret' }).json() == 'two'
+	with pytest.raises(NotJournaled):
+		transport.request('get', url, params={ 'page': 3 })
+
+
+def test_listings_rebuilt_from_journal(tmp_path):
+	account = StubAccount(user='a', token='secret')
+	account._transport = PagesTransport(['one.com', 'two.com', 'three.com'])
+	missing = StubAccount(user='missing', token='other')
+	journal = Journal(tmp_path)
+	manager = Manager([account], journal=journal)
+	listed = sorted(domain.name for domain in manager.iter_domains())
+	journal.close()
+	# lent for the listing only.
+	assert account.journal is None and account._transport.requests == 2
+
+	rebuilt = Manager([account, missing])
+	# requested from another place, i.e. client IP address.
+	account._credentials['client_ip'] = '198.51.100.1'
+	replayed = list(rebuilt.replay_journal(journal))
+	assert sorted(domain.name for domain in replayed) == listed == ['one.com', 'three.com', 'two.com']
+	assert all(domain.account is account for domain in replayed)
+	assert account._transport.requests == 2
+	assert rebuilt.report['Stub:a']['status'] == 'complete'
+	assert rebuilt.report['Stub:missing']['status'] != 'complete'
+	assert 'NotJournaled' in rebuilt.report['Stub:missing']['error']
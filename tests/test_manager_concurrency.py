@@ -0,0 +1,120 @@
+'''Stress tests of a `Manager` shared between threads adding, deleting
+and reading accounts, and listing domain names, all at once.'''
+
+import random
+import threading
+import pendulum
+from ohmydomains.contact import ContactList
+from ohmydomains.domain import Domain
+from ohmydomains.manager import Manager
+from ohmydomains.registrars.account import RegistrarAccount
+
+
+THREADS = 8
+ROUNDS = 200
+
+
+class StubAccount(RegistrarAccount):
+	REGISTRAR = 'stub'
+	REGISTRAR_NAME = 'Stub'
+
+	def __init__(self, user, count=20, **kwargs):
+		super().__init__(user=user, **kwargs)
+		self.count = count
+
+	@property
+	def identifier(self):
+		return self._credentials['user']
+
+	def iter_domains(self, **criteria):
+		base = pendulum.datetime(2020, 1, 1)
+		for i in range(self.count):
+			yield Domain(contacts=ContactList(), account=self,
+				name='{}-{}.com'.format(self.identifier, i), registrar_name=self.REGISTRAR_NAME,
+				creation=base.add(days=i), expiry=base.add(days=i + 400))
+
+
+def run_threads(*targets):
+	errors = []
+	def guarded(target, *args):
+		try:
+			target(*args)
+		except Exception as e:
+			errors.append(e)
+
+	threads = [threading.Thread(target=guarded, args=target) for target in targets]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	assert errors == []
+
+
+def test_add_and_delete_accounts():
+	manager = Manager()
+	kept = [[] for _ in range(THREADS)]
+
+	def churn(n):
+		rand = random.Random(n)
+		mine = []
+		for i in range(ROUNDS):
+			account = StubAccount('t{}-{}'.format(n, i), tags=[str(n)])
+			manager.add_accounts(account)
+			mine.append(account)
+			if rand.random() < 0.5:
+				manager.delete_accounts(mine.pop(rand.randrange(len(mine))))
+		kept[n] = mine
+
+	def read(n):
+		for _ in range(ROUNDS):
+			accounts = manager.accounts
+			assert len(set(accounts)) == len(accounts)
+			for account in manager.get_accounts(tags=[str(n)]):
+				assert account.tags == [str(n)]
+
+	run_threads(*([(churn, n) for n in range(THREADS)] + [(read, n) for n in range(THREADS)]))
+
+	expected = [account for mine in kept for account in mine]
+	assert sorted(manager.accounts, key=id) == sorted(expected, key=id)
+	for n in range(THREADS):
+		assert set(manager.get_accounts(tags=[str(n)])) == set(kept[n])
+
+
+def test_add_domains():
+	manager = Manager()
+
+	def add(n):
+		for i in range(ROUNDS):
+			manager.add_domains('r{}-{}.com'.format(n, i))
+
+	run_threads(*[(add, n) for n in range(THREADS)])
+	assert sorted(manager.raw_domains) == sorted('r{}-{}.com'.format(n, i) for n in range(THREADS) for i in range(ROUNDS))
+
+
+def test_list_while_accounts_change():
+	stable = [StubAccount('s{}'.format(n)) for n in range(4)]
+	manager = Manager(stable)
+	listings = []
+
+	def list_domains(n):
+		for _ in range(ROUNDS // 10):
+			names = [domain.name for domain in manager.iter_domains()]
+			assert len(set(names)) == len(names)
+			listings.append(set(names))
+
+	def churn(n):
+		for i in range(ROUNDS):
+			account = StubAccount('c{}-{}'.format(n, i), count=2)
+			manager.add_accounts(account)
+			manager.delete_accounts(account)
+
+	run_threads(*([(list_domains, n) for n in range(THREADS)] + [(churn, n) for n in range(THREADS // 2)]))
+
+	assert manager.accounts == tuple(stable)
+	expected = { '{}-{}.com'.format(account.identifier, i) for account in stable for i in range(account.count) }
+	for names in listings:
+		assert expected <= names
+	assert { domain.name for domain in manager.iter_domains() } == expected
+	assert { key for key, report in manager.report.items() if report['status'] == 'complete' } == { account.unique_identifier for account in stable }
+	for account in stable:
+		assert len(manager.find_domains(search=account.identifier + '-')) == account.count
@@ -0,0 +1,73 @@
+'''Tests of criteria pushed down from queries, and of listings and index
+searches narrowed down by them returning what the query alone would.'''
+
+import sys
+import pendulum
+from pathlib import Path
+from ohmydomains.manager import Manager
+from ohmydomains.query import Query, pushdown, parse
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'benchmarks'))
+from fixtures import BenchmarkAccount, make_domains
+
+
+NOW = pendulum.datetime(2020, 1, 1)
+
+
+class SearchingAccount(BenchmarkAccount):
+	'''Lists `domains`, keeping to a search term as registrars do,
+	taking wildcards literally, and recording criteria passed down.'''
+
+	def __init__(self, domains=()):
+		super().__init__()
+		self.domains = domains
+		self.criteria = []
+
+	def iter_domains(self, search=None, **criteria):
+		self.criteria.append(dict(criteria, search=search))
+		for domain in self.domains:
+			if not search or search.lower() in domain.name.lower():
+				yield domain
+
+
+def test_pushdown():
+	date = pendulum.datetime(2021, 1, 1)
+	assert pushdown(parse("name contains 'abc' and tld in ('.io', '.dev') and expiry < 2021-01-01 and lock == true")) == {
+		'search': ['abc'], 'tld': ['.io', '.dev'], 'expiry_before': date }
+	assert pushdown(parse("name == 'a.com' and tld == '.com' and creation >= 2021-01-01")) == {
+		'search': ['a.com'], 'tld': ['.com'], 'creation_after': date }
+	assert pushdown(parse("expiry == 2021-01-01")) == { 'expiry_before': date, 'expiry_after': date }
+	assert pushdown(parse("name matches 'ab*.io' and name matches '[ab]*'")) == { 'patterns': ['ab*.io'] }
+
+	# nothing narrows down alternatives, negations, or literal wildcards.
+	for text in ("name contains 'a' or tld == '.io'", "not name contains 'a'", "not expiry < now",
+		"name contains 'a*'", "name == 'a?.com'", "expiry < null", "tld in ('.io', 1)"):
+		assert pushdown(parse(text)) == {}, text
+
+
+def test_listings_and_searches_match_queries():
+	account = SearchingAccount()
+	account.domains = list(make_domains(account, 1000, now=NOW))
+	manager = Manager([account])
+	everything = list(manager.iter_domains())
+
+	queries = [
+		"name contains 'ab'",
+		"name contains 'a' and name contains 'e'",
+		"name matches 'a*.io' and expiry < 2020-06-01",
+		"name matches '*1?.co.uk'",
+		"name == '{}'".format(everything[7].name.upper()),
+		"tld in ('.io', '.DEV') and expiry >= 2020-01-01 and expiry <= 2020-12-31",
+		"creation < 2015-01-01 or tld == '.app'",
+		"not (tld == '.com') and auto_renew == true",
+		"expiry == null",
+	]
+	for text in queries:
+		query = Query(text)
+		expected = sorted(domain.name for domain in everything if query(domain))
+		account.criteria.clear()
+		assert sorted(domain.name for domain in manager.iter_domains(where=text)) == expected, text
+		assert sorted(domain.name for domain in manager.find_domains(where=text)) == expected, text
+		search = query.criteria.get('search', None)
+		assert account.criteria[0]['search'] == (search and len(search) == 1 and search[0] or None), text
+		assert 'patterns' not in account.criteria[0]
@@ -0,0 +1,34 @@
+'''Tests of snapshots written and read back, and closed mid iteration.'''
+
+import sys
+import pendulum
+from pathlib import Path
+from ohmydomains.snapshot import ROWS_PER_READ, Snapshot, write_snapshot
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'benchmarks'))
+from fixtures import BenchmarkAccount, make_domains
+
+
+def test_rows_read_back(tmp_path):
+	path = tmp_path / 'inventory.omds'
+	# more than a chunk of rows, not a whole number of chunks.
+	domains = list(make_domains(BenchmarkAccount(), ROWS_PER_READ + 10))
+	write_snapshot(path, domains)
+
+	cutoff = pendulum.datetime(2021, 1, 1)
+	with Snapshot(path) as snapshot:
+		assert [row.name for row in snapshot] == [domain.name for domain in domains]
+		assert [row.name for row in snapshot.iter_rows(expiry_before=cutoff)] == [
+			domain.name for domain in domains if domain.expiry and domain.expiry <= cutoff]
+
+
+def test_close_after_breaking_out(tmp_path):
+	path = tmp_path / 'inventory.omds'
+	write_snapshot(path, make_domains(BenchmarkAccount(), 10))
+
+	snapshot = Snapshot(path)
+	rows = snapshot.iter_rows()
+	for row in rows:
+		break
+	# the generator, still referenced, holds nothing of the map.
+	snapshot.close()
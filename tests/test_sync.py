@@ -0,0 +1,118 @@
+'''Tests of the sync work queue with several local worker processes:
+leases expiring after a worker is killed, items tried at most
+`max_tries` times, and workers keeping to their sync.'''
+
+import os
+import time
+import types
+import signal
+import pendulum
+from multiprocessing import Process
+from ohmydomains.contact import ContactList
+from ohmydomains.domain import Domain
+from ohmydomains.manager import Manager
+from ohmydomains.registrars import registrars
+from ohmydomains.registrars.account import RegistrarAccount
+from ohmydomains.sync import SyncQueue, work
+
+
+class StubAccount(RegistrarAccount):
+	'''Lists `count` domain names, slowly and forever while file `hang`
+	exists, failing if `fail` is set.'''
+
+	REGISTRAR = 'stub'
+	REGISTRAR_NAME = 'Stub'
+
+	@property
+	def identifier(self):
+		return self._credentials['user']
+
+	def iter_domains(self, **criteria):
+		if self._credentials.get('fail', None):
+			raise RuntimeError('failing on purpose')
+		base = pendulum.datetime(2020, 1, 1)
+		i = 0
+		while i < int(self._credentials.get('count', 3)) or os.path.exists(self._credentials.get('hang', '')):
+			if os.path.exists(self._credentials.get('hang', '')):
+				time.sleep(0.1)
+			yield Domain(contacts=ContactList(), account=self, name='{}-{}.com'.format(self.identifier, i),
+				registrar_name=self.REGISTRAR_NAME, creation=base, expiry=base.add(years=1))
+			i += 1
+
+
+registrars['stub'] = types.SimpleNamespace(Account=StubAccount)
+
+
+def wait_for(condition, timeout=10):
+	deadline = time.monotonic() + timeout
+	while not condition():
+		assert time.monotonic() < deadline
+		time.sleep(0.05)
+
+
+def test_item_of_killed_worker_is_completed_by_another(tmp_path):
+	path, hang = str(tmp_path / 'sync.db'), tmp_path / 'hang'
+	hang.touch()
+	queue = SyncQueue(path, lease=1)
+	sync_id = queue.enqueue([StubAccount(user='a', hang=str(hang))])
+
+	worker = Process(target=work, args=(path,), kwargs={ 'worker': 'doomed', 'lease': 1 })
+	worker.start()
+	wait_for(lambda: queue.status(sync_id) == { 'Stub:a': 'claimed' })
+	# renewed while the worker lives.
+	time.sleep(1.5)
+	assert queue.claim('other', sync_id) is None
+	os.kill(worker.pid, signal.SIGKILL)
+	worker.join()
+	hang.unlink()
+
+	time.sleep(1.1)
+	work(path, worker='rescuer', lease=1, sync_id=sync_id)
+	assert queue.status(sync_id) == { 'Stub:a': 'done' }
+	assert sorted(record['name'] for record in queue.iter_results(sync_id)) == ['a-0.com', 'a-1.com', 'a-2.com']
+	assert queue._db.execute('SELECT worker, tries FROM work').fetchall() == [('rescuer', 2)]
+	queue.close()
+
+
+def test_items_fail_after_max_tries(tmp_path):
+	path = str(tmp_path / 'sync.db')
+	queue = SyncQueue(path, max_tries=2)
+	sync_id = queue.enqueue([StubAccount(user='f', fail='1'), StubAccount(user='ok')])
+
+	# a failed item is released, and claimed again until out of tries.
+	work(path, max_tries=2)
+	assert queue.status(sync_id) == { 'Stub:f': 'failed', 'Stub:ok': 'done' }
+	assert queue._db.execute("SELECT tries FROM work WHERE account = 'Stub:f'").fetchone()[0] == 2
+	assert queue.is_finished(sync_id)
+	assert queue.claim('late', sync_id) is None
+	assert 'failing on purpose' in queue._db.execute("SELECT error FROM work WHERE account = 'Stub:f'").fetchone()[0]
+	queue.close()
+
+
+def test_workers_keep_to_their_sync(tmp_path):
+	path = str(tmp_path / 'sync.db')
+	queue = SyncQueue(path)
+	old = queue.enqueue([StubAccount(user='old')])
+	new = queue.enqueue([StubAccount(user='new')])
+
+	assert queue.latest() == new
+	work(path)
+	assert queue.status(old) == { 'Stub:old': 'pending' }
+	assert queue.status(new) == { 'Stub:new': 'done' }
+	assert [record['name'] for record in queue.iter_results(old)] == []
+	queue.close()
+
+
+def test_manager_sync_with_worker_processes(tmp_path):
+	path = str(tmp_path / 'sync.db')
+	queue = SyncQueue(path)
+	queue.enqueue([StubAccount(user='stale')])
+
+	accounts = [StubAccount(user='u{}'.format(i), count=i + 1) for i in range(5)]
+	manager = Manager(accounts)
+	status = manager.sync(path, processes=3, lease=5, poll_interval=0.1)
+	assert status == { account.unique_identifier: 'done' for account in accounts }
+	assert len(manager.index) == sum(range(1, 6))
+	# items of the sync are deleted, those of others left alone.
+	assert queue.status() == { 'Stub:stale': 'pending' }
+	queue.close()